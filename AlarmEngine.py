@@ -0,0 +1,105 @@
+"""
+Сигнализация по значениям датчиков.
+
+Уставки задаются датчику (Sensor.set_alarm_limits): HIHI, HI, LO, LOLO, зона
+возврата (deadband) и задержка срабатывания (delay, с). Каждый такт значения всех
+датчиков с уставками собираются в массив и сравниваются с матрицей уставок
+(датчики x 4 уровня) одним векторным выражением; Python-код выполняется только
+для изменившихся состояний — они попадают в ограниченную очередь событий.
+
+Срабатывание: значение выше уставки HIHI/HI (ниже LO/LOLO) непрерывно в течение
+delay. Снятие: значение вернулось за уставку на deadband (гистерезис), без задержки.
+"""
+from collections import deque, namedtuple
+
+import numpy as np
+
+from BaseElement import Sensor
+
+LEVELS = ('HIHI', 'HI', 'LO', 'LOLO')
+_HIGH = np.array([True, True, False, False])
+
+AlarmEvent = namedtuple('AlarmEvent', 'time sensor level active value')
+
+
+class AlarmEngine:
+    """
+    Вычисление состояний сигнализации для списка датчиков.
+    events — последние max_events событий (AlarmEvent), старые вытесняются.
+    """
+    def __init__(self, max_events=1000):
+        self.events = deque(maxlen=max_events)
+        self.time = 0.0
+        self.sensors = []       # датчики с уставками
+        self._source = None     # список, по которому построены массивы
+        self._signature = None
+        self.limits = np.empty((0, 4))
+        self.deadband = np.empty(0)
+        self.delay = np.empty(0)
+        self.state = np.zeros((0, 4), dtype=bool)
+        self.timer = np.zeros((0, 4))
+
+    def refresh(self, sensors):
+        """Перестроить массивы уставок по датчикам; активные состояния сохраняются."""
+        previous = {id(s): (self.state[k], self.timer[k]) for k, s in enumerate(self.sensors)}
+        self.sensors = [s for s in sensors if s.alarm_limits is not None]
+        n = len(self.sensors)
+        self.limits = np.array([s.alarm_limits[:4] for s in self.sensors], dtype=float).reshape(n, 4)
+        self.deadband = np.fromiter((s.alarm_limits[4] for s in self.sensors), float, n)
+        self.delay = np.fromiter((s.alarm_limits[5] for s in self.sensors), float, n)
+        self.state = np.zeros((n, 4), dtype=bool)
+        self.timer = np.zeros((n, 4))
+        for k, sensor in enumerate(self.sensors):
+            kept = previous.get(id(sensor))
+            if kept is not None:
+                self.state[k], self.timer[k] = kept
+        self._source = sensors
+        self._signature = (len(sensors), Sensor.limits_version)
+
+    def values(self):
+        return np.fromiter((np.nan if s.value is None else s.value for s in self.sensors), float, len(self.sensors))
+
+    def evaluate(self, sensors, dt=1.0):
+        """Обработать такт длительностью dt; вернуть число новых событий."""
+        if sensors is not self._source or self._signature != (len(sensors), Sensor.limits_version):
+            self.refresh(sensors)
+        self.time += dt
+        if not self.sensors:
+            return 0
+        value = self.values()[:, None]
+        band = self.deadband[:, None]
+        state = self.state
+        # Уставка NaN (не задана) и неизвестное значение дают False во всех сравнениях
+        over = np.where(_HIGH, value > self.limits, value < self.limits)
+        held = np.where(_HIGH, value >= self.limits - band, value <= self.limits + band)
+        condition = np.where(state, held, over)
+        condition |= state & np.isnan(value)  # без значения состояние не меняется
+        self.timer = np.where(condition & ~state, self.timer + dt, 0.0)
+        new_state = condition & (state | (self.timer >= self.delay[:, None]))
+
+        rows, levels = np.nonzero(new_state != state)
+        self.state = new_state
+        if not len(rows):
+            return 0
+        for k in set(rows.tolist()):
+            active = np.flatnonzero(new_state[k])
+            self.sensors[k].alarm = LEVELS[active[0]] if len(active) else None
+        flat_values = value[:, 0]
+        for k, level in zip(rows.tolist(), levels.tolist()):
+            self.events.append(AlarmEvent(self.time, self.sensors[k], LEVELS[level],
+                                          bool(new_state[k, level]), float(flat_values[k])))
+        return len(rows)
+
+    def drain(self):
+        """Забрать накопленные события (очередь очищается)."""
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def active(self):
+        """Активные сигнализации: список (датчик, уровень)."""
+        return [(self.sensors[k], LEVELS[level]) for k, level in zip(*np.nonzero(self.state))]
+
+    def coils(self):
+        """Состояния для катушек Modbus: по 4 бита на датчик (HIHI, HI, LO, LOLO)."""
+        return self.state.ravel()
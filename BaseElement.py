@@ -1,5 +1,26 @@
+import heapq
+import math
 import random
-from PyQt5.QtCore import QObject, pyqtSignal
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+from SchemeGraph import SchemeGraph
+from Signals import Signal
+
+
+# Замечание проверки схемы: severity — 'error' (расчёт невозможен) или 'warning',
+# code — короткий код вида 'ports', element — индекс элемента (None — схема целиком)
+SchemeIssue = namedtuple('SchemeIssue', 'severity code element message')
+
+
+class SchemeValidationError(ValueError):
+    """Схема не прошла проверку перед расчётом; issues — список SchemeIssue."""
+    def __init__(self, issues):
+        self.issues = issues
+        errors = [issue for issue in issues if issue.severity == 'error']
+        super().__init__("Ошибки в схеме:\n" + "\n".join(
+            f"[{issue.element}] {issue.message}" for issue in errors))
 
 
 class ModelModbusData:
@@ -34,68 +55,374 @@ class ModelModbusData:
         }
 
 
-class ProcessScheme(QObject):
-    chain_initialized = pyqtSignal()      # Сигнал: цепь построена
-    chain_not_initialized = pyqtSignal()  # Сигнал: требуется новая
-
+class ProcessScheme:
     def __init__(self):
-        super().__init__()
+        self.chain_initialized = Signal()      # Сигнал: цепь построена
+        self.chain_not_initialized = Signal()  # Сигнал: требуется новая
         self.elements_dict = {}  # {index: element}
         self.next_index = 0
-        self.chains = []  # Список цепей, каждая — список индексов
+        self.graph = None  # SchemeGraph: смежность, компоненты, порядок расчёта
         self.chain_ready = False
         self.sensors = []
+        # Датчики, опубликовавшие новое значение за последний такт; сигнал — раз в такт, если список не пуст
+        self.changed_sensors = []
+        self.sensors_changed = Signal()
+        self.sim_time = 0.0  # модельное время, с (сумма dt тактов)
+        # Скомпилированный план расчёта: связанные методы work() в топологическом порядке
+        self.plan = []
+        self.plan_elements = []
+        self.plan_ready = False
+        self._flow_sources = []  # Источники (FlowSourceElement), которым calculate() задаёт расход
+        # Независимые участки схемы (компоненты слабой связности) и пул потоков для их расчёта
+        self.subnetworks = []
+        self.workers = 1
+        self._pool = None
+        # Скомпилированный такт (TickCompiler) для текущей топологии, если включён
+        self.compile_tick = False
+        self.compiled_tick = None
+        # Свойства воды по таблицам WaterProperties для тепловых элементов и труб
+        self.water_properties = False
+        self._fluid_elements = []
+        self.state_store = None   # Массивное хранилище состояния (StateStore), если включено
+        self.hydraulic_mode = 'chain'  # 'chain' — последовательный расход по цепям, 'network' — узловой расчёт
+        self.network_solver = None
+        self._solver_options = {}
+        # Инкрементальный пересчёт: изменённые элементы и порог распространения изменений
+        self.incremental = False
+        self.dirty_tolerance = 1e-6
+        self._dirty = {}
+        self._plan_position = {}
+        self._loop_entries = []  # элементы плана со входом по обратному ребру кольца
+        self._deferred = []      # элементы, которые инкрементальный пересчёт выполнит на следующем такте
+        self._state_valid = False  # выполнен полный проход по текущему плану
+        self.steady_state_report = []  # итоги последнего solve_steady_state по кольцам
+        self.tank_integrator = None  # общий интегратор ёмкостей (Integrators.TankIntegrator), если задан
+        self._integrator_options = None
+        self.alarms = None  # сигнализация по уставкам датчиков (AlarmEngine.AlarmEngine), если включена
+        self.profiler = None  # профилировщик такта (Profiler.TickProfiler), если включён
+        self.noise = None  # шум показаний датчиков (SensorNoise.NoiseBank), если включён
+        self.history = None  # история показаний датчиков (SensorHistory.SensorHistory), если включена
+        self.validation_issues = []  # замечания последней проверки схемы (SchemeIssue)
+
+    def set_hydraulic_mode(self, mode, **solver_options):
+        """
+        Выбрать гидравлический расчёт: 'chain' (по цепям, как раньше) или
+        'network' (узловой решатель NetworkSolver, параметры передаются ему).
+        """
+        if mode not in ('chain', 'network'):
+            raise ValueError(f"Неизвестный режим гидравлического расчёта: {mode}")
+        self.hydraulic_mode = mode
+        self._solver_options = solver_options
+        self.invalidate_plan()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None  # пул потоков не копируется и не сериализуется
+        if state['compiled_tick'] is not None:
+            # Сгенерированный код не сериализуется — копия соберёт план заново
+            state['compiled_tick'] = None
+            state['plan_ready'] = False
+        if state['profiler'] is not None:
+            state = self.profiler.strip(state)  # копия считает без профилирования
+        return state
+
+    def set_workers(self, workers):
+        """
+        Число потоков для одновременного расчёта независимых участков схемы
+        (1 — участки считаются по очереди в текущем потоке).
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.workers = max(1, int(workers))
+
+    def component_timings(self):
+        """Длительность последнего такта каждого независимого участка, с."""
+        return [sub.elapsed for sub in self.subnetworks]
+
+    def enable_compiled_tick(self, enabled=True):
+        """
+        Считать такт сгенерированной функцией (TickCompiler) вместо вызовов work():
+        код строится при сборке плана и сбрасывается вместе с ним при изменении топологии.
+        """
+        self.compile_tick = enabled
+        self.invalidate_plan()
+
+    def enable_water_properties(self, enabled=True):
+        """
+        Перед каждым тактом обновлять плотность, теплоёмкость и вязкость воды у котлов,
+        потребителей и труб по их входным температуре и давлению (WaterProperties).
+        При выключении возвращаются постоянные значения по умолчанию.
+        """
+        self.water_properties = enabled
+        if not enabled:
+            for elem in self.elements_dict.values():
+                if isinstance(elem, (PipeElementElement, BoilerElement, ThermalFluidElement)):
+                    elem.rho, elem.cp, elem.mu = WATER_DENSITY, WATER_HEAT_CAPACITY, WATER_VISCOSITY
+        self.invalidate_plan()
+
+    def enable_alarms(self, enabled=True, max_events=1000):
+        """
+        Проверять уставки датчиков после каждого такта (AlarmEngine); события
+        хранятся в scheme.alarms.events (не более max_events последних).
+        """
+        if enabled:
+            from AlarmEngine import AlarmEngine
+            self.alarms = AlarmEngine(max_events)
+        else:
+            self.alarms = None
+            for sensor in self.sensors:
+                sensor.alarm = None
+
+    def enable_noise(self, enabled=True, seed=0, models=None, block=65536):
+        """
+        Шум показаний из заранее сгенерированных буферов (SensorNoise.NoiseBank) вместо
+        BaseElement.rattle: воспроизводим по seed, датчики публикуются схемой одним
+        векторным проходом после такта. models — SensorNoise.NoiseModel по типу датчика.
+        """
+        if enabled:
+            from SensorNoise import NoiseBank
+            self.noise = NoiseBank(seed, models, block)
+        else:
+            self.noise = None
+
+    def enable_history(self, enabled=True, **options):
+        """
+        Вести историю показаний датчиков со свёртками 1 с / 1 мин / 1 ч
+        (SensorHistory.SensorHistory, options — её параметры). Возвращает историю.
+        """
+        if enabled:
+            from SensorHistory import SensorHistory
+            self.history = SensorHistory(**options)
+        else:
+            self.history = None
+        return self.history
+
+    def enable_profiling(self, enabled=True, dump_interval=None, dump=None):
+        """
+        Включить счётчики времени по классам элементов и фазам такта (Profiler.TickProfiler);
+        dump_interval (с) и dump — периодический вывод отчёта. Возвращает профилировщик.
+        Скомпилированный такт на время профилирования не используется.
+        """
+        if self.profiler is not None:
+            self.profiler.detach()
+            self.profiler = None
+        if enabled:
+            from Profiler import TickProfiler
+            self.profiler = TickProfiler(dump_interval, dump)
+            self.profiler.attach(self)
+        return self.profiler
+
+    def update_water_properties(self):
+        """
+        Обновить свойства воды у элементов плана одним векторным вызовом. При
+        инкрементальном пересчёте элементы, свойства которых изменились больше
+        dirty_tolerance (относительно), отмечаются изменёнными.
+        """
+        if self._fluid_elements:
+            from WaterProperties import update_elements
+            track = self.incremental and self._state_valid
+            changed = update_elements(self._fluid_elements, self.dirty_tolerance if track else None)
+            for elem in changed:
+                elem.mark_dirty()
+
+    def set_integrator(self, method='implicit', **options):
+        """
+        Интегрировать состояние всех ёмкостей схемы одним вектором после прохода по плану:
+        method — 'implicit' (неявный Эйлер) или 'rk45' (адаптивный шаг, rtol/atol в options).
+        method=None — каждая ёмкость интегрирует себя сама в work().
+        """
+        if method is not None:
+            from Integrators import TankIntegrator
+            if method not in TankIntegrator.METHODS:
+                raise ValueError(f"Неизвестный метод интегрирования: {method}")
+            options['method'] = method
+        self._integrator_options = options if method is not None else None
+        self.tank_integrator = None
+        self.invalidate_plan()
+
+    def enable_array_state(self, enabled=True, min_group_size=64):
+        """
+        Включить массивный режим: состояние t/p/f хранится в массивах NumPy,
+        цепочки элементов без ветвлений рассчитываются векторными ядрами по уровням.
+        Если на вызов ядра в среднем приходится меньше min_group_size элементов,
+        схема считается обычным проходом (см. ElementStateStore.vectorized).
+        """
+        if enabled and self.state_store is None:
+            from StateStore import ElementStateStore
+            self.state_store = ElementStateStore(self, min_group_size)
+        elif enabled:
+            self.state_store.min_group_size = min_group_size
+        elif not enabled and self.state_store is not None:
+            self.state_store.write_back()
+            self.state_store = None
+        self.invalidate_plan()
+
+    def sync_state(self):
+        """Записать актуальные значения из массивов в атрибуты элементов."""
+        if self.state_store is not None:
+            self.state_store.write_back()
+
+    def invalidate_plan(self):
+        """Сбросить граф и план расчёта после изменения топологии."""
+        self.plan_ready = False
+        self.graph = None
+        self._state_valid = False
+
+    def mark_dirty(self, element):
+        """Запомнить изменённый элемент для инкрементального пересчёта."""
+        self._dirty[id(element)] = element
+        if self.state_store is not None:
+            self.state_store.params_dirty = True
 
     def remove_element(self, index):
         """Удалить элемент по индексу и обновить связи."""
-        if index in self.elements_dict:
-            # Удалить связи у других элементов
-            for elem in self.elements_dict.values():
-                if self.elements_dict[index] in elem.in_elements:
-                    elem.in_elements.remove(self.elements_dict[index])
-                if self.elements_dict[index] in elem.out_elements:
-                    elem.out_elements.remove(self.elements_dict[index])
-            # Удалить сам элемент
-            del self.elements_dict[index]
-            self.chain_ready = False
-            # self.chain_not_initialized.emit()
+        self.remove_elements((index,))
+
+    def remove_elements(self, indices):
+        """
+        Удалить элементы по индексам. Связи снимаются только у соседей удаляемых
+        элементов (по их in/out_elements); граф и план сбрасываются один раз.
+        """
+        removed = []
+        for index in indices:
+            elem = self.elements_dict.pop(index, None)
+            if elem is not None:
+                removed.append(elem)
+        if not removed:
+            return
+        sensors = set()
+        for elem in removed:
+            for prev in elem.in_elements:
+                if prev is not None:
+                    prev.remove_out_element(elem)
+            for next_elem in elem.out_elements:
+                if next_elem is not None:
+                    next_elem.remove_in_element(elem)
+            elem.scheme = None
+            self._dirty.pop(id(elem), None)
+            sensors.update(id(s) for s in getattr(elem, 'sensors', ()))
+        if sensors:
+            self.sensors = [s for s in self.sensors if id(s) not in sensors]
+        self.chain_ready = False
+        self.invalidate_plan()
+        # self.chain_not_initialized.emit()
 
     def add_element(self, element):
         element.index = self.next_index
+        element.scheme = self
         self.elements_dict[self.next_index] = element
         self.next_index += 1
         self.chain_ready = False
+        self.invalidate_plan()
+        self.chain_not_initialized.emit()
+
+    def add_elements(self, elements):
+        """
+        Массово добавить элементы с уже заданными индексами (загрузка схемы из файла).
+        Связи элементов (in/out_elements) должны быть заполнены заранее.
+        """
+        for element in elements:
+            element.scheme = self
+            self.elements_dict[element.index] = element
+            if element.index >= self.next_index:
+                self.next_index = element.index + 1
+        self.chain_ready = False
+        self.invalidate_plan()
+        self.chain_not_initialized.emit()
+
+    def clear(self):
+        """Удалить все элементы и датчики схемы."""
+        for element in self.elements_dict.values():
+            element.scheme = None
+        self.elements_dict = {}
+        self.sensors = []
+        self.next_index = 0
+        self._dirty = {}
+        self.chain_ready = False
+        self._flow_sources = []
+        self.subnetworks = []
+        self.network_solver = None
+        self.tank_integrator = None
+        self.compiled_tick = None
+        self.invalidate_plan()
         self.chain_not_initialized.emit()
 
     def connect(self, from_idx, to_idx):
         """Соединить элементы по индексам."""
-        self.elements_dict[from_idx].add_out_index(to_idx)
-        self.elements_dict[to_idx].add_in_index(from_idx)
+        from_elem = self.elements_dict[from_idx]
+        to_elem = self.elements_dict[to_idx]
+        from_elem.add_out_index(to_idx)
+        to_elem.add_in_index(from_idx)
+        if to_elem not in from_elem.out_elements:
+            from_elem.add_out_element(to_elem)
+        if from_elem not in to_elem.in_elements:
+            to_elem.add_in_element(from_elem)
+        self.invalidate_plan()
+
+    def disconnect(self, from_idx, to_idx):
+        """Разорвать соединение from_idx -> to_idx."""
+        from_elem = self.elements_dict[from_idx]
+        to_elem = self.elements_dict[to_idx]
+        from_elem.remove_out_element(to_elem)
+        to_elem.remove_in_element(from_elem)
+        self.invalidate_plan()
+
+    def predecessors(self, index):
+        """Элементы, подключённые ко входам элемента index."""
+        return [e for e in self.elements_dict[index].in_elements if e is not None]
+
+    def successors(self, index):
+        """Элементы, подключённые к выходам элемента index."""
+        return [e for e in self.elements_dict[index].out_elements if e is not None]
+
+    def neighbors(self, index):
+        return self.predecessors(index) + self.successors(index)
+
+    def validate(self):
+        """
+        Проверить схему один раз перед расчётом: число и подключение портов, параметры
+        элементов (check()), ссылки на элементы вне схемы. Возвращает список SchemeIssue.
+        """
+        issues = []
+        if not self.find_start_elements():
+            issues.append(SchemeIssue('error', 'no_source', None, "В схеме нет источника расхода"))
+        members = {id(e) for e in self.elements_dict.values()}
+        for elem in self.elements_dict.values():
+            for other in elem.in_elements + elem.out_elements:
+                if other is not None and id(other) not in members:
+                    issues.append(SchemeIssue('error', 'foreign_element', elem.index,
+                                              f"Связь с элементом {other.index}, которого нет в схеме"))
+            issues.extend(SchemeIssue(severity, code, elem.index, message)
+                          for severity, code, message in elem.check())
+        return issues
 
     def find_start_elements(self):
         """Найти все элементы FlowSourceElement как начало цепей."""
         return [e for e in self.elements_dict.values() if isinstance(e, FlowSourceElement)]
 
-    # def build_chains(self):
-    #     """Построить все возможные цепи (пути) от FlowSourceElement до стоков."""
-    #     self.chains = []
-    #     starts = self.find_start_elements()
-    #     for start in starts:
-    #         self._dfs_chain([start], set())
     def build_chains(self):
-        """Построить все цепи как простые пути по out_elements."""
-        self.chains = []
-        starts = self.find_start_elements()
-        visited_global = set()  # опционально, чтобы не стартовать из явно «внутренних» узлов
-        for start in starts:
-            self._dfs_chain(path=[start], visited=set(), start_node=start)
-        # chains теперь содержит списки индексов
+        """
+        Построить граф схемы (SchemeGraph): массивы смежности, компоненты сильной
+        связности и их конденсацию. Сами цепи больше не перечисляются заранее —
+        при необходимости их выдаёт iter_chains().
+        """
+        self.graph = SchemeGraph(self.elements_dict.values())
+        return self.graph
 
-    def print_chains(self):
-        print(self.chains)
+    def iter_chains(self):
+        """Лениво перечислить цепи (простые пути от FlowSourceElement) как списки индексов."""
+        graph = self.graph if self.graph is not None else self.build_chains()
+        starts = [graph.position[id(e)] for e in self.find_start_elements()]
+        return graph.iter_chains(starts)
+
+    def print_chains(self, limit=100):
         print('----------------------------------------------------------')
         print("CHAINS:")
-        for c in self.chains:
+        for number, c in enumerate(self.iter_chains()):
+            if number >= limit:
+                print("   ...")
+                break
             print("  ", c)
         print('----------------------------------------------------------')
         print(self.elements_dict)
@@ -108,70 +435,407 @@ class ProcessScheme(QObject):
                   f'OUT --- {obj.out_elements}\n'
                   f'----------------------------------------------------------')
 
-    # def _dfs_chain(self, path, visited):
-    #     current_idx = path[-1]
-    #     visited = visited | {current_idx}
-    #     current_elem = self.elements_dict[current_idx]
-    #     if not current_elem.out_indices:
-    #         self.chains.append(list(path))
-    #         return
-    #     for next_idx in current_elem.out_indices:
-    #         if next_idx not in visited:
-    #             self._dfs_chain(path + [next_idx], visited)
-    def _dfs_chain(self, path, visited, start_node):
-        current = path[-1]
-        visited = visited | {current}
-        out_elems = getattr(current, "out_elements", [])
-
-        # Кандидаты для продолжения — только непосещённые в этом пути
-        next_candidates = [e for e in out_elems if e not in visited]
-
-        # --- Условие конца цепи ---
-        # 1) Нет куда идти дальше (next_candidates пуст)
-        #    - это может быть конечный элемент,
-        #    - или точка, где дальше только уже посещённые (замкнули кольцо).
-        if not next_candidates:
-            # Дополнительно: если хотите явно обрабатывать замыкание на старте
-            # можно проверить, есть ли среди out_elems start_node или какой-то
-            # другой особый тип "стока".
-            self.chains.append([e.index for e in path])
-            return
-
-        # --- Продолжаем по ветвям ---
-        for next_elem in next_candidates:
-            self._dfs_chain(path + [next_elem], visited, start_node)
-
     def initialize_chains(self, p0=1.0, t0=20.0):
-        """Присвоить давление и температуру первым элементам цепей, рассчитать сопротивления ветвей."""
-        self.build_chains()
-        for chain in self.chains:
-            first_elem = self.elements_dict[chain[0]]
+        """
+        Присвоить давление и температуру источникам, рассчитать сопротивления ветвей,
+        проверить схему (validate) и задать начальные значения всем неопределённым
+        входам и выходам. При ошибках проверки — SchemeValidationError.
+        """
+        graph = self.build_chains()
+        starts = self.find_start_elements()
+        for first_elem in starts:
             first_elem.p_in = p0
             first_elem.t_in = t0
-        # Пример: рассчитать сопротивления для всех PipeIntersectionElement
-        for elem in self.elements_dict.values():
-            if hasattr(elem, 'set_resistances') and hasattr(elem, 'out_indices'):
-                resistances = []
-                for out_idx in elem.out_indices:
-                    # Найти цепь, начинающуюся с out_idx
-                    for chain in self.chains:
-                        if chain and chain[0] == out_idx:
-                            r = sum(self.elements_dict[i].get_resistance() for i in chain)
-                            resistances.append(r)
-                elem.set_resistances(resistances)
-        if len(self.chains) != 0:
+        # Сопротивления PipeIntersectionElement — суммы по неразветвлённым участкам ветвей
+        # (в узловом режиме распределение расходов считает NetworkSolver)
+        if self.hydraulic_mode == 'chain':
+            for elem in graph.elements:
+                if not isinstance(elem, PipeIntersectionElement):
+                    continue
+                node = graph.position[id(elem)]
+                downstream = elem.mode == 'split'
+                branches = graph.successors(node) if downstream else graph.predecessors(node)
+                resistances = [sum(graph.elements[v].get_resistance() for v in graph.branch_run(b, downstream))
+                               for b in branches]
+                if resistances:
+                    elem.set_resistances(resistances)
+        self.validation_issues = self.validate()
+        if any(issue.severity == 'error' for issue in self.validation_issues):
+            self.chain_ready = False
+            raise SchemeValidationError(self.validation_issues)
+        for elem in graph.elements:
+            elem.seed_state(t0, p0)
+        self.build_plan()
+        if len(starts) != 0:
             self.chain_ready = True
             self.chain_initialized.emit()
 
-    def calculate(self, flow=1.0):
-        """Задать расход первому элементу и вызвать work() у всех элементов."""
+    def solve_network(self, dt=1.0):
+        """
+        Узловой режим: давления и расходы — из NetworkSolver, затем проход по плану
+        только для температур (update_inputs + change_t) и уровней ёмкостей.
+        """
+        p, q = self.network_solver.solve()
+        self.network_solver.write_back(p, q)
+        for elem in self.plan_elements:
+            elem.update_inputs()
+            elem.change_t()
+            if isinstance(elem, PipeElementElement):
+                elem.update_sensors()
+            elif isinstance(elem, CapacityElement) and self.tank_integrator is None:
+                elem.integrate(dt)
+
+    def build_plan(self):
+        """
+        Собрать план расчёта — плоский список связанных методов work()
+        в топологическом порядке конденсации графа (кольца — от точки входа).
+        """
+        if self.graph is None:
+            self.build_chains()
+        order = [self.graph.elements[v] for v in self.graph.topological_order()]
+
+        self.plan_elements = order
+        self.plan = [elem.work for elem in order]
+        self._plan_position = {id(elem): i for i, elem in enumerate(order)}
+        position = self._plan_position
+        self._loop_entries = [elem for elem in order
+                              if any(prev is not None and position.get(id(prev), -1) >= position[id(elem)]
+                                     for prev in elem.in_elements)]
+        self._deferred = []
+        if self.state_store is not None:
+            self.state_store.compile(order)
+        self.network_solver = None
+        if self.hydraulic_mode == 'network':
+            from NetworkSolver import NetworkSolver
+            self.network_solver = NetworkSolver(order, **self._solver_options)
+        self.tank_integrator = None
+        if self._integrator_options is not None:
+            from Integrators import TankIntegrator
+            self.tank_integrator = TankIntegrator([e for e in order if isinstance(e, CapacityElement)],
+                                                  **self._integrator_options)
+        self._flow_sources = [e for e in order if isinstance(e, FlowSourceElement)]
+        graph = self.graph
+        self.subnetworks = [Subnetwork([graph.elements[v] for v in part]) for part in graph.weak_components()]
+        self._fluid_elements = []
+        if self.water_properties:
+            self._fluid_elements = [e for e in order
+                                    if isinstance(e, (PipeElementElement, BoilerElement, ThermalFluidElement))]
+        self.compiled_tick = None
+        if self.compile_tick and self.profiler is None:
+            from TickCompiler import compile_tick
+            self.compiled_tick = compile_tick(order)
+        if self.profiler is not None:
+            self.profiler.instrument(self)
+        self.plan_ready = True
+
+    def set_flow(self, flow):
+        """Задать расход источникам: число — всем, словарь {индекс источника: расход} — выборочно."""
+        if isinstance(flow, dict):
+            for index, value in flow.items():
+                self.elements_dict[index].set_flow(value)
+        else:
+            for source in self._flow_sources:
+                source.set_flow(flow)
+
+    def calculate(self, flow=1.0, dt=1.0):
+        """
+        Задать расход источникам (см. set_flow) и выполнить план расчёта за один проход.
+        dt — шаг модельного времени (с), передаётся в work() всех элементов.
+        Независимые участки схемы считаются по отдельности (при workers > 1 — параллельно).
+        """
         if self.chain_ready:
-            if self.chains and self.chains[0]:
-                first_elem = self.elements_dict[self.chains[0][0]]
-                if hasattr(first_elem, 'set_flow'):
-                    first_elem.set_flow(flow)
-            for idx in self.elements_dict:
-                self.elements_dict[idx].work()
+            if not self.plan_ready:
+                self.build_plan()
+            self.sim_time += dt
+            self.changed_sensors = []
+            self.set_flow(flow)
+            arrays = self.state_store is not None and self.state_store.vectorized
+            if self.water_properties:
+                if arrays:
+                    self.state_store.update_water_properties()
+                else:
+                    self.update_water_properties()
+            if self.network_solver is not None:
+                self.solve_network(dt)
+            elif arrays:
+                self.state_store.run(dt)
+            elif self.incremental and self._state_valid:
+                self.recalculate(dt)
+            elif self.compiled_tick is not None:
+                self.compiled_tick(dt)
+            else:
+                self._run_subnetworks(dt)
+            if not (self.incremental and self._state_valid):
+                # Полный проход прочитал обратные рёбра колец со значениями прошлого такта
+                self._deferred = list(self._loop_entries)
+            if self.tank_integrator is not None:
+                self.tank_integrator.step(dt)
+            if self.noise is not None:
+                self.noise.publish(self, self.sim_time)
+            if self.history is not None:
+                self.history.record(self.sim_time, self.changed_sensors)
+            if self.alarms is not None:
+                self.alarms.evaluate(self.sensors, dt)
+            self._state_valid = True
+            self._clear_dirty()
+            if self.changed_sensors:
+                self.sensors_changed.emit(self.changed_sensors)
+
+    def _run_subnetworks(self, dt):
+        subnetworks = self.subnetworks
+        if self.workers > 1 and len(subnetworks) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            for future in [self._pool.submit(sub.run, dt) for sub in subnetworks]:
+                future.result()
+        else:
+            for sub in subnetworks:
+                sub.run(dt)
+
+    def recalculate(self, dt=1.0):
+        """
+        Инкрементальный пересчёт: work() только для изменённых элементов (и элементов
+        с собственной динамикой) и их нижестоящего конуса, в топологическом порядке.
+        Распространение останавливается, если выходы изменились меньше dirty_tolerance.
+        Как и полный проход, каждый элемент считается за такт не более одного раза:
+        обратные рёбра колец не пересчитываются сразу, их элементы откладываются
+        на следующий такт (_deferred), поэтому результат совпадает с calculate().
+        Возвращает число выполненных вызовов work().
+        """
+        if not self.plan_ready:
+            self.build_plan()
+        arrays = self.state_store is not None and self.state_store.vectorized
+        if self.network_solver is not None or arrays or not self._state_valid:
+            # Узловой и массивный расчёт (и первый проход) выполняются целиком
+            incremental, self.incremental = self.incremental, False
+            self.calculate({s.index: s.f_out for s in self._flow_sources}, dt)
+            self.incremental = incremental
+            return len(self.plan)
+
+        position = self._plan_position
+        queue = []
+        queued = set()
+        for elem in list(self._dirty.values()) + self._deferred + [e for e in self.plan_elements if e.dynamic]:
+            if id(elem) in position and id(elem) not in queued:
+                queued.add(id(elem))
+                heapq.heappush(queue, (position[id(elem)], id(elem), elem))
+
+        deferred = []
+        calls = 0
+        tolerance = self.dirty_tolerance
+        while queue:
+            current, key, elem = heapq.heappop(queue)
+            before = _element_outputs(elem)
+            elem.work(dt)
+            calls += 1
+            forced = elem.dirty
+            elem.dirty = False
+            if not forced and not _outputs_changed(before, _element_outputs(elem), tolerance):
+                continue
+            for next_elem in elem.out_elements:
+                if next_elem is None:
+                    continue
+                next_key = id(next_elem)
+                if next_key not in position:
+                    continue
+                if position[next_key] <= current:
+                    deferred.append(next_elem)  # обратное ребро кольца — вход изменится на следующем такте
+                elif next_key not in queued:
+                    queued.add(next_key)
+                    heapq.heappush(queue, (position[next_key], next_key, next_elem))
+        self._clear_dirty()
+        self._deferred = deferred
+        return calls
+
+    def solve_steady_state(self, flow=1.0, tolerance=1e-6, max_iterations=100, relaxation=1.0,
+                           accelerate=False):
+        """
+        Стационарный расчёт (dt = 0, уровни ёмкостей не меняются). Компоненты сильной
+        связности обходятся в топологическом порядке: ациклические считаются одним work(),
+        кольца — итерациями Гаусса–Зейделя с нижней/верхней релаксацией (relaxation)
+        и, при accelerate, векторным ускорением Эйткена, пока максимальная невязка
+        t/p/f выходов не станет меньше tolerance или не исчерпается max_iterations.
+        Начальное приближение — текущие значения элементов (прошлый такт);
+        при холодном старте пустые выходы элементов кольца принимаются нулевыми.
+
+        Возвращает отчёт по кольцам: [{'elements': [индексы], 'iterations': n,
+        'residual': r, 'converged': bool}]; он же сохраняется в steady_state_report.
+        """
+        if not self.chain_ready:
+            return []
+        if not self.plan_ready:
+            self.build_plan()
+        self.set_flow(flow)
+        self.sync_state()
+        graph = self.graph
+        if self.network_solver is not None:
+            # Давления и расходы — прямое решение узловой системы, итерируются только температуры
+            p, q = self.network_solver.solve()
+            self.network_solver.write_back(p, q)
+            step = _thermal_step
+        else:
+            step = _steady_step
+
+        report = []
+        for component, members in enumerate(graph.components):
+            elements = [graph.elements[v] for v in members]
+            if not graph.is_cyclic(component):
+                for elem in elements:
+                    step(elem)
+                continue
+            for elem in elements:
+                _seed_outputs(elem)
+            history = []
+            residual = float('inf')
+            iterations = 0
+            while iterations < max_iterations and residual > tolerance:
+                iterations += 1
+                residual = 0.0
+                for elem in elements:
+                    before = _output_values(elem)
+                    step(elem)
+                    after = _output_values(elem)
+                    if relaxation != 1.0 and len(before) == len(after):
+                        after = [b + relaxation * (a - b) if a is not None and b is not None else a
+                                 for a, b in zip(after, before)]
+                        _store_output_values(elem, after)
+                    residual = max(residual, _residual(before, after))
+                if accelerate and residual > tolerance:
+                    history.append([v for elem in elements for v in _output_values(elem)])
+                    if len(history) == 3:
+                        accelerated = _aitken(*history)
+                        if accelerated is not None:
+                            position = 0
+                            for elem in elements:
+                                size = len(_output_values(elem))
+                                _store_output_values(elem, accelerated[position:position + size])
+                                position += size
+                        history.clear()
+            report.append({'elements': [elem.index for elem in elements], 'iterations': iterations,
+                           'residual': residual, 'converged': residual <= tolerance})
+
+        if self.state_store is not None and self.state_store.vectorized:
+            self.state_store.read_back(self.plan_elements)
+        self.steady_state_report = report
+        self._state_valid = True
+        self._clear_dirty()
+        return report
+
+    def _clear_dirty(self):
+        for elem in self._dirty.values():
+            elem.dirty = False
+        self._dirty.clear()
+
+
+class Subnetwork:
+    """
+    Гидравлически независимый участок схемы (компонента слабой связности):
+    свои элементы в порядке расчёта, свой план и свои источники.
+    """
+    __slots__ = ('elements', 'plan', 'sources', 'elapsed')
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.plan = [elem.work for elem in elements]
+        self.sources = [elem for elem in elements if isinstance(elem, FlowSourceElement)]
+        self.elapsed = 0.0  # длительность последнего такта, с
+
+    def run(self, dt):
+        start = time.perf_counter()
+        for work in self.plan:
+            work(dt)
+        self.elapsed = time.perf_counter() - start
+
+
+def _element_outputs(elem):
+    """Снимок выходов элемента для сравнения до/после work()."""
+    return (elem.t_out, elem.p_out, elem.f_out,
+            getattr(elem, 't_out_list', None), getattr(elem, 'p_out_list', None),
+            getattr(elem, 'f_out_list', None))
+
+
+def _outputs_changed(before, after, tolerance):
+    for a, b in zip(before, after):
+        if a is b:
+            continue
+        if isinstance(a, list) or isinstance(b, list):
+            if a is None or b is None or len(a) != len(b) or _outputs_changed(a, b, tolerance):
+                return True
+        elif a is None or b is None or abs(a - b) > tolerance:
+            return True
+    return False
+
+
+_OUTPUT_FIELDS = ('t_out', 'p_out', 'f_out', 't_out_list', 'p_out_list', 'f_out_list')
+
+
+def _output_values(elem):
+    """Выходы элемента плоским списком (значения ветвей разветвителей — подряд)."""
+    values = []
+    for name in _OUTPUT_FIELDS:
+        value = getattr(elem, name, None)
+        if isinstance(value, list):
+            values.extend(value)
+        elif not name.endswith('_list'):
+            values.append(value)
+    return values
+
+
+def _store_output_values(elem, values):
+    """Записать выходы элемента из плоского списка (раскладка как у _output_values)."""
+    position = 0
+    for name in _OUTPUT_FIELDS:
+        value = getattr(elem, name, None)
+        if isinstance(value, list):
+            value[:] = values[position:position + len(value)]
+            position += len(value)
+        elif not name.endswith('_list'):
+            setattr(elem, name, values[position])
+            position += 1
+
+
+def _residual(before, after):
+    if len(before) != len(after):
+        return float('inf')
+    residual = 0.0
+    for a, b in zip(before, after):
+        if a is None and b is None:
+            continue
+        if a is None or b is None:
+            return float('inf')
+        residual = max(residual, abs(a - b))
+    return residual
+
+
+def _aitken(x0, x1, x2):
+    """Векторное ускорение Эйткена (Айронс–Так) по трём последовательным итерациям."""
+    if not len(x0) == len(x1) == len(x2) or None in x0 or None in x1 or None in x2:
+        return None
+    d1 = [b - a for a, b in zip(x0, x1)]
+    d2 = [b - a for a, b in zip(x1, x2)]
+    dd = [b - a for a, b in zip(d1, d2)]
+    norm = sum(v * v for v in dd)
+    if norm < 1e-30:
+        return None
+    factor = sum(a * b for a, b in zip(d2, dd)) / norm
+    return [x - factor * d for x, d in zip(x2, d2)]
+
+
+def _seed_outputs(elem):
+    for name in ('t_out', 'p_out', 'f_out'):
+        if getattr(elem, name) is None:
+            setattr(elem, name, 0.0)
+
+
+def _steady_step(elem):
+    elem.work(0.0)
+
+
+def _thermal_step(elem):
+    elem.update_inputs()
+    elem.change_t()
+    if isinstance(elem, PipeElementElement):
+        elem.update_sensors()
 
 
 '''
@@ -181,7 +845,103 @@ class ProcessScheme(QObject):
 
 
 
-class BaseElement:#Базовый элемент
+_PARAMETER_SCHEMAS = {}  # класс -> (схема параметров, имена, функция чтения значений, позиция паспорта)
+
+
+class Parametrized:
+    """
+    Параметры элемента для редактора, сохранения и обмена: статическая схема
+    (тип, подпись, min/max, варианты) объявляется в PARAMETERS каждого класса и
+    собирается по иерархии один раз на класс; значения читаются отдельно.
+    Ключ 'attr' — атрибут, в котором хранится значение (по умолчанию — имя параметра).
+    """
+    __slots__ = ()
+    PARAMETERS = {}
+
+    @classmethod
+    def _parameter_entry(cls):
+        entry = _PARAMETER_SCHEMAS.get(cls)
+        if entry is None:
+            schema = {}
+            passport = 0
+            # Сначала параметры самого класса, затем базовых; при совпадении имени побеждает подкласс.
+            # Паспорт объекта ('object') — перед параметрами корневого класса иерархии
+            for klass in cls.__mro__:
+                if Parametrized in klass.__bases__:
+                    passport = len(schema)
+                for name, meta in vars(klass).get('PARAMETERS', {}).items():
+                    if name not in schema:
+                        schema[name] = dict(meta, attr=meta.get('attr', name))
+            names = tuple(schema)
+            attrs = [meta['attr'] for meta in schema.values()]
+            if len(attrs) == 1:
+                single = attrgetter(attrs[0])
+                read = lambda obj: (single(obj),)
+            else:
+                read = attrgetter(*attrs) if attrs else (lambda obj: ())
+            entry = _PARAMETER_SCHEMAS[cls] = (schema, names, read, passport)
+        return entry
+
+    @classmethod
+    def parameter_schema(cls) -> dict:
+        """Схема параметров класса {имя: {type, label, min, max, choices, attr}} (общая, не изменять)."""
+        return cls._parameter_entry()[0]
+
+    def get_parameter_values(self) -> dict:
+        """Текущие значения параметров {имя: значение} — без метаданных."""
+        _, names, read, _ = self._parameter_entry()
+        return dict(zip(names, read(self)))
+
+    def get_parameters(self) -> dict:
+        """Паспорт объекта и параметры со значениями (формат редактора настроек)."""
+        schema, names, read, passport = self._parameter_entry()
+        parameters = {}
+        for k, (name, value) in enumerate(zip(names, read(self))):
+            if k == passport:
+                parameters['object'] = self._passport()
+            parameters[name] = dict(schema[name], value=value)
+        if 'object' not in parameters:
+            parameters['object'] = self._passport()
+        return parameters
+
+    def _passport(self):
+        return {
+            'object' : {'value' : self, 'type' : 'str', 'label' : 'Имя экземпляра'},
+            'tag' : {'value' : self.tag, 'type' : 'str', 'label' : 'Тег'},
+            'index' : {'value' : self.index, 'type' : 'int', 'label' : 'Индекс'},
+        }
+
+
+# Свойства воды по умолчанию (без таблиц WaterProperties)
+WATER_DENSITY = 1000.0        # кг/м3
+WATER_HEAT_CAPACITY = 4200.0  # Дж/(кг*К)
+WATER_VISCOSITY = 1e-3        # Па*с
+
+
+def darcy_friction(reynolds, relative_roughness):
+    """
+    Коэффициент трения Дарси: 64/Re в ламинарной области (Re < 2300), формула
+    Свами–Джейна в турбулентной (Re > 4000), в переходной — линейно между ними.
+    """
+    if reynolds < 2300.0:
+        return 64.0 / reynolds
+    turbulent = 0.25 / math.log10(relative_roughness / 3.7 + 5.74 / max(reynolds, 4000.0) ** 0.9) ** 2
+    if reynolds >= 4000.0:
+        return turbulent
+    weight = (reynolds - 2300.0) / 1700.0
+    return (1 - weight) * 64.0 / 2300.0 + weight * turbulent
+
+
+class BaseElement(Parametrized):#Базовый элемент
+    __slots__ = ('index', 'tag', 'in_indices', 'out_indices', 'in_elements', 'out_elements',
+                 't_in', 'p_in', 'f_in', 't_out', 'p_out', 'f_out', '_resistance', 'scheme', 'dirty',
+                 'modbus')
+    PARAMETERS = {
+        'tag': {'type': 'str', 'label': 'Тег'},
+        'resistance': {'attr': '_resistance', 'type': 'float', 'min': 0.0, 'max': 1.0, 'label': 'Гидр. сопротивление'},
+    }
+    dynamic = False  # Состояние меняется во времени сам по себе (пересчитывается каждый такт)
+
     @staticmethod
     def rattle(val:float, val_range:float) -> float:#Дребезг показаний
         val = val - val_range + random.uniform(0, val_range * 2)
@@ -202,6 +962,15 @@ class BaseElement:#Базовый элемент
         self.p_out = None
         self.f_out = None
         self._resistance = 0.0
+        self.scheme = None   # Схема, в которую добавлен элемент
+        self.dirty = False   # Параметры изменены, требуется пересчёт нижестоящего конуса
+        self.modbus = None   # Модель обмена Modbus (inputs/outputs) для ModbusAddressMapGenerator
+
+    def mark_dirty(self):
+        """Отметить элемент изменённым: схема пересчитает его и нижестоящие элементы."""
+        self.dirty = True
+        if self.scheme is not None:
+            self.scheme.mark_dirty(self)
 
     def add_in_index(self, idx):
         if idx not in self.in_indices:
@@ -218,6 +987,7 @@ class BaseElement:#Базовый элемент
     @resistance.setter
     def resistance(self, value):
         self._resistance = value
+        self.mark_dirty()
 
     def get_resistance(self):
         return self.resistance
@@ -228,12 +998,50 @@ class BaseElement:#Базовый элемент
     def add_out_element(self, element):
         self.out_elements.append(element)
 
+    def remove_in_element(self, element):
+        if element in self.in_elements:
+            self.in_elements.remove(element)
+        if element.index in self.in_indices:
+            self.in_indices.remove(element.index)
+
+    def remove_out_element(self, element):
+        if element in self.out_elements:
+            self.out_elements.remove(element)
+        if element.index in self.out_indices:
+            self.out_indices.remove(element.index)
+
+    def get_outputs_for(self, element):
+        """Параметры (t, p, f), которые получает конкретный нижестоящий элемент."""
+        return self.t_out, self.p_out, self.f_out
+
+    def check(self):
+        """Замечания к элементу перед расчётом: список (severity, code, message)."""
+        issues = []
+        if not self.in_elements and not isinstance(self, FlowSourceElement):
+            issues.append(('warning', 'no_input', "Вход не подключён: элемент считается от начальных p0/t0"))
+        if self._resistance < 0:
+            issues.append(('error', 'resistance', "Отрицательное гидравлическое сопротивление"))
+        return issues
+
+    def seed_state(self, t0, p0):
+        """Начальные значения неопределённых входов и выходов (до первого такта)."""
+        if self.t_in is None:
+            self.t_in = t0
+        if self.p_in is None:
+            self.p_in = p0
+        if self.f_in is None:
+            self.f_in = 0.0
+        if self.t_out is None:
+            self.t_out = self.t_in
+        if self.p_out is None:
+            self.p_out = self.p_in
+        if self.f_out is None:
+            self.f_out = 0.0
+
     def update_inputs(self):
         # Для простых случаев: берем параметры первого входного элемента
         if self.in_elements:
-            self.t_in = self.in_elements[0].t_out
-            self.p_in = self.in_elements[0].p_out
-            self.f_in = self.in_elements[0].f_out
+            self.t_in, self.p_in, self.f_in = self.in_elements[0].get_outputs_for(self)
 
     def change_t(self):# Изменение температуры
         self.t_out = self.t_in
@@ -244,7 +1052,7 @@ class BaseElement:#Базовый элемент
     def change_f(self):# Изменение расхода
         self.f_out = self.f_in
 
-    def work(self):# Вызов параметров изменения
+    def work(self, dt=None):# Вызов параметров изменения (dt — шаг времени, с; нужен динамическим элементам)
         self.update_inputs()
         self.change_t()
         self.change_p()
@@ -253,50 +1061,21 @@ class BaseElement:#Базовый элемент
     def depressurization(self, breach_percent=None):
         pass
 
-    def get_parameters(self) -> dict:
-        parameters = {
-            'object' : {
-                'object' : {
-                    'value' : self,
-                    'type' : 'str',
-                    'label' : 'Имя экземпляра'
-                },
-                'tag' : {
-                    'value' : self.tag,
-                    'type' : 'str',
-                    'label' : 'Тег'
-                },
-                'index' : {
-                    'value' : self.index,
-                    'type' : 'int',
-                    'label' : 'Индекс'
-                }
-            },
-            'tag' : {
-                'value' : self.tag,
-                'type' : 'str',
-                'label' : 'Тег'
-            },
-            'resistance' : {
-                'value' : self._resistance,
-                "type": "float",
-                "min": 0.0,
-                "max": 1.0,
-                "label": "Гидр. сопротивление"
-            }
-        }
-        return parameters
 
 class FlowSourceElement(BaseElement):
     """
     Источник расхода: задаёт f_out по сигналу от управляющего класса схемы.
     """
+    __slots__ = ()
+
     def __init__(self, in_elements=None):
         super().__init__(in_elements)
         self.f_out = 0.0
 
     def set_flow(self, flow):
-        self.f_out = flow
+        if flow != self.f_out:
+            self.f_out = flow
+            self.mark_dirty()
 
     def change_f(self):
         # Расход задаётся внешним сигналом, не пересчитывается
@@ -304,61 +1083,96 @@ class FlowSourceElement(BaseElement):
 
     def change_p(self):
         # Давление на выходе можно задать или рассчитать по схеме
-        self.p_out = self.p_in if self.p_in is not None else 0.0
+        self.p_out = self.p_in
 
     def change_t(self):
         self.t_out = self.t_in
 
 
-class Sensor:
+class Sensor(Parametrized):
+    """
+    Датчик на трубе. Значение публикуется (value меняется) только при выходе показания
+    за зону нечувствительности deadband от последнего опубликованного или по истечении
+    max_age (с модельного времени, 0 — без ограничения).
+    """
+    __slots__ = ('sensor_type', 'value', 'index', 'tag', 'alarm_limits', 'alarm', 'deadband', 'max_age',
+                 'published_at')
+    PARAMETERS = {
+        'sensor_type': {'type': 'choice', 'choices': ['pressure', 'temperature', 'flow'], 'label': 'Тип датчика'},
+        'deadband': {'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Зона нечувствительности'},
+        'max_age': {'type': 'float', 'min': 0.0, 'max': 86400.0, 'label': 'Макс. период публикации, с'},
+    }
+    limits_version = 0  # растёт при изменении уставок и параметров публикации (AlarmEngine, SensorNoise перестраивают массивы)
+
     def __init__(self, sensor_type):
         self.sensor_type = sensor_type
         self.value = None
         self.index = None
         self.tag = None
-
-    def update(self, value, rattle_range=0.0):
-        # Обновить значение с учетом дребезга
-        if rattle_range > 0:
-            self.value = BaseElement.rattle(value, rattle_range)
+        self.alarm_limits = None  # (HIHI, HI, LO, LOLO, зона возврата, задержка) или None
+        self.alarm = None         # старший активный уровень сигнализации ('HIHI', 'HI', 'LO', 'LOLO')
+        self.deadband = 0.0       # 0 — публикуется любое изменение
+        self.max_age = 0.0
+        self.published_at = 0.0   # модельное время последней публикации, с
+
+    def set_alarm_limits(self, hihi=None, hi=None, lo=None, lolo=None, deadband=0.0, delay=0.0):
+        """Задать уставки сигнализации (None — уровень не контролируется); без аргументов — снять."""
+        limits = (hihi, hi, lo, lolo)
+        if all(x is None for x in limits):
+            self.alarm_limits = None
+            self.alarm = None
         else:
-            self.value = value
+            if deadband < 0 or delay < 0:
+                raise ValueError("Зона возврата и задержка сигнализации не могут быть отрицательными")
+            self.alarm_limits = tuple(float('nan') if x is None else float(x) for x in limits) + \
+                (float(deadband), float(delay))
+        Sensor.limits_version += 1
+
+    def set_deadband(self, deadband):
+        if deadband < 0:
+            raise ValueError("Зона нечувствительности не может быть отрицательной")
+        self.deadband = deadband
+        Sensor.limits_version += 1
+
+    def set_max_age(self, max_age):
+        if max_age < 0:
+            raise ValueError("Период публикации не может быть отрицательным")
+        self.max_age = max_age
+        Sensor.limits_version += 1
+
+    def update(self, value, rattle_range=0.0, now=0.0):
+        """Новое показание (с учётом дребезга); True, если значение опубликовано."""
+        if rattle_range > 0:
+            value = BaseElement.rattle(value, rattle_range)
+        last = self.value
+        if last is None or value is None:
+            if value is last:
+                return False
+        elif abs(value - last) <= self.deadband and not (self.max_age and now - self.published_at >= self.max_age):
+            return False
+        self.value = value
+        self.published_at = now
+        return True
 
     def get(self):
         return self.value
 
-    def get_parameters(self) -> dict:
-        parameters = {
-            'object' : {
-                'object' : {
-                    'value' : self,
-                    'type' : 'str',
-                    'label' : 'Имя экземпляра'
-                },
-                'tag' : {
-                    'value' : self.tag,
-                    'type' : 'str',
-                    'label' : 'Тег'
-                },
-                'index' : {
-                    'value' : self.index,
-                    'type' : 'int',
-                    'label' : 'Индекс'
-                }
-            },
-            'sensor_type' : {
-                "value": self.sensor_type,
-                "type": "choice",
-                "choices": ["pressure", "temperature", "flow"],
-                "label": "Тип датчика"
-            }
-        }
-        return parameters
 
 class PipeElementElement(BaseElement):
     """
     Упрощённая труба с поддержкой датчиков.
     """
+    __slots__ = ('length', 'diameter', 'sensors', 'breach', 'breach_percent', 'friction_model', 'roughness',
+                 'rho', 'cp', 'mu')
+    PARAMETERS = {
+        'length': {'type': 'float', 'min': 0.0, 'max': 9999999.0, 'label': 'Длина трубы'},
+        'diameter': {'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Диаметр трубы'},
+        'breach': {'type': 'bool', 'label': 'Прорыв'},
+        'breach_percent': {'type': 'float', 'min': 0.0, 'max': 100.0, 'label': 'Прорыв процент'},
+        'friction_model': {'type': 'choice', 'choices': ['linear', 'darcy'], 'label': 'Модель трения'},
+        'roughness': {'type': 'float', 'min': 0.0, 'max': 0.01, 'label': 'Шероховатость, м'},
+    }
+
     def __init__(self, length, diameter):
         super().__init__()
         self.length = length
@@ -366,55 +1180,68 @@ class PipeElementElement(BaseElement):
         self.sensors = []
         self.breach = False
         self.breach_percent = 0.0
+        # 'linear' — dP = R * L * Q; 'darcy' — Дарси–Вейсбах с коэффициентом трения по числу Рейнольдса
+        self.friction_model = 'linear'
+        self.roughness = 5e-5  # абсолютная шероховатость стенки, м
+        # Свойства воды (обновляются схемой по таблицам WaterProperties, если включено)
+        self.rho = WATER_DENSITY
+        self.cp = WATER_HEAT_CAPACITY
+        self.mu = WATER_VISCOSITY
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'length' : {
-                'value' : self.length,
-                "type": "float",
-                "min": 0.0,
-                "max": 9999999.0,
-                "label": "Длина трубы"
-            },
-            'diameter' : {
-                'value' : self.diameter,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Диаметр трубы"
-            },
-            'breach' : {
-                'value' : self.breach,
-                'type' : 'bool',
-                'label' : 'Прорыв'
-            },
-            'breach_percent' : {
-                'value' : self.breach_percent,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Прорыв процент"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
 
     def add_sensor(self, sensor):
         self.sensors.append(sensor)
 
     def update_sensors(self):
-        # Передаём актуальные значения всем сенсорам
+        # Передаём актуальные значения всем сенсорам; опубликованные попадают в список изменений схемы
+        scheme = self.scheme
+        if scheme is not None and scheme.noise is not None:
+            return  # показания публикует схема после такта (SensorNoise)
+        now = scheme.sim_time if scheme is not None else 0.0
         for sensor in self.sensors:
             if sensor.sensor_type == 'pressure':
-                sensor.update(self.p_out, rattle_range=0.1)
+                published = sensor.update(self.p_out, rattle_range=0.1, now=now)
             elif sensor.sensor_type == 'flow':
-                sensor.update(self.f_out, rattle_range=0.05)
+                published = sensor.update(self.f_out, rattle_range=0.05, now=now)
             elif sensor.sensor_type == 'temperature':
-                sensor.update(self.t_out, rattle_range=0.2)
+                published = sensor.update(self.t_out, rattle_range=0.2, now=now)
+            else:
+                published = False
+            if published and scheme is not None:
+                scheme.changed_sensors.append(sensor)
+
+    def set_friction_model(self, model):
+        if model not in ('linear', 'darcy'):
+            raise ValueError(f"Неизвестная модель трения: {model}")
+        self.friction_model = model
+        self.mark_dirty()
+        if self.scheme is not None:
+            self.scheme.invalidate_plan()  # векторное ядро труб считает только линейную модель
+
+    def check(self):
+        issues = super().check()
+        if self.length < 0:
+            issues.append(('error', 'length', "Отрицательная длина трубы"))
+        if self.diameter <= 0:
+            if self.friction_model == 'darcy':
+                issues.append(('error', 'diameter', "Нулевой диаметр трубы при модели трения Дарси"))
+            else:
+                issues.append(('warning', 'diameter', "Нулевой диаметр трубы"))
+        return issues
+
+    def friction_drop(self, flow):
+        """Потеря давления на трение при расходе flow (м3/с), МПа."""
+        if self.friction_model != 'darcy':
+            return self._resistance * self.length * flow
+        if not flow or self.diameter <= 0:
+            return 0.0
+        velocity = flow / (math.pi * self.diameter ** 2 / 4)
+        reynolds = self.rho * abs(velocity) * self.diameter / self.mu
+        friction = darcy_friction(reynolds, self.roughness / self.diameter)
+        return friction * self.length / self.diameter * self.rho * velocity * abs(velocity) / 2 / 1e6
 
     def change_p(self):
-        dP = self._resistance * self.length * self.f_in
+        dP = self.friction_drop(self.f_in)
         if self.breach and self.breach_percent > 0:
             breach_factor = min(self.breach_percent, 1.0)
             dP += 5 * breach_factor * self.p_in
@@ -430,14 +1257,15 @@ class PipeElementElement(BaseElement):
             lost_flow = self.f_in * breach_factor
             self.f_out = max(self.f_in - lost_flow, 0.0)
 
-    def work(self):
-        super().work()
+    def work(self, dt=None):
+        super().work(dt)
         self.update_sensors()
 
     def depressurization(self, breach_percent = None):
         if breach_percent is not None:
             self.breach = True
             self.breach_percent = breach_percent
+            self.mark_dirty()
 
     def get_resistance(self):
         return self._resistance * self.length
@@ -447,6 +1275,8 @@ class PipeChangeElement(BaseElement):
     Сужение/расширение трубы.
     Меняет диаметр, пересчитывает скорость и потери давления.
     """
+    __slots__ = ('new_diameter', 'length')
+
     def __init__(self, new_diameter, length=1.0):
         super().__init__()
         self.new_diameter = new_diameter  # Новый диаметр после сужения/расширения (м)
@@ -473,25 +1303,42 @@ class PipeChangeElement(BaseElement):
     def get_resistance(self):
         return self.resistance
 
+    def check(self):
+        issues = super().check()
+        if self.new_diameter <= 0:
+            issues.append(('error', 'diameter', "Нулевой диаметр после сужения/расширения"))
+        elif self.upstream_diameter() is None:
+            issues.append(('warning', 'diameter',
+                           "Перед сужением/расширением нет одной трубы с диаметром > 0: местные потери не учитываются"))
+        return issues
+
+    def upstream_diameter(self):
+        """Диаметр единственной подводящей трубы или None, если вход — не труба с диаметром > 0."""
+        if len(self.in_elements) == 1:
+            diameter = getattr(self.in_elements[0], 'diameter', None)
+            if diameter is not None and diameter > 0:
+                return diameter
+        return None
+
     def change_f(self):
         # Расход сохраняется (если нет утечек)
-        if self.in_elements:
-            self.f_out = self.f_in
+        self.f_out = self.f_in
 
     def change_p(self):
-        # Упрощённо: потери давления на сужении/расширении (формула Бернулли + локальные потери)
-        if self.in_elements:
-            rho = 1000  # кг/м3 (вода)
-            S1 = (self.in_elements[0].f_in) / (self.f_in + 1e-9)  # старый расход/новый расход (почти всегда 1)
-            v1 = self.f_in / (3.1415 * (self.in_elements[0].f_in / (self.f_in + 1e-9)) ** 2 / 4 + 1e-9)
-            v2 = self.f_in / (3.1415 * (self.new_diameter / 2) ** 2 + 1e-9)
-            # Потери на сужении/расширении (локальные)
-            ksi = abs(1 - (self.new_diameter / self.in_elements[0].f_in) ** 2) ** 2  # упрощённо
-            dP_local = 0.5 * rho * (v2 - v1) ** 2 * ksi
-            # Линейные потери (очень упрощённо)
-            K = 0.05
-            dP_linear = K * self.length * self.f_in
-            self.p_out = self.p_in - dP_local - dP_linear
+        # Упрощённо: потери давления на сужении/расширении (формула Бернулли + локальные потери).
+        # new_diameter > 0 проверен при validate(); без подводящей трубы местных потерь нет
+        rho = 1000  # кг/м3 (вода)
+        d2 = self.new_diameter
+        d1 = self.upstream_diameter() or d2
+        v1 = self.f_in / (math.pi * d1 ** 2 / 4)
+        v2 = self.f_in / (math.pi * d2 ** 2 / 4)
+        # Потери на сужении/расширении (локальные)
+        ksi = (1 - (d2 / d1) ** 2) ** 2  # упрощённо
+        dP_local = 0.5 * rho * (v2 - v1) ** 2 * ksi / 1e6  # Па -> МПа
+        # Линейные потери (очень упрощённо)
+        K = 0.05
+        dP_linear = K * self.length * self.f_in
+        self.p_out = self.p_in - dP_local - dP_linear
 
 
 
@@ -500,6 +1347,8 @@ class PipeIntersectionElement(BaseElement):
     """
     Узел пересечения труб: может быть разветвителем (split) или сборщиком (merge).
     """
+    __slots__ = ('resistances', 'mode', 'f_out_list', 't_out_list', 'p_out_list')
+
     def __init__(self, resistances=None, mode='split'):
         """
         resistances: список коэффициентов сопротивления для каждой ветви (float)
@@ -510,9 +1359,18 @@ class PipeIntersectionElement(BaseElement):
         self.resistances = resistances if resistances is not None else []
         self.mode = mode
 
+    def get_outputs_for(self, element):
+        # У разветвителя у каждой ветви свои параметры
+        if self.mode == 'split' and getattr(self, 'f_out_list', None):
+            for idx, elem in enumerate(self.out_elements):
+                if elem is element:
+                    return self.t_out_list[idx], self.p_out_list[idx], self.f_out_list[idx]
+        return super().get_outputs_for(element)
+
     def set_resistances(self, resistances):
         """Установить новые значения сопротивлений для ветвей."""
         self.resistances = resistances
+        self.mark_dirty()
 
     def get_resistance(self):
         # Например, среднее сопротивление всех ветвей
@@ -520,28 +1378,44 @@ class PipeIntersectionElement(BaseElement):
             return sum(self.resistances) / len(self.resistances)
         return 0.05  # как у трубы по умолчанию
 
+    def check(self):
+        issues = [issue for issue in super().check() if issue[1] != 'no_input']
+        chain = self.scheme is None or self.scheme.hydraulic_mode == 'chain'
+        if self.mode == 'split':
+            if len(self.in_elements) != 1:
+                issues.append(('error', 'ports', "Для split должен быть ровно один входной элемент"))
+            if not self.out_elements:
+                issues.append(('error', 'ports', "У split нет выходных элементов"))
+            elif chain and len(self.resistances) < len(self.out_elements):
+                issues.append(('error', 'resistances', "Сопротивления заданы не для всех ветвей split"))
+        elif self.mode == 'merge':
+            if len(self.in_elements) < 2:
+                issues.append(('error', 'ports', "Для merge должно быть два или более входных элемента"))
+            elif chain and len(self.resistances) < len(self.in_elements):
+                issues.append(('error', 'resistances', "Сопротивления заданы не для всех ветвей merge"))
+        else:
+            issues.append(('error', 'mode', f"Неизвестный режим узла: {self.mode}"))
+        return issues
+
     def update_inputs(self):
+        # Число входов проверено при validate()
         if self.mode == 'split':
-            if not self.in_elements or len(self.in_elements) != 1:
-                raise ValueError("Для split должен быть ровно один входной элемент.")
             self.t_in = self.in_elements[0].t_out
             self.p_in = self.in_elements[0].p_out
             self.f_in = self.in_elements[0].f_out
-        elif self.mode == 'merge':
-            if not self.in_elements or len(self.in_elements) < 2:
-                raise ValueError("Для merge должно быть два или более входных элемента.")
 
     def change_f(self):
         if self.mode == 'split':
             f_in = self.f_in
-            total_inv_r = sum(1/r for r in self.resistances)
-            self.f_out_list = [(1/r)/total_inv_r * f_in for r in self.resistances]
+            inv_r = [1 / max(r, 1e-9) for r in self.resistances]  # ветви без сопротивления делят поток поровну
+            total_inv_r = sum(inv_r)
+            self.f_out_list = [g / total_inv_r * f_in for g in inv_r]
         elif self.mode == 'merge':
             self.f_out = sum(e.f_out for e in self.in_elements)
 
     def change_t(self):
         if self.mode == 'split':
-            self.t_out_list = [self.t_in for _ in self.resistances]
+            self.t_out_list = [self.t_in] * max(len(self.resistances), len(self.out_elements))
         elif self.mode == 'merge':
             total_flow = sum(e.f_out for e in self.in_elements)
             self.t_out = sum(e.t_out * e.f_out for e in self.in_elements) / (total_flow + 1e-9)
@@ -553,11 +1427,11 @@ class PipeIntersectionElement(BaseElement):
         elif self.mode == 'merge':
             self.p_out = sum(e.p_out - r*e.f_out for e, r in zip(self.in_elements, self.resistances)) / len(self.in_elements)
 
-    def work(self):
+    def work(self, dt=None):
         self.update_inputs()
         self.change_t()
+        self.change_f()  # давления ветвей считаются по уже разделённым расходам
         self.change_p()
-        self.change_f()
         # Передаём параметры на выходы
         if self.mode == 'split':
             for idx, elem in enumerate(self.out_elements):
@@ -576,6 +1450,11 @@ class FilterElement(BaseElement):
     Фильтр: создает дополнительное сопротивление потоку.
     Можно задать степень загрязнения (увеличивает сопротивление).
     """
+    __slots__ = ('clog_factor',)
+    PARAMETERS = {
+        'clog_factor': {'type': 'float', 'min': 1.0, 'max': 100.0, 'label': 'Коэффициент загрязнения'},
+    }
+
     def __init__(self, resistance=1.0, clog_factor=1.0, base_resistance = 1.0):
         """
         resistance: базовое гидравлическое сопротивление фильтра
@@ -584,13 +1463,6 @@ class FilterElement(BaseElement):
         super().__init__(resistance=base_resistance)
         self.clog_factor = clog_factor  # 1.0 — чистый, >1.0 — грязный
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'clog_factor' : self.clog_factor
-        }
-        parameters.update(super_parameters)
-        return parameters
 
     def get_resistance(self):
         # Сопротивление фильтра зависит от степени загрязнения
@@ -607,62 +1479,100 @@ class FilterElement(BaseElement):
         factor: новый коэффициент загрязнения (>1.0)
         """
         self.clog_factor = factor
+        self.mark_dirty()
 
     def clean(self):
         """
         Очистить фильтр (вернуть к исходному состоянию).
         """
         self.clog_factor = 1.0
+        self.mark_dirty()
 
 
 class PumpElement(BaseElement):
     """
     Насос: задаёт напор (разницу давлений), расход определяется схемой.
+    Без характеристики напор постоянен: max_pressure * power. С характеристикой
+    модели (model — имя кривой в PumpCurves) напор зависит от расхода, power —
+    относительная частота вращения (законы подобия).
     """
+    __slots__ = ('status', 'power', 'max_pressure', 'model', '_curve')
+    PARAMETERS = {
+        'status': {'type': 'bool', 'label': 'Вкл/Выкл'},
+        'power': {'type': 'float', 'min': 0.0, 'max': 100.0, 'label': 'Мощность'},
+        'max_pressure': {'type': 'float', 'min': 0.0, 'max': 10.0, 'label': 'Максимальный напор'},
+        'model': {'type': 'str', 'label': 'Модель (характеристика)'},
+    }
+
     def __init__(self, max_pressure=0.5):
         super().__init__()
         self.status = False      # Включён/выключен
         self.power = 0.0         # Мощность (0...100)
         self.max_pressure = max_pressure  # Максимальный напор (например, бар)        # Расход будет рассчитан схемой
+        self.model = ''          # Имя характеристики насоса ('' — постоянный напор)
+        self._curve = None
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'status' : {
-                'value' : self.status,
-                'type' : 'bool',
-                'label' : 'Вкл/Выкл'
-            },
-            'power' : {
-                'value' : self.power,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Мощность"
-            },
-            'max_pressure' : {
-                'value' : self.max_pressure,
-                "type": "float",
-                "min": 0.0,
-                "max": 10.0,
-                "label": "Максимальный напор"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
 
     def set_status(self, status: bool):
         self.status = status
+        self.mark_dirty()
 
     def set_power(self, power: float):
         self.power = max(0.0, min(1.0, power))
+        self.mark_dirty()
+
+    @property
+    def curve(self):
+        """Характеристика модели (общий объект PumpCurve) или None."""
+        if self._curve is None and self.model:
+            from PumpCurves import get_curve
+            self._curve = get_curve(self.model)
+        return self._curve
+
+    def set_model(self, model):
+        """Выбрать характеристику по имени модели из реестра PumpCurves ('' — без неё)."""
+        self.model = model or ''
+        self._curve = None
+        self.mark_dirty()
+        if self.scheme is not None:
+            self.scheme.invalidate_plan()  # узловой расчёт группирует насосы по моделям при сборке
+
+    def set_curve(self, curve):
+        """Назначить характеристику (регистрируется в реестре под своим именем)."""
+        if curve is None:
+            self.set_model('')
+            return
+        from PumpCurves import get_curve, register_curve
+        if get_curve(curve.name) is not curve:
+            register_curve(curve)
+        self.set_model(curve.name)
+        self._curve = curve
+
+    def check(self):
+        issues = super().check()
+        if self.model and self.curve is None:
+            issues.append(('error', 'curve', f"Характеристика насоса «{self.model}» не зарегистрирована"))
+        return issues
+
+    def head(self, flow=None):
+        """Напор насоса при расходе flow (по умолчанию — текущем входном), МПа."""
+        if not self.status:
+            return 0.0
+        curve = self.curve
+        if curve is None:
+            return self.max_pressure * self.power
+        return curve.head(self.f_in if flow is None else flow, self.power)
+
+    def efficiency(self):
+        """КПД в текущей точке по характеристике (None, если КПД не задан)."""
+        curve = self.curve
+        if curve is None or not self.status:
+            return None
+        return curve.efficiency(self.f_in, self.power)
 
     def change_p(self):
-        if self.status:
-            # p_out = p_in + напор насоса
-            self.p_out = (self.p_in if self.p_in is not None else 0.0) + self.max_pressure * self.power
-        else:
-            self.p_out = self.p_in if self.p_in is not None else 0.0
+        # p_out = p_in + напор насоса
+        self.p_out = self.p_in + self.head()
 
 
 
@@ -670,39 +1580,19 @@ class MovElement(BaseElement):
     """
     Задвижка/клапан: регулирует расход за счёт изменения сопротивления.
     """
+    __slots__ = ('position', 'resistance_open', 'resistance_closed')
+    PARAMETERS = {
+        'position': {'type': 'float', 'min': 0.0, 'max': 100.0, 'label': 'Процент открытия'},
+        'resistance_open': {'type': 'float', 'min': 0.0, 'max': 1.0, 'label': 'Сопротивление при открытом положении'},
+        'resistance_closed': {'type': 'float', 'min': 0.0, 'max': 1.0, 'label': 'Сопротивление при закрытом положении'},
+    }
+
     def __init__(self, in_elements=None, resistance_open=0.05, resistance_closed=1000.0):
         super().__init__(in_elements)
-        self.position = 100.0  # 100.0 — полностью открыт, 0.0 — полностью закрыт
+        self.position = 1.0  # 1.0 — полностью открыт, 0.0 — полностью закрыт
         self.resistance_open = resistance_open
         self.resistance_closed = resistance_closed
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'position' : {
-                'value' : self.position,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Процент открытия"
-            },
-            'resistance_open' : {
-                'value' : self.resistance_open,
-                "type": "float",
-                "min": 0.0,
-                "max": 1.0,
-                "label": "Сопротивление при открытом положении"
-            },
-            'resistance_closed' : {
-                'value' : self.resistance_closed,
-                "type": "float",
-                "min": 0.0,
-                "max": 1.0,
-                "label": "Сопротивление при закрытом положении"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
 
 
     @property
@@ -718,6 +1608,7 @@ class MovElement(BaseElement):
         Установить положение задвижки (0.0 — закрыта, 1.0 — открыта)
         """
         self.position = max(0.0, min(1.0, position))
+        self.mark_dirty()
 
     def change_f(self):
         # Q = (p_in - p_out) / R
@@ -735,45 +1626,32 @@ class MovElement(BaseElement):
 
 
 class ValveElement(BaseElement):
+    __slots__ = ('opening', 'resistance_open', 'resistance_closed')
+    PARAMETERS = {
+        'opening': {'type': 'float', 'min': 0.0, 'max': 100.0, 'label': 'Процент открытия'},
+        'resistance_open': {'type': 'float', 'min': 0.0, 'max': 1.0, 'label': 'Сопротивление при открытом положении'},
+        'resistance_closed': {'type': 'float', 'min': 0.0, 'max': 1.0, 'label': 'Сопротивление при закрытом положении'},
+    }
+
     def __init__(self, in_elements=None, resistance_open=0.1, resistance_closed=1000.0):
         super().__init__(in_elements)
         self.opening = 1.0  # 1.0 — полностью открыт, 0.0 — закрыт
         self.resistance_open = resistance_open
         self.resistance_closed = resistance_closed
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'opening' : {
-                'value' : self.opening,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Процент открытия"
-            },
-            'resistance_open' : {
-                'value' : self.resistance_open,
-                "type": "float",
-                "min": 0.0,
-                "max": 1.0,
-                "label": "Сопротивление при открытом положении"
-            },
-            'resistance_closed' : {
-                'value' : self.resistance_closed,
-                "type": "float",
-                "min": 0.0,
-                "max": 1.0,
-                "label": "Сопротивление при закрытом положении"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
 
     @property
     def resistance(self):
         # Сопротивление зависит от открытия
         return self.resistance_open + (self.resistance_closed - self.resistance_open) * (1 - self.opening)
 
+    def set_opening(self, opening):
+        """
+        Установить открытие клапана (0.0 — закрыт, 1.0 — открыт)
+        """
+        self.opening = max(0.0, min(1.0, opening))
+        self.mark_dirty()
+
     def get_resistance(self):
         return self.resistance
 
@@ -794,7 +1672,21 @@ class CapacityElement(BaseElement):
     Ёмкость/резервуар с несколькими входами и выходами, с учётом уровня, температуры и давления.
     Давление в МПа.
     """
-    def __init__(self, num_in=1, num_out=1, volume=10.0, tank_area=1.0, in_elements=None):
+    __slots__ = ('num_in', 'num_out', 'volume', 'tank_area', 'level', 't_capacity', 'p_capacity',
+                 'time_constant_t', 'time_constant_p', 'f_out_list', 't_out_list', 'p_out_list')
+    PARAMETERS = {
+        'volume': {'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Объем емкости'},
+        'tank_area': {'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Площадь сечения'},
+        'level': {'type': 'float', 'min': 0.0, 'max': 100.0, 'label': 'Уровень емкости'},
+        'time_constant_t': {'type': 'float', 'min': 0.01, 'max': 100000.0,
+                            'label': 'Постоянная времени по температуре, с'},
+        'time_constant_p': {'type': 'float', 'min': 0.01, 'max': 100000.0,
+                            'label': 'Постоянная времени по давлению, с'},
+    }
+    dynamic = True
+
+    def __init__(self, num_in=1, num_out=1, volume=10.0, tank_area=1.0, in_elements=None,
+                 time_constant_t=9.0, time_constant_p=9.0):
         super().__init__(in_elements)
         self.num_in = num_in
         self.num_out = num_out
@@ -805,34 +1697,44 @@ class CapacityElement(BaseElement):
         self.level = 0.0              # Уровень жидкости, %
         self.t_capacity = 20.0        # Температура в ёмкости, °C
         self.p_capacity = 0.1         # Давление в ёмкости, МПа
+        # Постоянные времени ёмкости, с (9 с при dt = 1 с дают прежний коэффициент инерции 0.1)
+        self.time_constant_t = time_constant_t
+        self.time_constant_p = time_constant_p
+
+    def add_in_element(self, element):
+        # Порты заданы заранее (num_in) — занимаем первый свободный
+        if None in self.in_elements:
+            self.in_elements[self.in_elements.index(None)] = element
+        else:
+            self.in_elements.append(element)
+
+    def add_out_element(self, element):
+        if None in self.out_elements:
+            self.out_elements[self.out_elements.index(None)] = element
+        else:
+            self.out_elements.append(element)
+            self.num_out = len(self.out_elements)
+
+    def remove_in_element(self, element):
+        # Порт освобождается, но остаётся на своём месте
+        if element in self.in_elements:
+            self.in_elements[self.in_elements.index(element)] = None
+        if element.index in self.in_indices:
+            self.in_indices.remove(element.index)
+
+    def remove_out_element(self, element):
+        if element in self.out_elements:
+            self.out_elements[self.out_elements.index(element)] = None
+        if element.index in self.out_indices:
+            self.out_indices.remove(element.index)
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'volume' : {
-                'value' : self.volume,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Объем емкости"
-            },
-            'tank_area' : {
-                'value' : self.tank_area,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Площадь сечения"
-            },
-            'level' : {
-                'value' : self.level,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Уровень емкости"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
+
+    def get_outputs_for(self, element):
+        if getattr(self, 'f_out_list', None):
+            for idx, elem in enumerate(self.out_elements):
+                if elem is element:
+                    return self.t_out_list[idx], self.p_out_list[idx], self.f_out_list[idx]
+        return super().get_outputs_for(element)
 
     def set_in_element(self, idx, element):
         if 0 <= idx < self.num_in:
@@ -844,12 +1746,15 @@ class CapacityElement(BaseElement):
 
     def set_level(self, level):
         self.level = max(0.0, min(level, self.volume / self.tank_area))
+        self.mark_dirty()
 
     def set_temperature(self, temperature):
         self.t_capacity = temperature
+        self.mark_dirty()
 
     def set_pressure(self, pressure):
         self.p_capacity = pressure
+        self.mark_dirty()
 
     def update_inputs(self):
         # Суммируем расходы всех входов
@@ -872,18 +1777,41 @@ class CapacityElement(BaseElement):
             self.f_out = 0.0
             self.f_out_list = []
 
+    def check(self):
+        issues = [issue for issue in super().check() if issue[1] != 'no_input']
+        if all(e is None for e in self.in_elements):
+            issues.append(('warning', 'no_input', "Ни один вход ёмкости не подключён"))
+        if any(e is None for e in self.out_elements):
+            issues.append(('warning', 'free_port', "Есть свободные выходы ёмкости"))
+        if self.volume <= 0 or self.tank_area <= 0:
+            issues.append(('error', 'geometry', "Объём и площадь сечения ёмкости должны быть > 0"))
+        if self.time_constant_t <= 0 or self.time_constant_p <= 0:
+            issues.append(('error', 'time_constant', "Постоянные времени ёмкости должны быть > 0"))
+        return issues
+
     def change_t(self):
-        # Температура ёмкости изменяется с учётом входных потоков (упрощённо)
-        alpha = 0.1  # коэффициент "инерции" ёмкости
-        self.t_capacity = (1 - alpha) * self.t_capacity + alpha * self.t_in
+        # Температура ёмкости — состояние (см. integrate), на выходы идёт текущее значение
+        self.t_out = self.t_capacity
         self.t_out_list = [self.t_capacity] * self.num_out
 
     def change_p(self):
-        # Давление ёмкости изменяется с учётом входных потоков (упрощённо)
-        beta = 0.1  # коэффициент "инерции" ёмкости
-        self.p_capacity = (1 - beta) * self.p_capacity + beta * self.p_in
+        self.p_out = self.p_capacity
         self.p_out_list = [self.p_capacity] * self.num_out
 
+    def integrate(self, dt):
+        """
+        Продвинуть состояние ёмкости на dt (с) неявным Эйлером: температура и давление
+        стремятся к входным с постоянными времени, уровень — по балансу расходов.
+        Устойчиво при любом dt; при dt = 0 состояние не меняется.
+        """
+        if dt <= 0:
+            return
+        kt = dt / self.time_constant_t
+        kp = dt / self.time_constant_p
+        self.t_capacity = (self.t_capacity + kt * self.t_in) / (1 + kt)
+        self.p_capacity = (self.p_capacity + kp * self.p_in) / (1 + kp)
+        self.update_level(dt)
+
     def update_level(self, dt=1.0):
         """
         Обновить уровень в ёмкости за шаг времени dt (сек).
@@ -893,12 +1821,14 @@ class CapacityElement(BaseElement):
         dH = dV / self.tank_area
         self.level = max(0.0, min(self.level + dH, self.volume / self.tank_area))
 
-    def work(self, dt=1.0):
+    def work(self, dt=None):
         self.update_inputs()
+        self.change_f()
+        # Если у схемы есть общий интегратор ёмкостей, состояние продвигает он после прохода
+        if self.scheme is None or self.scheme.tank_integrator is None:
+            self.integrate(1.0 if dt is None else dt)
         self.change_t()
         self.change_p()
-        self.change_f()
-        self.update_level(dt)
         # Передаём параметры на выходы
         for idx, elem in enumerate(self.out_elements):
             if elem is not None:
@@ -911,6 +1841,17 @@ class BoilerElement(BaseElement):
     """
     Водогрейный котёл: изменяет температуру, имеет сопротивление, управляется мощностью.
     """
+    __slots__ = ('_max_power_mw', '_min_power_percent', '_power_percent', '_status', 'rho', 'cp', 'mu')
+    PARAMETERS = {
+        'max_power_mw': {'attr': '_max_power_mw', 'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Максимальная мощность'},
+        'min_power_percent': {'attr': '_min_power_percent', 'type': 'float', 'min': 0.0, 'max': 100.0,
+                              'label': 'Минимальный процент мощности'},
+        'power_percent': {'attr': '_power_percent', 'type': 'float', 'min': 0.0, 'max': 100.0,
+                          'label': 'Текущий процент мощности'},
+        'status': {'attr': '_status', 'type': 'bool', 'label': 'Вкл/Выкл'},
+        'resistance': {'attr': '_resistance', 'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Сопротивление'},
+    }
+
     def __init__(self, max_power_mw=10.0, min_power_percent=0.2, resistance=0.1):
         super().__init__()
         self._max_power_mw = max_power_mw
@@ -918,46 +1859,10 @@ class BoilerElement(BaseElement):
         self._power_percent = 0.0  # Текущий процент мощности (0...100)
         self._status = False
         self._resistance = resistance
+        self.rho = WATER_DENSITY  # свойства воды: кг/м3, Дж/(кг*К), Па*с
+        self.cp = WATER_HEAT_CAPACITY
+        self.mu = WATER_VISCOSITY
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'max_power_mw' : {
-                'value' : self._max_power_mw,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Максимальная мощность"
-            },
-            'min_power_percent' : {
-                'value' : self._min_power_percent,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Минимальный процент мощности"
-            },
-            'power_percent' : {
-                'value' : self._power_percent,
-                "type": "float",
-                "min": 0.0,
-                "max": 100.0,
-                "label": "Текущий процент мощности"
-            },
-            'status' : {
-                'value' : self._status,
-                'type' : 'bool',
-                'label' : 'Вкл/Выкл'
-            },
-            'resistance' : {
-                'value' : self._resistance,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Сопротивление"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
 
     # --- Геттеры и сеттеры ---
     def get_max_power(self):
@@ -975,6 +1880,7 @@ class BoilerElement(BaseElement):
             self._power_percent = max(self._min_power_percent, min(1.0, percent))
         else:
             self._power_percent = 0.0
+        self.mark_dirty()
 
     def get_status(self):
         return self._status
@@ -983,22 +1889,24 @@ class BoilerElement(BaseElement):
         self._status = status
         if not status:
             self._power_percent = 0.0
+        self.mark_dirty()
 
     def get_resistance(self):
         return self._resistance
 
     def set_resistance(self, value):
         self._resistance = value
+        self.mark_dirty()
 
     # --- Основные методы ---
     def change_t(self):
         # Если котёл включён, увеличиваем температуру на выходе
         if self._status and self.f_in > 0:
             # Q = m * c * dT, где Q — мощность (Вт), m — расход (кг/с), c — теплоёмкость (Дж/кг*К)
-            # Для воды: c ≈ 4200 Дж/кг*К, плотность ≈ 1000 кг/м3
+            # Плотность и теплоёмкость воды — rho, cp (по умолчанию 1000 кг/м3 и 4200 Дж/кг*К)
             Q = self._max_power_mw * 1e6 * self._power_percent  # Вт
-            m = self.f_in * 1000  # м3/с -> кг/с
-            dT = Q / (m * 4200) if m > 0 else 0
+            m = self.f_in * self.rho  # м3/с -> кг/с
+            dT = Q / (m * self.cp) if m > 0 else 0
             self.t_out = self.t_in + dT
         else:
             self.t_out = self.t_in
@@ -1015,50 +1923,41 @@ class ThermalFluidElement(BaseElement):
     """
     Потребитель тепла (теплообменник, радиатор и т.п.).
     """
+    __slots__ = ('_heat_demand', 'rho', 'cp', 'mu')
+    PARAMETERS = {
+        'heat_demand': {'attr': '_heat_demand', 'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Теплосьем МВт'},
+        'resistance': {'attr': '_resistance', 'type': 'float', 'min': 0.0, 'max': 1000.0, 'label': 'Сопротивление'},
+    }
+
     def __init__(self, heat_demand=1.0, resistance=0.1, in_elements=None):
         super().__init__(in_elements)
         self._heat_demand = heat_demand      # МВт
         self._resistance = resistance
+        self.rho = WATER_DENSITY
+        self.cp = WATER_HEAT_CAPACITY
+        self.mu = WATER_VISCOSITY
 
-    def get_parameters(self) -> dict:
-        super_parameters = super().get_parameters()
-        parameters = {
-            'heat_demand' : {
-                'value' : self._heat_demand,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Теплосьем МВт"
-            },
-            'resistance' : {
-                'value' : self._resistance,
-                "type": "float",
-                "min": 0.0,
-                "max": 1000.0,
-                "label": "Сопротивление"
-            }
-        }
-        parameters.update(super_parameters)
-        return parameters
 
     def get_heat_demand(self):
         return self._heat_demand
 
     def set_heat_demand(self, value):
         self._heat_demand = value
+        self.mark_dirty()
 
     def get_resistance(self):
         return self._resistance
 
     def set_resistance(self, value):
         self._resistance = value
+        self.mark_dirty()
 
     def change_t(self):
         # t_out = t_in - Q / (m * c)
         if self.f_in > 0:
             Q = self._heat_demand * 1e6  # Вт
-            m = self.f_in * 1000         # м3/с -> кг/с
-            dT = Q / (m * 4200) if m > 0 else 0
+            m = self.f_in * self.rho     # м3/с -> кг/с
+            dT = Q / (m * self.cp) if m > 0 else 0
             self.t_out = self.t_in - dT
         else:
             self.t_out = self.t_in
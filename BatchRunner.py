@@ -0,0 +1,191 @@
+import os
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+class ParameterSpec:
+    """
+    Случайный параметр сценария: что менять и по какому распределению.
+
+    index  — индекс элемента в схеме;
+    target — имя метода (вызывается со значением: 'depressurization', 'clog', 'set_power', ...)
+             или атрибута (присваивается);
+    dist   — распределение:
+               ('uniform', low, high), ('normal', mean, std), ('choice', [v1, v2, ...]), ('const', v);
+    points — для профиля во времени: число кусочно-постоянных участков на прогон
+             (None — одно значение на весь прогон).
+    """
+    def __init__(self, index, target, dist, points=None):
+        self.index = index
+        self.target = target
+        self.dist = dist
+        self.points = points
+
+    @property
+    def width(self):
+        return self.points or 1
+
+    def sample(self, rng, runs):
+        kind, *args = self.dist
+        shape = (runs, self.width)
+        if kind == 'uniform':
+            return rng.uniform(args[0], args[1], shape)
+        if kind == 'normal':
+            return rng.normal(args[0], args[1], shape)
+        if kind == 'choice':
+            return rng.choice(np.asarray(args[0], dtype=float), shape)
+        if kind == 'const':
+            return np.full(shape, float(args[0]))
+        raise ValueError(f"Неизвестное распределение: {kind}")
+
+    def label(self):
+        return f"{self.index}.{self.target}"
+
+
+def _apply(element, target, value):
+    member = getattr(element, target)
+    if callable(member):
+        member(value)
+    else:
+        setattr(element, target, value)
+        element.mark_dirty()
+
+
+def default_observables(scheme):
+    """Наблюдаемые величины по умолчанию: все датчики схемы, иначе выходы всех элементов."""
+    observables = []
+    for index, elem in scheme.elements_dict.items():
+        for k, sensor in enumerate(getattr(elem, 'sensors', ())):
+            observables.append((index, f"sensors[{k}]"))
+    if not observables:
+        for index in scheme.elements_dict:
+            observables += [(index, 'p_out'), (index, 'f_out'), (index, 't_out')]
+    return observables
+
+
+def _read(element, name):
+    if name.startswith('sensors['):
+        value = element.sensors[int(name[8:-1])].value
+    else:
+        value = getattr(element, name)
+    return np.nan if value is None else value
+
+
+# --- Рабочий процесс: схема передаётся один раз через initializer ---
+_worker = {}
+
+
+def _init_worker(scheme_bytes, config):
+    _worker['scheme_bytes'] = scheme_bytes
+    _worker['config'] = config
+
+
+def _run_chunk(run_ids, draws):
+    """Выполнить пачку прогонов; вернуть (run_ids, массив итоговых значений [runs x observables])."""
+    config = _worker['config']
+    specs = config['specs']
+    observables = config['observables']
+    steps, dt, flow, seed = config['steps'], config['dt'], config['flow'], config['seed']
+    values = np.empty((len(run_ids), len(observables)))
+    for row, (run_id, draw) in enumerate(zip(run_ids, draws)):
+        random.seed(seed + run_id)  # дребезг датчиков воспроизводим для каждого прогона
+        scheme = pickle.loads(_worker['scheme_bytes'])
+        elements = scheme.elements_dict
+        if not scheme.chain_ready:
+            scheme.initialize_chains()
+        columns = []
+        offset = 0
+        for spec in specs:
+            columns.append(draw[offset:offset + spec.width])
+            offset += spec.width
+        current = [None] * len(specs)
+        for step in range(steps):
+            for k, spec in enumerate(specs):
+                value = float(columns[k][step * spec.width // steps])
+                if value != current[k]:
+                    _apply(elements[spec.index], spec.target, value)
+                    current[k] = value
+            scheme.calculate(flow, dt)
+        values[row] = [_read(elements[i], name) for i, name in observables]
+    return run_ids, values
+
+
+class BatchResult:
+    """Итоги пакета прогонов: выборка параметров и итоговые значения наблюдаемых величин."""
+    def __init__(self, specs, observables, samples, values):
+        self.specs = specs
+        self.observables = observables
+        self.samples = samples  # [runs x сумма ширин параметров]
+        self.values = values    # [runs x observables]
+
+    def labels(self):
+        return [f"{index}.{name}" for index, name in self.observables]
+
+    def percentiles(self, q=(5, 50, 95)):
+        """Перцентили по прогонам для каждой наблюдаемой величины: {метка: массив len(q)}."""
+        table = np.nanpercentile(self.values, q, axis=0)
+        return {label: table[:, k] for k, label in enumerate(self.labels())}
+
+
+class BatchRunner:
+    """
+    Пакетный прогон сценариев (Монте-Карло) по пулу процессов.
+
+    Схема сериализуется один раз и передаётся каждому рабочему процессу через
+    initializer; задания содержат только номера прогонов и выборку параметров.
+    Выборка делается в основном процессе генератором NumPy с seed, поэтому
+    результат не зависит от числа процессов. Прогоны группируются в пачки
+    (chunk_size), результаты возвращаются массивами по мере готовности.
+    """
+    def __init__(self, scheme, specs, steps=10, dt=1.0, flow=1.0, observables=None,
+                 seed=0, workers=None, chunk_size=None):
+        self.scheme = scheme
+        self.specs = list(specs)
+        self.steps = steps
+        self.dt = dt
+        self.flow = flow
+        self.observables = list(observables) if observables is not None else default_observables(scheme)
+        self.seed = seed
+        self.workers = os.cpu_count() if workers is None else workers
+        self.chunk_size = chunk_size
+
+    def sample(self, runs):
+        rng = np.random.default_rng(self.seed)
+        if not self.specs:
+            return np.empty((runs, 0))
+        return np.hstack([spec.sample(rng, runs) for spec in self.specs])
+
+    def _config(self):
+        return {'specs': self.specs, 'observables': self.observables, 'steps': self.steps,
+                'dt': self.dt, 'flow': self.flow, 'seed': self.seed}
+
+    def _chunks(self, runs):
+        size = self.chunk_size or max(1, runs // (4 * max(self.workers, 1)))
+        return [list(range(start, min(start + size, runs))) for start in range(0, runs, size)]
+
+    def iter_results(self, runs, samples=None):
+        """Выдавать (run_ids, values) по мере завершения пачек."""
+        samples = self.sample(runs) if samples is None else samples
+        scheme_bytes = pickle.dumps(self.scheme, protocol=pickle.HIGHEST_PROTOCOL)
+        chunks = self._chunks(runs)
+        if self.workers <= 1:
+            # Без пула — в текущем процессе (отладка, маленькие пакеты)
+            _init_worker(scheme_bytes, self._config())
+            for ids in chunks:
+                yield _run_chunk(ids, samples[ids])
+            return
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(scheme_bytes, self._config())) as pool:
+            futures = [pool.submit(_run_chunk, ids, samples[ids]) for ids in chunks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run(self, runs):
+        samples = self.sample(runs)
+        values = np.full((runs, len(self.observables)), np.nan)
+        for ids, chunk in self.iter_results(runs, samples):
+            values[ids] = chunk
+        return BatchResult(self.specs, self.observables, samples, values)
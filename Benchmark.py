@@ -0,0 +1,368 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from BaseElement import *
+
+
+def generate_scheme(n_elements, seed=0, sensors_per_pipe=1):
+    """
+    Сгенерировать схему примерно из n_elements элементов: источник, затем цепь из
+    насосов, задвижек, труб, котлов и потребителей с редкими разветвлениями (split/merge).
+    """
+    rng = random.Random(seed)
+    scheme = ProcessScheme()
+
+    def add(elem, prev):
+        scheme.add_element(elem)
+        if prev is not None:
+            scheme.connect(prev.index, elem.index)
+        return elem
+
+    prev = add(FlowSourceElement(), None)
+    while len(scheme.elements_dict) < n_elements:
+        roll = rng.random()
+        if roll < 0.05 and len(scheme.elements_dict) + 4 <= n_elements:
+            split = add(PipeIntersectionElement(mode='split'), prev)
+            left = add(PipeElementElement(length=rng.uniform(1, 50), diameter=0.1), split)
+            right = add(MovElement(), split)
+            prev = add(PipeIntersectionElement(mode='merge'), left)
+            scheme.connect(right.index, prev.index)
+            continue
+        if roll < 0.55:
+            elem = PipeElementElement(length=rng.uniform(1, 50), diameter=0.1)
+            for _ in range(sensors_per_pipe):
+                sensor = Sensor(rng.choice(['pressure', 'temperature', 'flow']))
+                elem.add_sensor(sensor)
+                scheme.sensors.append(sensor)
+        elif roll < 0.7:
+            elem = PumpElement(max_pressure=rng.uniform(0.1, 1.0))
+        elif roll < 0.8:
+            elem = MovElement()
+        elif roll < 0.9:
+            elem = BoilerElement(max_power_mw=rng.uniform(1, 20))
+        else:
+            elem = ThermalFluidElement(heat_demand=rng.uniform(0.1, 2.0))
+        prev = add(elem, prev)
+    return scheme
+
+
+def generate_network(n_elements, seed=0, sources=1, run_length=(3, 12), ladder_share=0.15, max_rungs=4,
+                     loop_share=0.05, tank_share=0.02, sensors_per_pipe=1):
+    """
+    Сгенерировать схему примерно из n_elements элементов с типичными для станции участками.
+    Элементы делятся между sources независимыми источниками; цепь каждого источника —
+    последовательность участков:
+      - длинная трасса из run_length (мин, макс) труб (на трубах — sensors_per_pipe датчиков);
+      - «лестница» (доля ladder_share): split на 2...max_rungs ветвей «труба + задвижка», затем merge;
+      - кольцо рециркуляции (loop_share): merge -> насос -> труба -> split, обратная труба в merge;
+      - ёмкость (tank_share);
+      - одиночные насосы, задвижки, котлы и потребители.
+    """
+    rng = random.Random(seed)
+    scheme = ProcessScheme()
+
+    def add(elem, prev):
+        scheme.add_element(elem)
+        if prev is not None:
+            scheme.connect(prev.index, elem.index)
+        return elem
+
+    def pipe():
+        elem = PipeElementElement(length=rng.uniform(1, 50), diameter=rng.choice((0.05, 0.1, 0.2)))
+        for _ in range(sensors_per_pipe):
+            sensor = Sensor(rng.choice(['pressure', 'temperature', 'flow']))
+            elem.add_sensor(sensor)
+            scheme.sensors.append(sensor)
+        return elem
+
+    budget = max(n_elements // max(sources, 1), 2)
+    for _ in range(sources):
+        prev = add(FlowSourceElement(), None)
+        limit = len(scheme.elements_dict) + budget - 1
+        while len(scheme.elements_dict) < limit:
+            left = limit - len(scheme.elements_dict)
+            roll = rng.random()
+            if roll < ladder_share and left >= 6:
+                rungs = rng.randint(2, max(2, min(max_rungs, (left - 2) // 2)))
+                split = add(PipeIntersectionElement(mode='split'), prev)
+                merge = PipeIntersectionElement(mode='merge')
+                ends = [add(MovElement(), add(pipe(), split)) for _ in range(rungs)]
+                scheme.add_element(merge)
+                for end in ends:
+                    scheme.connect(end.index, merge.index)
+                prev = merge
+            elif roll < ladder_share + loop_share and left >= 5:
+                merge = add(PipeIntersectionElement(mode='merge'), prev)
+                pump = add(PumpElement(max_pressure=rng.uniform(0.1, 1.0)), merge)
+                split = add(PipeIntersectionElement(mode='split'), add(pipe(), pump))
+                back = add(pipe(), split)
+                scheme.connect(back.index, merge.index)
+                split.set_resistances([1.0, 3.0])  # основная часть расхода уходит дальше по цепи
+                prev = split
+            elif roll < ladder_share + loop_share + tank_share and left >= 2:
+                # Ёмкость с трубой отвода (топология участка не меняется — базовые результаты сравнимы)
+                prev = add(pipe(), add(CapacityElement(volume=rng.uniform(5, 50)), prev))
+            elif roll < 0.7:
+                for _ in range(min(rng.randint(*run_length), left)):
+                    prev = add(pipe(), prev)
+            else:
+                kind = rng.random()
+                if kind < 0.35:
+                    elem = PumpElement(max_pressure=rng.uniform(0.1, 1.0))
+                elif kind < 0.6:
+                    elem = MovElement()
+                elif kind < 0.8:
+                    elem = BoilerElement(max_power_mw=rng.uniform(1, 20))
+                else:
+                    elem = ThermalFluidElement(heat_demand=rng.uniform(0.1, 2.0))
+                prev = add(elem, prev)
+    return scheme
+
+
+class _DictRecord:
+    """Объект с атрибутами в __dict__ — раскладка элементов до перехода на __slots__."""
+
+
+def _slot_names(cls):
+    names = []
+    for klass in cls.__mro__:
+        names.extend(getattr(klass, '__slots__', ()))
+    return names
+
+
+def _as_dict_record(obj):
+    record = _DictRecord()
+    for name in _slot_names(type(obj)):
+        if hasattr(obj, name):
+            setattr(record, name, getattr(obj, name))
+    return record
+
+
+def _traced(build):
+    """Результат build() и объём памяти, выделенной при его вызове, байт."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def memory_benchmark(n_elements=50000, seed=0):
+    """
+    Память на элемент схемы: объекты с __slots__ против объектов с __dict__ при тех же
+    значениях атрибутов. «Оболочка» — сами объекты элементов и датчиков без значений
+    атрибутов; «всего» — все выделения при построении схемы (списки связей, числа, датчики).
+    """
+    scheme, total = _traced(lambda: generate_scheme(n_elements, seed))
+    objects = list(scheme.elements_dict.values()) + scheme.sensors
+    slotted = sum(sys.getsizeof(obj) for obj in objects)
+    # Те же значения в объектах с __dict__ (значения общие, считается только раскладка)
+    _, dict_backed = _traced(lambda: [_as_dict_record(obj) for obj in objects])
+
+    n = len(scheme.elements_dict)
+    return {
+        'elements': n,
+        'sensors': len(scheme.sensors),
+        'shell_bytes_per_element_slots': slotted / n,
+        'shell_bytes_per_element_dict': dict_backed / n,
+        'total_bytes_per_element_slots': total / n,
+        'total_bytes_per_element_dict': (total - slotted + dict_backed) / n,
+    }
+
+
+def _switch_on(scheme):
+    for elem in scheme.elements_dict.values():
+        if isinstance(elem, PumpElement):
+            elem.set_status(True)
+            elem.set_power(0.5)
+        elif isinstance(elem, BoilerElement):
+            elem.set_status(True)
+            elem.set_power_percent(0.5)
+
+
+def _prepare_tick_scheme(n_elements, seed, compiled, array=False):
+    scheme = generate_scheme(n_elements, seed, sensors_per_pipe=0)
+    _switch_on(scheme)
+    if compiled:
+        scheme.enable_compiled_tick()
+    if array:
+        scheme.enable_array_state()
+    start = time.perf_counter()
+    scheme.initialize_chains(p0=5.0, t0=60.0)
+    return scheme, time.perf_counter() - start
+
+
+def tick_benchmark(n_elements=20000, ticks=20, seed=0):
+    """
+    Время такта calculate(): интерпретируемый план (вызовы work()) против
+    скомпилированной функции такта (TickCompiler) и массивного режима (StateStore).
+    Время сборки плана — отдельно. array_vectorized — включились ли векторные ядра:
+    на длинной цепи generate_scheme их вызовы не окупаются, и массивный режим
+    считает схему обычным проходом.
+    """
+    result = {'elements': n_elements, 'ticks': ticks}
+    for name, compiled, array in (('interpreted', False, False), ('compiled', True, False), ('array', False, True)):
+        scheme, build = _prepare_tick_scheme(n_elements, seed, compiled, array)
+        scheme.calculate(1.0, 1.0)  # первый проход — заполнение начальных значений
+        start = time.perf_counter()
+        for _ in range(ticks):
+            scheme.calculate(1.0, 1.0)
+        result[f'{name}_tick_s'] = (time.perf_counter() - start) / ticks
+        result[f'{name}_build_s'] = build
+    result['array_vectorized'] = scheme.state_store.vectorized
+    result['speedup'] = result['interpreted_tick_s'] / result['compiled_tick_s']
+    return result
+
+
+def benchmark_size(n_elements, ticks=10, seed=0, memory=True, **topology):
+    """
+    Замеры для схемы generate_network(n_elements, seed, **topology): построение,
+    build_chains, initialize_chains, первый такт, средний такт из ticks и память.
+    """
+    result = {'elements': n_elements, 'ticks': ticks, 'seed': seed}
+    clock = time.perf_counter
+    start = clock()
+    scheme = generate_network(n_elements, seed, **topology)
+    result['generate_s'] = clock() - start
+    _switch_on(scheme)
+    start = clock()
+    scheme.build_chains()
+    result['build_chains_s'] = clock() - start
+    start = clock()
+    scheme.initialize_chains(p0=5.0, t0=60.0)
+    result['initialize_chains_s'] = clock() - start
+    start = clock()
+    scheme.calculate(1.0, 1.0)
+    result['first_tick_s'] = clock() - start
+    start = clock()
+    for _ in range(ticks):
+        scheme.calculate(1.0, 1.0)
+    result['tick_s'] = (clock() - start) / ticks if ticks else 0.0
+    result['actual_elements'] = len(scheme.elements_dict)
+    result['sensors'] = len(scheme.sensors)
+    result['loops'] = sum(1 for component in scheme.graph.components if len(component) > 1)
+    if memory:
+        # Отдельное построение под tracemalloc, чтобы трассировка не искажала времена
+        del scheme
+
+        def build():
+            fresh = generate_network(n_elements, seed, **topology)
+            fresh.initialize_chains(p0=5.0, t0=60.0)
+            return fresh
+        _, size = _traced(build)
+        result['memory_bytes'] = size
+        result['memory_bytes_per_element'] = size / result['actual_elements']
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(sizes=(100, 1000, 10000, 100000), ticks=10, seed=0, path=None, memory=True, **topology):
+    """
+    Набор замеров по размерам схемы; результат (и файл path в JSON, если задан):
+    {'format': 'benchmark', 'version': 1, 'commit', 'python', 'created', 'results': [...]}
+    """
+    document = {
+        'format': 'benchmark',
+        'version': 1,
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'topology': topology,
+        'results': [benchmark_size(n, ticks, seed, memory, **topology) for n in sizes],
+    }
+    if path is not None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=1)
+    return document
+
+
+COMPARED = ('build_chains_s', 'initialize_chains_s', 'first_tick_s', 'tick_s', 'memory_bytes_per_element')
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Сравнить два документа run_suite (или пути к файлам): замеры, выросшие больше
+    чем на threshold (доля), по размерам схемы — [(elements, метрика, было, стало)].
+    """
+    documents = []
+    for document in (baseline, current):
+        if isinstance(document, str):
+            with open(document, encoding='utf-8') as f:
+                document = json.load(f)
+        documents.append({r['elements']: r for r in document['results']})
+    old, new = documents
+    regressions = []
+    for n in sorted(old.keys() & new.keys()):
+        for metric in COMPARED:
+            before, after = old[n].get(metric), new[n].get(metric)
+            if before and after is not None and after > before * (1 + threshold):
+                regressions.append((n, metric, before, after))
+    return regressions
+
+
+def _print_suite(document):
+    print(f"{'Элементов':>10}{'build_chains, мс':>18}{'initialize, мс':>16}{'1-й такт, мс':>14}"
+          f"{'такт, мс':>10}{'байт/элемент':>14}")
+    for r in document['results']:
+        memory = r.get('memory_bytes_per_element')
+        print(f"{r['actual_elements']:>10}{r['build_chains_s'] * 1e3:>18.1f}{r['initialize_chains_s'] * 1e3:>16.1f}"
+              f"{r['first_tick_s'] * 1e3:>14.1f}{r['tick_s'] * 1e3:>10.2f}"
+              f"{'—' if memory is None else f'{memory:.0f}':>14}")
+
+
+def _print_classic():
+    result = memory_benchmark()
+    print(f"Элементов: {result['elements']}, датчиков: {result['sensors']}")
+    print(f"Оболочка объекта, байт/элемент: __dict__ {result['shell_bytes_per_element_dict']:.0f}"
+          f" -> __slots__ {result['shell_bytes_per_element_slots']:.0f}")
+    print(f"Всего при построении схемы, байт/элемент: __dict__ {result['total_bytes_per_element_dict']:.0f}"
+          f" -> __slots__ {result['total_bytes_per_element_slots']:.0f}")
+    result = tick_benchmark()
+    print(f"Такт, {result['elements']} элементов: интерпретируемый {result['interpreted_tick_s'] * 1e3:.1f} мс,"
+          f" скомпилированный {result['compiled_tick_s'] * 1e3:.1f} мс (x{result['speedup']:.1f}),"
+          f" массивный {result['array_tick_s'] * 1e3:.1f} мс"
+          f"{'' if result['array_vectorized'] else ' (векторные ядра не окупаются — обычный проход)'};"
+          f" сборка плана {result['interpreted_build_s']:.2f} -> {result['compiled_build_s']:.2f} с")
+
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности ядра расчёта")
+    parser.add_argument('--suite', metavar='PATH', help="набор замеров по размерам схемы, результат — в JSON")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--ticks', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sources', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help="без замера памяти (быстрее)")
+    parser.add_argument('--baseline', metavar='PATH', help="сравнить с прежним результатом")
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.suite is None:
+        _print_classic()
+        return 0
+    document = run_suite(args.sizes, args.ticks, args.seed, args.suite, not args.no_memory, sources=args.sources)
+    _print_suite(document)
+    if args.baseline:
+        regressions = compare(args.baseline, document, args.threshold)
+        for n, metric, before, after in regressions:
+            print(f"Ухудшение: {n} элементов, {metric}: {before:.4g} -> {after:.4g} (x{after / before:.2f})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(_main())
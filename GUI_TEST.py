@@ -1,8 +1,11 @@
+import os
+import tempfile
 import unittest
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtTest import QTest
 from PyQt5.QtCore import Qt, QPoint
-from Ver_0_2 import MainWindow
+from Ver_0_2 import MainWindow, QPipe, QSensor
+from BaseElement import PipeElementElement, Sensor
 
 app = QApplication([])  # Только один раз за сессию
 
@@ -35,6 +38,57 @@ class TestEditor(unittest.TestCase):
         pumps = [obj for obj in self.redactor.objects if obj.tag == "Насос"]
         self.assertEqual(len(pumps), 1)
 
+    def test_save_and_load_scheme(self):
+        for pos in (QPoint(100, 100), QPoint(400, 100)):
+            self.window.controller.set_element("QPump")
+            QTest.mouseClick(self.redactor, Qt.LeftButton, pos=pos)
+        path = os.path.join(tempfile.mkdtemp(), 'scheme.psim')
+        self.window.save_scheme(path)
+
+        other = MainWindow()
+        other.load_scheme(path)
+        # Объекты редактора создаются только при попадании в видимую область
+        self.assertEqual(other.redactor.objects, [])
+        other.redactor.materialize_visible()
+        pumps = sorted((obj.position.x(), obj.position.y()) for obj in other.redactor.objects if obj.tag == "Насос")
+        self.assertEqual(pumps, [(100, 100), (400, 100)])
+        self.assertEqual(len(other.process_scheme.elements_dict), 2)
+        other.close()
+
+    def test_delete_object_with_pipe(self):
+        for pos in (QPoint(100, 100), QPoint(400, 100)):
+            self.window.controller.set_element("QPump")
+            QTest.mouseClick(self.redactor, Qt.LeftButton, pos=pos)
+        first, second = self.redactor.objects
+        pipe = QPipe(first.out_point, second.in_point, first.logic_element, second.logic_element,
+                     logic_element=PipeElementElement(length=1.0, diameter=0.1),
+                     process_scheme=self.window.process_scheme, parent_widget=self.redactor)
+        self.redactor.objects.append(pipe)
+        scheme = self.window.process_scheme
+        self.assertEqual(len(scheme.elements_dict), 3)  # труба добавлена в схему один раз
+
+        self.redactor.remove_objects([first] + first.delete(remove_logic=False))
+        self.assertEqual(self.redactor.objects, [second])
+        self.assertEqual(self.redactor.pipes, [])
+        self.assertEqual(list(scheme.elements_dict.values()), [second.logic_element])
+        self.assertEqual(second.logic_element.in_elements, [])
+
+    def test_bulk_delete_releases_pipe_sensors(self):
+        for pos in (QPoint(100, 100), QPoint(400, 100)):
+            self.window.controller.set_element("QPump")
+            QTest.mouseClick(self.redactor, Qt.LeftButton, pos=pos)
+        first, second = self.redactor.objects
+        pipe = QPipe(first.out_point, second.in_point, first.logic_element, second.logic_element,
+                     logic_element=PipeElementElement(length=1.0, diameter=0.1),
+                     process_scheme=self.window.process_scheme, parent_widget=self.redactor)
+        self.redactor.objects.append(pipe)
+        sensor = QSensor(250, 50, self.redactor, Sensor('pressure'), self.window.process_scheme, pipe)
+        self.assertIs(self.redactor.sensor_boxes[id(sensor.logic_element)], sensor)
+
+        self.redactor.remove_objects([pipe] + pipe.delete(remove_logic=False))
+        self.assertEqual(self.redactor.sensor_boxes, {})
+        self.assertEqual(self.window.process_scheme.sensors, [])
+
     # Добавьте другие тесты по аналогии
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+# Таблица Бутчера метода Дормана–Принса 5(4)
+_DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+_DP_B = np.array([35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0.0])
+_DP_E = _DP_B - np.array([5179 / 57600, 0.0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+
+def rk45(rhs, y, dt, rtol=1e-6, atol=1e-9, h=None, max_steps=10000):
+    """
+    Проинтегрировать автономную систему y' = rhs(y) на интервале dt методом
+    Дормана–Принса 5(4) с автоматическим выбором шага.
+    Возвращает (y, число принятых шагов, последний шаг — для следующего вызова).
+    """
+    y = np.asarray(y, dtype=float)
+    t = 0.0
+    h = dt if h is None else min(h, dt)
+    steps = 0
+    k = [rhs(y)] + [None] * 6
+    while t < dt:
+        if steps >= max_steps:
+            raise RuntimeError(f"rk45: превышено число шагов ({max_steps})")
+        h = min(h, dt - t)
+        for i in range(1, 7):
+            k[i] = rhs(y + h * sum(a * k[j] for j, a in enumerate(_DP_A[i]) if a))
+        y_new = y + h * sum(b * k[j] for j, b in enumerate(_DP_B) if b)
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        error = np.sqrt(np.mean((h * sum(e * k[j] for j, e in enumerate(_DP_E)) / scale) ** 2)) if y.size else 0.0
+        if error <= 1.0:
+            t += h
+            y = y_new
+            k[0] = k[6]  # FSAL: последняя стадия — первая на следующем шаге
+            steps += 1
+        factor = 5.0 if error == 0.0 else min(5.0, max(0.2, 0.9 * error ** -0.2))
+        h *= factor if error <= 1.0 else min(1.0, factor)
+    return y, steps, h
+
+
+class TankIntegrator:
+    """
+    Общее интегрирование состояния ёмкостей (уровень, температура, давление) одним вектором.
+
+    Расходы, температура и давление на входах за шаг считаются постоянными (берутся
+    из прохода по плану), поэтому:
+      dT/dt = (t_in - T) / time_constant_t
+      dp/dt = (p_in - p) / time_constant_p
+      dh/dt = (f_in - sum(f_out_list)) / tank_area,  0 <= h <= volume / tank_area
+    method: 'implicit' — неявный Эйлер (устойчив при любом dt),
+            'rk45'     — Дорман–Принс с адаптивным шагом (rtol, atol).
+    """
+    METHODS = ('implicit', 'rk45')
+
+    def __init__(self, tanks, method='implicit', rtol=1e-6, atol=1e-9):
+        if method not in self.METHODS:
+            raise ValueError(f"Неизвестный метод интегрирования: {method}")
+        self.tanks = list(tanks)
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        self.substeps = 0  # внутренних шагов RK на последнем такте
+        self._h = None
+
+    def _column(self, name):
+        return np.fromiter((getattr(e, name) for e in self.tanks), float, len(self.tanks))
+
+    def step(self, dt):
+        """Продвинуть все ёмкости на dt и обновить их выходы."""
+        if not self.tanks or not dt or dt <= 0:
+            return
+        tanks = self.tanks
+        n = len(tanks)
+        level = self._column('level')
+        temperature = self._column('t_capacity')
+        pressure = self._column('p_capacity')
+        t_in = self._column('t_in')
+        p_in = self._column('p_in')
+        net_flow = np.fromiter((e.f_in - sum(e.f_out_list) for e in tanks), float, n)
+        area = self._column('tank_area')
+        tau_t = self._column('time_constant_t')
+        tau_p = self._column('time_constant_p')
+        rate = net_flow / area
+
+        if self.method == 'implicit':
+            kt = dt / tau_t
+            kp = dt / tau_p
+            temperature = (temperature + kt * t_in) / (1.0 + kt)
+            pressure = (pressure + kp * p_in) / (1.0 + kp)
+            level = level + rate * dt  # скорость постоянна за шаг — точное решение
+        else:
+            def rhs(y):
+                return np.concatenate(((t_in - y[:n]) / tau_t, (p_in - y[n:2 * n]) / tau_p, rate))
+            y, self.substeps, self._h = rk45(rhs, np.concatenate((temperature, pressure, level)), dt,
+                                             self.rtol, self.atol, self._h)
+            temperature, pressure, level = y[:n], y[n:2 * n], y[2 * n:]
+        level = np.clip(level, 0.0, self._column('volume') / area)
+
+        for elem, h, t, p in zip(tanks, level.tolist(), temperature.tolist(), pressure.tolist()):
+            elem.level = h
+            elem.t_capacity = t
+            elem.p_capacity = p
+            elem.change_t()
+            elem.change_p()
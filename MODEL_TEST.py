@@ -0,0 +1,1072 @@
+import json
+import math
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from BaseElement import *
+from SimulationClock import SimulationClock
+from BatchRunner import BatchRunner, ParameterSpec
+import SchemeFile
+import Benchmark
+import TickCompiler
+import WaterProperties
+import PumpCurves
+import AlarmEngine
+import SensorNoise
+import SensorHistory
+import numpy as np
+
+
+def build_line(scheme, *elements):
+    """Добавить элементы в схему и соединить их последовательно."""
+    indices = []
+    for elem in elements:
+        scheme.add_element(elem)
+        indices.append(elem.index)
+    for a, b in zip(indices, indices[1:]):
+        scheme.connect(a, b)
+    return indices
+
+
+class TestProcessScheme(unittest.TestCase):
+    def test_single_pass_with_reversed_insertion(self):
+        scheme = ProcessScheme()
+        # Элементы добавлены в обратном порядке: выход раньше источника
+        sink = ThermalFluidElement(heat_demand=0.0, resistance=0.0)
+        pipe = PipeElementElement(length=10.0, diameter=0.1)
+        pipe.resistance = 0.01
+        source = FlowSourceElement()
+        for elem in (sink, pipe, source):
+            scheme.add_element(elem)
+        scheme.connect(source.index, pipe.index)
+        scheme.connect(pipe.index, sink.index)
+        scheme.initialize_chains(p0=1.0, t0=70.0)
+        self.assertEqual(scheme.plan_elements, [source, pipe, sink])
+
+        scheme.calculate(flow=2.0)
+        self.assertAlmostEqual(sink.f_out, 2.0)
+        self.assertAlmostEqual(sink.p_out, 1.0 - 0.01 * 10.0 * 2.0)
+        self.assertAlmostEqual(sink.t_out, 70.0)
+
+    def test_plan_rebuilt_after_connect(self):
+        scheme = ProcessScheme()
+        source, pipe = FlowSourceElement(), PipeElementElement(1.0, 0.1)
+        build_line(scheme, source, pipe)
+        scheme.initialize_chains()
+        self.assertTrue(scheme.plan_ready)
+        tail = ThermalFluidElement(heat_demand=0.0)
+        scheme.add_element(tail)
+        self.assertFalse(scheme.plan_ready)
+        scheme.connect(pipe.index, tail.index)
+        scheme.initialize_chains()
+        self.assertEqual(scheme.plan_elements[-1], tail)
+
+    def test_array_state_matches_object_path(self):
+        results = []
+        for array_state in (False, True):
+            scheme = ProcessScheme()
+            source = FlowSourceElement()
+            pipe = PipeElementElement(length=5.0, diameter=0.1)
+            pipe.resistance = 0.02
+            boiler = BoilerElement(max_power_mw=1.0)
+            boiler.set_status(True)
+            boiler.set_power_percent(0.5)
+            split = PipeIntersectionElement(mode='split', resistances=[1.0, 3.0])
+            branch_a, branch_b = PipeElementElement(1.0, 0.1), PipeElementElement(2.0, 0.1)
+            merge = PipeIntersectionElement(mode='merge', resistances=[0.0, 0.0])
+            consumer = ThermalFluidElement(heat_demand=0.5)
+            build_line(scheme, source, pipe, boiler, split, branch_a, merge, consumer)
+            scheme.add_element(branch_b)
+            scheme.connect(split.index, branch_b.index)
+            scheme.connect(branch_b.index, merge.index)
+            if array_state:
+                scheme.enable_array_state(min_group_size=1)
+            scheme.initialize_chains(p0=2.0, t0=60.0)
+            scheme.calculate(flow=3.0)
+            scheme.sync_state()
+            results.append((consumer.t_out, consumer.p_out, consumer.f_out, branch_b.f_out))
+        for expected, actual in zip(*results):
+            self.assertAlmostEqual(expected, actual)
+
+    def test_array_state_fuses_runs_and_skips_narrow_schemes(self):
+        def build(array_state, branches):
+            scheme = ProcessScheme()
+            for k in range(branches):
+                boiler = BoilerElement(max_power_mw=1.0 + k)
+                boiler.set_status(True)
+                boiler.set_power_percent(0.5)
+                pipes = [PipeElementElement(1.0 + k, 0.1) for _ in range(3)]
+                for pipe in pipes:
+                    pipe.resistance = 0.01
+                build_line(scheme, FlowSourceElement(), *pipes[:2], boiler, PumpElement(), pipes[2],
+                           ThermalFluidElement(heat_demand=0.2, resistance=0.1))
+            if array_state:
+                scheme.enable_array_state(min_group_size=4)
+            scheme.initialize_chains(p0=2.0, t0=60.0)
+            for elem in scheme.elements_dict.values():
+                if isinstance(elem, PumpElement):
+                    elem.set_status(True)
+            scheme.calculate(flow=0.5)
+            pipes[1].depressurization(0.1)  # утечка: участок считается по позициям, а не суммами
+            scheme.calculate(flow=0.5)
+            scheme.sync_state()
+            return scheme, [(e.t_out, e.p_out, e.f_out) for e in scheme.plan_elements]
+
+        _, expected = build(False, 8)
+        wide, actual = build(True, 8)
+        np.testing.assert_allclose(actual, expected)
+        store = wide.state_store
+        self.assertTrue(store.vectorized)
+        # Участки «труба, труба, котёл» и «труба, потребитель» всех ветвей — два вызова ядра
+        self.assertEqual([len(group.members) for group in store.groups], [24, 16])
+        narrow, actual = build(True, 1)  # одна ветвь: 5 элементов на 2 вызова ядра
+        self.assertFalse(narrow.state_store.vectorized)
+        np.testing.assert_allclose(actual, build(False, 1)[1])
+
+    def test_array_state_refreshes_params_only_after_changes(self):
+        results = []
+        for array_state in (False, True):
+            scheme = ProcessScheme()
+            valve = MovElement(resistance_open=2.0, resistance_closed=100.0)
+            boiler = BoilerElement(max_power_mw=1.0)
+            boiler.set_status(True)
+            consumer = ThermalFluidElement(heat_demand=0.2)
+            build_line(scheme, FlowSourceElement(), PipeElementElement(1.0, 0.1), valve,
+                       PipeElementElement(2.0, 0.1), boiler, consumer)
+            if array_state:
+                scheme.enable_array_state(min_group_size=1)
+            scheme.initialize_chains(p0=2.0, t0=60.0)
+            refreshes = []
+            if array_state:
+                store = scheme.state_store
+                refresh = store.refresh_params
+                store.refresh_params = lambda: (refreshes.append(1), refresh())
+            trace = []
+            boiler.set_power_percent(0.5)
+            changes = (None, lambda: valve.set_position(0.3), None, lambda: boiler.set_power_percent(0.9))
+            for change in changes:
+                if change is not None:
+                    change()
+                scheme.calculate(flow=1.0)
+                scheme.sync_state()
+                trace.append((consumer.t_out, consumer.p_out, consumer.f_out))
+            results.append(trace)
+            if array_state:
+                self.assertEqual(len(refreshes), 3)  # первый такт, новое положение клапана, новая мощность
+        np.testing.assert_allclose(results[0], results[1])
+
+    def test_graph_condenses_loop_and_keeps_chains_lazy(self):
+        scheme = ProcessScheme()
+        source, pump, boiler, pipe = FlowSourceElement(), PumpElement(), BoilerElement(), PipeElementElement(1.0, 0.1)
+        build_line(scheme, source, pump, boiler, pipe)
+        scheme.connect(pipe.index, pump.index)  # кольцо pump -> boiler -> pipe -> pump
+        scheme.initialize_chains()
+        graph = scheme.graph
+        loop = graph.component_of[graph.position[id(pump)]]
+        self.assertTrue(graph.is_cyclic(loop))
+        self.assertEqual(len(graph.components), 2)
+        self.assertEqual(scheme.plan_elements, [source, pump, boiler, pipe])
+        self.assertEqual(graph.downstream(graph.position[id(boiler)]),
+                         frozenset(graph.position[id(e)] for e in (pump, boiler, pipe)))
+        chains = scheme.iter_chains()
+        self.assertEqual(next(chains), [source.index, pump.index, boiler.index, pipe.index])
+
+    def test_incremental_recalculation_touches_downstream_cone(self):
+        scheme = ProcessScheme()
+        scheme.incremental = True
+        pipes = [PipeElementElement(1.0, 0.1) for _ in range(10)]
+        pump = PumpElement(max_pressure=1.0)
+        build_line(scheme, FlowSourceElement(), *pipes[:5], pump, *pipes[5:])
+        scheme.initialize_chains(p0=2.0)
+        scheme.calculate(flow=1.0)
+
+        pump.set_status(True)
+        pump.set_power(0.5)
+        self.assertEqual(scheme.recalculate(), 6)  # насос и пять труб после него
+        self.assertAlmostEqual(pipes[-1].p_out, 2.5)
+
+        pump.set_power(0.5)  # значение не изменилось — распространение гаснет сразу
+        self.assertEqual(scheme.recalculate(), 2)
+
+    def test_incremental_matches_full_pass_on_loop(self):
+        results = []
+        for incremental in (False, True):
+            scheme = ProcessScheme()
+            scheme.incremental = incremental
+            merge = PipeIntersectionElement(mode='merge', resistances=[0.1, 0.1])
+            pump = PumpElement(max_pressure=1.0)
+            split = PipeIntersectionElement(mode='split', resistances=[1.0, 2.0])
+            back, out = PipeElementElement(2.0, 0.1), PipeElementElement(1.0, 0.1)
+            build_line(scheme, FlowSourceElement(), merge, pump, PipeElementElement(1.0, 0.1), split, out)
+            scheme.add_element(back)
+            scheme.connect(split.index, back.index)
+            scheme.connect(back.index, merge.index)  # кольцо рециркуляции
+            scheme.initialize_chains(p0=2.0, t0=20.0)
+            pump.set_status(True)
+            trace = []
+            for power in (0.5, 0.5, 0.8, 0.8, 0.8, 0.3, 0.3):
+                pump.set_power(power)
+                scheme.calculate(flow=1.0)
+                trace.append([(e.t_out, e.p_out, e.f_out) for e in scheme.plan_elements])
+            results.append(trace)
+        np.testing.assert_allclose(np.array(results[1], dtype=float), np.array(results[0], dtype=float), atol=1e-6)
+
+
+class TestHeadlessCore(unittest.TestCase):
+    def test_model_imports_without_qt(self):
+        code = "import sys, BaseElement; print(any(m.startswith('PyQt5') for m in sys.modules))"
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), 'False')
+
+    def test_signals_fire_and_are_not_copied(self):
+        scheme = ProcessScheme()
+        calls = []
+        scheme.chain_initialized.connect(lambda: calls.append('init'))
+        build_line(scheme, FlowSourceElement(), PipeElementElement(1.0, 0.1))
+        scheme.initialize_chains(p0=1.0)
+        self.assertEqual(calls, ['init'])
+        clone = pickle.loads(pickle.dumps(scheme))
+        self.assertEqual(len(clone.chain_initialized), 0)
+
+
+class TestBatchRunner(unittest.TestCase):
+    def build(self):
+        scheme = ProcessScheme()
+        source, pipe, flt = FlowSourceElement(), PipeElementElement(1.0, 0.1), FilterElement(base_resistance=0.5)
+        pipe.resistance = 0.1
+        flt.resistance = 0.5
+        build_line(scheme, source, pipe, flt)
+        scheme.initialize_chains(p0=5.0, t0=20.0)
+        specs = [ParameterSpec(pipe.index, 'depressurization', ('uniform', 0.0, 0.5)),
+                 ParameterSpec(flt.index, 'clog', ('uniform', 1.0, 3.0), points=2)]
+        observables = [(flt.index, 'p_out'), (flt.index, 'f_out'), (pipe.index, 'p_out')]
+        return scheme, specs, observables
+
+    def test_pool_matches_in_process_run(self):
+        scheme, specs, observables = self.build()
+        local = BatchRunner(scheme, specs, steps=4, observables=observables, seed=7, workers=1).run(12)
+        pooled = BatchRunner(scheme, specs, steps=4, observables=observables, seed=7, workers=2).run(12)
+        self.assertEqual(local.samples.shape, (12, 3))
+        np.testing.assert_allclose(local.values, pooled.values)
+        # Перепад на фильтре R * Q * clog — по значению засорения на последнем участке профиля
+        p_filter, flow, p_pipe = local.values.T
+        np.testing.assert_allclose((p_pipe - p_filter) / flow, 0.5 * local.samples[:, 2])
+        self.assertGreater(np.ptp(p_filter), 0.0)
+        low, mid, high = pooled.percentiles()[f"{observables[1][0]}.f_out"]
+        self.assertLessEqual(low, mid)
+        self.assertLessEqual(mid, high)
+        self.assertLessEqual(high, 1.0)
+
+
+class TestSchemeFile(unittest.TestCase):
+    def test_binary_and_json_round_trip(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=2.5, diameter=0.2)
+        pipe.depressurization(0.3)
+        boiler = BoilerElement(max_power_mw=5.0)
+        boiler.set_status(True)
+        boiler.set_power_percent(0.7)
+        tank = CapacityElement(num_in=2, volume=3.0)
+        build_line(scheme, FlowSourceElement(), pipe, boiler, tank)
+        sensor = Sensor('pressure')
+        sensor.tag = 'PT-1'
+        pipe.add_sensor(sensor)
+        scheme.sensors.append(sensor)
+        layout = {'nodes': [{'element': boiler.index, 'kind': 'QBoiler', 'x': 40, 'y': 60}],
+                  'pipes': [{'element': pipe.index, 'from': [0, 0], 'to': [boiler.index, 0],
+                             'points': [[0, 0], [20, 0]]}],
+                  'sensors': [{'sensor': 0, 'pipe': pipe.index, 'x': 10, 'y': -50}]}
+        expected = SchemeFile.scheme_to_document(scheme, layout)
+
+        folder = tempfile.mkdtemp()
+        for name in ('scheme.psim', 'scheme.json'):
+            path = os.path.join(folder, name)
+            SchemeFile.save(path, scheme, layout)
+            loaded, loaded_layout = SchemeFile.load(path)
+            self.assertEqual(SchemeFile.scheme_to_document(loaded, loaded_layout), expected)
+            loaded_tank = loaded.elements_dict[tank.index]
+            self.assertEqual(loaded_tank.in_elements[1], None)  # свободный порт сохраняется
+            self.assertIs(loaded.elements_dict[pipe.index].sensors[0], loaded.sensors[0])
+            self.assertAlmostEqual(loaded.elements_dict[boiler.index].get_power_percent(), 0.7)
+
+    def test_sensor_publishing_and_alarm_settings_round_trip(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, FlowSourceElement(), pipe)
+        quiet, plain = Sensor('pressure'), Sensor('flow')
+        quiet.set_deadband(0.25)
+        quiet.set_max_age(30.0)
+        quiet.set_alarm_limits(hi=8.0, lo=2.0, deadband=0.5, delay=1.5)
+        for sensor in (quiet, plain):
+            pipe.add_sensor(sensor)
+            scheme.sensors.append(sensor)
+        folder = tempfile.mkdtemp()
+        for name in ('scheme.psim', 'scheme.json'):
+            path = os.path.join(folder, name)
+            SchemeFile.save(path, scheme)
+            loaded = SchemeFile.load(path)[0].sensors
+            self.assertEqual((loaded[0].deadband, loaded[0].max_age), (0.25, 30.0))
+            np.testing.assert_equal(loaded[0].alarm_limits, quiet.alarm_limits)  # NaN — уровень не задан
+            self.assertEqual((loaded[1].deadband, loaded[1].max_age, loaded[1].alarm_limits), (0.0, 0.0, None))
+
+    def test_reads_version_1_sensors_with_defaults(self):
+        raw = 'pressure'.encode('utf-8')
+        data = (SchemeFile._HEADER.pack(SchemeFile.MAGIC, 1, 1, 0, 1, 0, 0, 0)
+                + SchemeFile._U32.pack(len(raw)) + raw
+                + SchemeFile._SENSOR_V1.pack(-1, 0, -1, 3))
+        record = SchemeFile.decode(data)['sensors'][0]
+        self.assertEqual(record, {'element': None, 'sensor_type': 'pressure', 'tag': None, 'index': 3,
+                                  'deadband': 0.0, 'max_age': 0.0, 'alarm_limits': None})
+        sensor = SchemeFile.document_to_scheme({'elements': [], 'sensors': [
+            {'element': None, 'sensor_type': 'flow', 'tag': None, 'index': 0}]}).sensors[0]
+        self.assertEqual((sensor.deadband, sensor.max_age, sensor.alarm_limits), (0.0, 0.0, None))
+
+
+class TestCompactElements(unittest.TestCase):
+    def test_elements_have_no_instance_dict(self):
+        for elem in (PipeElementElement(1.0, 0.1), CapacityElement(), BoilerElement(), Sensor('flow')):
+            self.assertFalse(hasattr(elem, '__dict__'), type(elem).__name__)
+        result = Benchmark.memory_benchmark(n_elements=2000)
+        self.assertLess(result['shell_bytes_per_element_slots'], result['shell_bytes_per_element_dict'])
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_generator_topologies_and_suite_file(self):
+        scheme = Benchmark.generate_network(2000, seed=5, sources=3, ladder_share=0.2, loop_share=0.1,
+                                            tank_share=0.05)
+        kinds = {type(e).__name__ for e in scheme.elements_dict.values()}
+        self.assertTrue({'FlowSourceElement', 'PipeIntersectionElement', 'CapacityElement', 'PumpElement'} <= kinds)
+        scheme.build_chains()
+        self.assertTrue(any(len(c) > 1 for c in scheme.graph.components))  # есть кольца
+        self.assertEqual(len(scheme.graph.weak_components()), 3)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            document = Benchmark.run_suite(sizes=(100, 300), ticks=2, path=path, memory=False, sources=2)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['results'], document['results'])
+        self.assertEqual([r['elements'] for r in document['results']], [100, 300])
+        self.assertGreater(document['results'][1]['tick_s'], 0.0)
+        slower = json.loads(json.dumps(document))
+        slower['results'][0]['tick_s'] *= 2
+        self.assertEqual([(n, metric) for n, metric, _, _ in Benchmark.compare(document, slower)], [(100, 'tick_s')])
+
+
+class TestParameterSchema(unittest.TestCase):
+    def test_schema_is_cached_and_values_are_flat(self):
+        first, second = BoilerElement(max_power_mw=5.0), BoilerElement()
+        self.assertIs(type(first).parameter_schema(), type(second).parameter_schema())
+        self.assertEqual(first.get_parameter_values()['max_power_mw'], 5.0)
+        # Подкласс переопределяет метаданные базового параметра, порядок — сначала свои параметры
+        schema = BoilerElement.parameter_schema()
+        self.assertEqual(schema['resistance']['max'], 1000.0)
+        self.assertEqual(list(schema)[-1], 'tag')
+        parameters = first.get_parameters()
+        self.assertIs(parameters['object']['object']['value'], first)
+        self.assertEqual(parameters['max_power_mw']['value'], 5.0)
+        self.assertEqual(parameters['max_power_mw']['label'], 'Максимальная мощность')
+        # Порядок редактора: параметры подкласса, паспорт объекта, параметры базового класса
+        self.assertEqual(list(parameters), ['max_power_mw', 'min_power_percent', 'power_percent', 'status',
+                                            'resistance', 'object', 'tag'])
+        self.assertEqual(list(Sensor('flow').get_parameters())[:2], ['object', 'sensor_type'])
+
+
+class TestRemoveElements(unittest.TestCase):
+    def test_bulk_removal_touches_only_neighbours(self):
+        scheme = ProcessScheme()
+        source, pump, pipe, tank = FlowSourceElement(), PumpElement(), PipeElementElement(1.0, 0.1), CapacityElement(num_in=2)
+        build_line(scheme, source, pump, pipe, tank)
+        sensor = Sensor('flow')
+        pipe.add_sensor(sensor)
+        scheme.sensors.append(sensor)
+        scheme.initialize_chains()
+        self.assertTrue(scheme.plan_ready)
+
+        scheme.remove_elements([pump.index, pipe.index])
+        self.assertEqual(sorted(scheme.elements_dict), [source.index, tank.index])
+        self.assertEqual(source.out_elements, [])
+        self.assertEqual(tank.in_elements, [None, None])  # порт ёмкости освобождён, а не удалён
+        self.assertEqual(scheme.sensors, [])
+        self.assertFalse(scheme.plan_ready)
+
+        scheme.connect(source.index, tank.index)
+        self.assertEqual(scheme.successors(source.index), [tank])
+        scheme.disconnect(source.index, tank.index)
+        self.assertEqual(scheme.neighbors(tank.index), [])
+
+
+class TestValidation(unittest.TestCase):
+    def test_structured_errors_before_simulation(self):
+        scheme = ProcessScheme()
+        first, second = FlowSourceElement(), FlowSourceElement()
+        split = PipeIntersectionElement(mode='split')
+        change = PipeChangeElement(new_diameter=0.0)
+        for elem in (first, second, split):
+            scheme.add_element(elem)
+        build_line(scheme, PipeElementElement(length=1.0, diameter=0.1), change)
+        scheme.connect(first.index, split.index)
+        scheme.connect(second.index, split.index)
+        with self.assertRaises(SchemeValidationError) as raised:
+            scheme.initialize_chains()
+        codes = {(issue.element, issue.code) for issue in raised.exception.issues if issue.severity == 'error'}
+        self.assertEqual(codes, {(split.index, 'ports'), (change.index, 'diameter')})
+        self.assertFalse(scheme.chain_ready)
+
+    def test_initial_states_are_seeded(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.2)
+        valve, tank = MovElement(), CapacityElement(num_out=2)
+        change = PipeChangeElement(new_diameter=0.1)
+        build_line(scheme, FlowSourceElement(), valve, tank, pipe, change)
+        scheme.initialize_chains(p0=2.0, t0=50.0)
+        self.assertEqual({issue.code for issue in scheme.validation_issues}, {'free_port'})
+        self.assertEqual((valve.t_out, valve.p_out, valve.f_out), (50.0, 2.0, 0.0))
+        scheme.calculate(flow=1.0)  # раньше — TypeError на f_out задвижки и p_out ёмкости
+        self.assertEqual(pipe.p_in, tank.p_capacity)
+        change.f_in = 0.01
+        change.change_p()
+        self.assertLess(change.p_out, change.p_in)  # сужение вдвое — потери давления
+
+    def test_reducer_pressure_drop_is_in_mpa(self):
+        scheme = ProcessScheme()
+        change = PipeChangeElement(new_diameter=0.05)
+        build_line(scheme, FlowSourceElement(), PipeElementElement(length=1.0, diameter=0.1), change)
+        change.f_in, change.p_in = 0.05, 1.0
+        change.change_p()
+        # 0.5 * 1000 * (25.5 - 6.4)^2 * 0.5625 Па ~ 0.103 МПа плюс линейные 0.0025 МПа
+        self.assertTrue(math.isfinite(change.p_out))
+        self.assertAlmostEqual(change.p_in - change.p_out, 0.1051, places=3)
+
+    def test_reducer_without_pipe_is_a_warning(self):
+        scheme = ProcessScheme()
+        change = PipeChangeElement(new_diameter=0.05)
+        build_line(scheme, FlowSourceElement(), change)
+        scheme.initialize_chains(p0=1.0)
+        self.assertIn(('warning', 'diameter'),
+                      {(issue.severity, issue.code) for issue in scheme.validation_issues if issue.element == change.index})
+        change.f_in, change.p_in = 0.05, 1.0
+        change.change_p()
+        self.assertAlmostEqual(change.p_out, 1.0 - 0.05 * change.length * 0.05)  # только линейные потери
+
+
+class TestSteadyState(unittest.TestCase):
+    def build(self):
+        """Контур с рециркуляцией: источник -> смешение -> насос -> труба -> разветвитель -> (возврат | потребитель)."""
+        scheme = ProcessScheme()
+        source, merge = FlowSourceElement(), PipeIntersectionElement(mode='merge')
+        pump, pipe = PumpElement(max_pressure=2.0), PipeElementElement(length=10.0, diameter=0.1)
+        split, back = PipeIntersectionElement(mode='split'), PipeElementElement(length=5.0, diameter=0.1)
+        consumer = ThermalFluidElement(heat_demand=0.5)
+        build_line(scheme, source, merge, pump, pipe, split, back)
+        scheme.connect(back.index, merge.index)
+        scheme.add_element(consumer)
+        scheme.connect(split.index, consumer.index)
+        pump.set_status(True)
+        pump.set_power(0.5)
+        scheme.initialize_chains(p0=1.0, t0=70.0)
+        split.set_resistances([3.0, 1.0])  # в возврат уходит четверть расхода
+        return scheme, merge, consumer
+
+    def test_loop_converges_and_warm_start_is_cheap(self):
+        scheme, merge, consumer = self.build()
+        report = scheme.solve_steady_state(flow=1.0, tolerance=1e-9)
+        self.assertEqual(len(report), 1)
+        self.assertTrue(report[0]['converged'])
+        self.assertNotIn(consumer.index, report[0]['elements'])
+        self.assertAlmostEqual(consumer.f_out, 1.0, places=6)  # баланс: весь подвод уходит потребителю
+        self.assertAlmostEqual(merge.f_out, 4 / 3, places=6)
+        self.assertIs(scheme.steady_state_report, report)
+
+        warm = scheme.solve_steady_state(flow=1.0, tolerance=1e-9)
+        self.assertLess(warm[0]['iterations'], report[0]['iterations'])
+        self.assertLessEqual(warm[0]['iterations'], 2)
+
+    def test_acceleration_and_iteration_cap(self):
+        scheme, _, consumer = self.build()
+        plain = scheme.solve_steady_state(tolerance=1e-9)[0]['iterations']
+        scheme, _, consumer = self.build()
+        accelerated = scheme.solve_steady_state(tolerance=1e-9, accelerate=True)[0]
+        self.assertTrue(accelerated['converged'])
+        self.assertLess(accelerated['iterations'], plain)
+        self.assertAlmostEqual(consumer.f_out, 1.0, places=6)
+
+        scheme, _, _ = self.build()
+        capped = scheme.solve_steady_state(tolerance=1e-12, max_iterations=3)[0]
+        self.assertEqual(capped['iterations'], 3)
+        self.assertFalse(capped['converged'])
+        self.assertGreater(capped['residual'], 1e-12)
+
+
+class TestSubnetworks(unittest.TestCase):
+    def build(self):
+        """Два независимых контура со своими источниками."""
+        scheme = ProcessScheme()
+        circuits = []
+        for _ in range(2):
+            source, pipe = FlowSourceElement(), PipeElementElement(length=1.0, diameter=0.1)
+            consumer = ThermalFluidElement(heat_demand=0.0)
+            build_line(scheme, source, pipe, consumer)
+            circuits.append((source, consumer))
+        scheme.initialize_chains(p0=1.0, t0=70.0)
+        return scheme, circuits
+
+    def test_every_source_gets_flow_and_components_run_in_parallel(self):
+        scheme, circuits = self.build()
+        self.assertEqual(len(scheme.subnetworks), 2)
+        self.assertEqual([sub.sources for sub in scheme.subnetworks], [[circuits[0][0]], [circuits[1][0]]])
+        scheme.calculate(flow=2.0)
+        self.assertEqual([consumer.f_out for _, consumer in circuits], [2.0, 2.0])
+
+        scheme.set_workers(2)
+        scheme.calculate(flow={circuits[0][0].index: 1.0, circuits[1][0].index: 3.0})
+        self.assertEqual([consumer.f_out for _, consumer in circuits], [1.0, 3.0])
+        timings = scheme.component_timings()
+        self.assertEqual(len(timings), 2)
+        self.assertTrue(all(t > 0.0 for t in timings))
+
+        clone = pickle.loads(pickle.dumps(scheme))  # пул потоков не сериализуется
+        clone.calculate(flow=4.0)
+        self.assertEqual(clone.elements_dict[circuits[1][1].index].f_out, 4.0)
+        scheme.set_workers(1)
+
+
+class TestTickCompiler(unittest.TestCase):
+    def test_compiled_tick_matches_interpreted_plan(self):
+        schemes = []
+        for compiled in (False, True):
+            scheme, _ = Benchmark._prepare_tick_scheme(600, seed=3, compiled=compiled)
+            for elem in scheme.elements_dict.values():
+                if isinstance(elem, PipeElementElement) and elem.index % 5 == 0:
+                    elem.depressurization(0.02)
+            for _ in range(3):
+                scheme.calculate(flow=2.0, dt=1.0)
+            schemes.append(scheme)
+        interpreted, compiled = schemes
+        self.assertIsNone(interpreted.compiled_tick)
+        self.assertIsNotNone(compiled.compiled_tick)
+        fields = ('t_in', 'p_in', 'f_in', 't_out', 'p_out', 'f_out')
+        for index, elem in interpreted.elements_dict.items():
+            other = compiled.elements_dict[index]
+            self.assertEqual([getattr(elem, n) for n in fields], [getattr(other, n) for n in fields])
+
+    def test_recompiled_after_topology_change_and_cached(self):
+        scheme = ProcessScheme()
+        scheme.enable_compiled_tick()
+        source, pipe = FlowSourceElement(), PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, source, pipe)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        cached = len(TickCompiler._CODE_CACHE)
+        same = ProcessScheme()
+        same.enable_compiled_tick()
+        build_line(same, FlowSourceElement(), PipeElementElement(length=2.0, diameter=0.1))
+        same.initialize_chains(p0=1.0, t0=20.0)
+        self.assertEqual(len(TickCompiler._CODE_CACHE), cached)  # та же структура — тот же код
+
+        consumer = ThermalFluidElement(heat_demand=0.0, resistance=0.5)
+        scheme.add_element(consumer)
+        scheme.connect(pipe.index, consumer.index)
+        self.assertIsNone(scheme.graph)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        scheme.calculate(flow=2.0)
+        self.assertAlmostEqual(consumer.p_out, 1.0 - 0.5 * 2.0)
+        clone = pickle.loads(pickle.dumps(scheme))
+        clone.calculate(flow=1.0)
+        self.assertIsNotNone(clone.compiled_tick)
+
+
+class TestWaterProperties(unittest.TestCase):
+    def test_tables_interpolate_vectorized(self):
+        self.assertAlmostEqual(WaterProperties.density(20.0), 998.2, places=1)
+        self.assertAlmostEqual(WaterProperties.heat_capacity(125.0), 4254.0, places=0)
+        self.assertGreater(WaterProperties.density(150.0, 1.6), WaterProperties.density(150.0, 0.6))
+        self.assertLess(WaterProperties.viscosity(90.0), WaterProperties.viscosity(20.0))
+        rho, cp, mu = WaterProperties.properties(np.array([20.0, 90.0, 150.0]), np.array([0.3, 0.6, 1.0]))
+        self.assertEqual(rho.shape, (3,))
+        np.testing.assert_allclose(cp, [WaterProperties.heat_capacity(t) for t in (20.0, 90.0, 150.0)])
+        self.assertAlmostEqual(WaterProperties.saturation_temperature(1.0), 179.9)
+
+    def test_elements_use_properties_and_darcy_friction(self):
+        results = []
+        for enabled in (False, True):
+            scheme = ProcessScheme()
+            pipe = PipeElementElement(length=10.0, diameter=0.1)
+            pipe.set_friction_model('darcy')
+            consumer = ThermalFluidElement(heat_demand=1.0, resistance=0.0)
+            build_line(scheme, FlowSourceElement(), pipe, consumer)
+            scheme.enable_water_properties(enabled)
+            scheme.initialize_chains(p0=1.0, t0=130.0)
+            for _ in range(2):
+                scheme.calculate(flow=1e-5)
+            results.append((consumer.cp, consumer.t_out, pipe.p_in - pipe.p_out, pipe.mu))
+        (cp_const, t_const, _, _), (cp_table, t_table, drop, mu) = results
+        self.assertEqual(cp_const, 4200.0)
+        self.assertAlmostEqual(cp_table, WaterProperties.heat_capacity(130.0, 1.0), places=6)
+        self.assertNotAlmostEqual(t_const, t_table, places=3)  # 130 °C: rho*cp меньше 1000*4200
+        # Ламинарный режим: потеря по Пуазейлю 128 * mu * L * Q / (pi * D^4), Па -> МПа
+        self.assertAlmostEqual(drop / (128 * mu * 10.0 * 1e-5 / (math.pi * 0.1 ** 4) / 1e6), 1.0, places=6)
+        self.assertGreater(darcy_friction(1e5, 5e-4), 0.0)
+        with self.assertRaises(ValueError):
+            pipe.set_friction_model('colebrook')
+
+    def test_incremental_follows_property_changes(self):
+        results = []
+        for incremental in (False, True):
+            scheme = ProcessScheme()
+            scheme.incremental = incremental
+            boiler = BoilerElement(max_power_mw=5.0)
+            hot = PipeElementElement(length=100.0, diameter=0.05)
+            hot.set_friction_model('darcy')
+            build_line(scheme, FlowSourceElement(), PipeElementElement(1.0, 0.1), boiler, hot,
+                       ThermalFluidElement(heat_demand=0.5, resistance=0.1))
+            scheme.enable_water_properties()
+            scheme.initialize_chains(p0=1.0, t0=20.0)
+            boiler.set_status(True)
+            trace = []
+            for percent in (50.0, 50.0, 100.0, 100.0, 100.0, 100.0):
+                boiler.set_power_percent(percent)
+                scheme.calculate(flow=0.01)
+                trace.append([(e.t_out, e.p_out, e.f_out) for e in scheme.plan_elements])
+            results.append(trace)
+        # Свойства трубы меняются такт спустя после нагрева — без отметки изменённой она бы не пересчиталась
+        np.testing.assert_allclose(np.array(results[1], dtype=float), np.array(results[0], dtype=float), atol=1e-6)
+
+    def test_array_state_updates_properties_in_kernel_arrays(self):
+        results = []
+        for array_state in (False, True):
+            scheme = ProcessScheme()
+            boiler = BoilerElement(max_power_mw=1.0)
+            boiler.set_status(True)
+            boiler.set_power_percent(0.8)
+            hot = PipeElementElement(length=50.0, diameter=0.05)
+            hot.set_friction_model('darcy')  # объектный расчёт: свойства — в атрибуты
+            consumer = ThermalFluidElement(heat_demand=0.3)
+            build_line(scheme, FlowSourceElement(), PipeElementElement(1.0, 0.1), boiler, hot, consumer)
+            scheme.enable_water_properties()
+            if array_state:
+                scheme.enable_array_state(min_group_size=1)
+            scheme.initialize_chains(p0=1.0, t0=40.0)
+            refreshes = []
+            if array_state:
+                store = scheme.state_store
+                refresh = store.refresh_params
+                store.refresh_params = lambda: (refreshes.append(1), refresh())
+            trace = []
+            for _ in range(4):
+                scheme.calculate(flow=0.01)
+                scheme.sync_state()
+                trace.append((boiler.t_out, hot.p_out, consumer.t_out))
+            results.append(trace)
+            if array_state:
+                self.assertEqual(len(refreshes), 1)  # свойства воды не требуют перечитывания параметров
+                self.assertEqual(consumer.cp, WATER_HEAT_CAPACITY)  # атрибуты ядерных элементов не трогаются
+                self.assertAlmostEqual(hot.mu, WaterProperties.viscosity(hot.t_in, hot.p_in))
+        np.testing.assert_allclose(results[0], results[1])
+
+
+
+class TestTankIntegrator(unittest.TestCase):
+    def build(self, method=None):
+        scheme = ProcessScheme()
+        if method is not None:
+            scheme.set_integrator(method)
+        tank = CapacityElement(volume=10.0)
+        build_line(scheme, FlowSourceElement(), tank, PipeElementElement(length=1.0, diameter=0.1))
+        scheme.initialize_chains(p0=1.0, t0=70.0)
+        return scheme, tank
+
+    def test_implicit_matches_former_smoothing_and_is_stable(self):
+        for method in (None, 'implicit'):
+            scheme, tank = self.build(method)
+            scheme.calculate(flow=1.0, dt=1.0)
+            self.assertAlmostEqual(tank.t_capacity, 0.9 * 20.0 + 0.1 * 70.0)  # прежний alpha = 0.1
+            scheme.calculate(flow=1.0, dt=1e4)
+            self.assertGreater(tank.t_capacity, 69.9)
+            self.assertLessEqual(tank.t_capacity, 70.0)  # без перескока при большом шаге
+            self.assertLessEqual(tank.p_capacity, 1.0)
+
+    def test_rk45_follows_exact_solution(self):
+        scheme, tank = self.build('rk45')
+        scheme.calculate(flow=1.0, dt=tank.time_constant_t)
+        self.assertAlmostEqual(tank.t_capacity, 70.0 - 50.0 * math.exp(-1.0), places=4)
+        self.assertGreater(scheme.tank_integrator.substeps, 1)
+        self.assertEqual(tank.t_out_list, [tank.t_capacity])
+        with self.assertRaises(ValueError):
+            scheme.set_integrator('euler')
+
+
+class TestPumpCurves(unittest.TestCase):
+    def curve(self, name):
+        return PumpCurves.PumpCurve(name, [0.0, 0.5, 1.0, 1.5, 2.0], [1.0, 0.95, 0.8, 0.55, 0.2],
+                                    efficiency=[0.0, 0.6, 0.75, 0.7, 0.5])
+
+    def build(self, name, mode=None):
+        scheme = ProcessScheme()
+        if mode is not None:
+            scheme.set_hydraulic_mode(mode, source_mode='pressure')
+        pump, pipe = PumpElement(), PipeElementElement(length=1.0, diameter=0.1)
+        pipe.resistance = 0.5
+        pump.set_curve(self.curve(name))
+        pump.set_status(True)
+        pump.set_power(1.0)
+        build_line(scheme, FlowSourceElement(), pump, pipe)
+        scheme.initialize_chains(p0=0.0, t0=20.0)
+        return scheme, pump, pipe
+
+    def test_affinity_laws_and_shared_model(self):
+        curve = PumpCurves.register_curve(self.curve('test-affinity'))
+        pumps = [PumpElement() for _ in range(3)]
+        for pump in pumps:
+            pump.set_model('test-affinity')
+        self.assertTrue(all(pump.curve is curve for pump in pumps))
+        self.assertAlmostEqual(curve.head(0.5, 0.5), 0.25 * curve.head(1.0))
+        self.assertAlmostEqual(curve.efficiency(0.5, 0.5), 0.75)
+        self.assertAlmostEqual(curve.slope(1.25), -0.5)
+
+        bank = PumpCurves.PumpBank(pumps)
+        flows, speeds = np.array([0.2, 1.2, 3.0]), np.array([1.0, 0.7, 0.0])
+        head, slope = bank.evaluate(flows, speeds)
+        for q, n, h, d in zip(flows, speeds, head, slope):
+            self.assertAlmostEqual(h, curve.head(q, n))
+            self.assertAlmostEqual(d, curve.slope(q, n))
+        self.assertIs(pickle.loads(pickle.dumps(pumps[0])).curve, curve)
+
+    def test_chain_and_compiled_tick_follow_curve(self):
+        for compiled in (False, True):
+            scheme, pump, pipe = self.build('test-chain')
+            scheme.enable_compiled_tick(compiled)
+            scheme.calculate(flow=1.0)
+            self.assertAlmostEqual(pump.p_out - pump.p_in, 0.8)
+            pump.set_power(0.5)
+            scheme.calculate(flow=1.0)
+            self.assertAlmostEqual(pump.p_out - pump.p_in, 0.25 * 0.2)
+
+    def test_network_finds_operating_point(self):
+        scheme, pump, pipe = self.build('test-network', mode='network')
+        for power in (1.0, 0.8):
+            pump.set_power(power)
+            scheme.calculate(flow=1.0)
+            q = pump.f_out
+            self.assertAlmostEqual(pipe.p_in - pipe.p_out, 0.5 * q, places=6)
+            self.assertAlmostEqual(pump.p_out - pump.p_in, pump.curve.head(q, power), places=5)
+        self.assertLess(scheme.network_solver.curve_iterations, 10)
+
+
+class TestAlarmEngine(unittest.TestCase):
+    def test_deadband_and_delay(self):
+        sensor = Sensor('pressure')
+        sensor.set_alarm_limits(hihi=10.0, hi=8.0, lo=2.0, deadband=0.5, delay=1.0)
+        engine = AlarmEngine.AlarmEngine(max_events=2)
+        sensors = [sensor, Sensor('flow')]  # второй датчик без уставок не проверяется
+
+        def step(value):
+            sensor.value = value
+            engine.evaluate(sensors, dt=0.5)
+            return sensor.alarm
+
+        self.assertIsNone(step(9.0))          # задержка 1 с ещё не прошла
+        self.assertEqual(step(9.0), 'HI')
+        self.assertEqual(step(7.8), 'HI')     # в зоне возврата
+        self.assertIsNone(step(7.4))
+        self.assertIsNone(step(1.0))
+        self.assertEqual(step(1.0), 'LO')
+        self.assertEqual(len(engine.sensors), 1)
+        # Очередь ограничена: первое событие (срабатывание HI) вытеснено
+        self.assertEqual([(e.level, e.active) for e in engine.drain()], [('HI', False), ('LO', True)])
+        self.assertEqual(engine.coils().tolist(), [False, False, True, False])
+
+    def test_scheme_evaluates_after_tick(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, FlowSourceElement(), pipe)
+        sensor = Sensor('flow')
+        pipe.add_sensor(sensor)
+        scheme.sensors.append(sensor)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        scheme.enable_alarms()
+        sensor.set_alarm_limits(hi=0.5)
+        scheme.calculate(flow=1.0)
+        self.assertEqual(sensor.alarm, 'HI')
+        self.assertEqual(scheme.alarms.active(), [(sensor, 'HI')])
+        sensor.set_alarm_limits()
+        scheme.calculate(flow=1.0)
+        self.assertEqual(scheme.alarms.sensors, [])
+        self.assertIsNone(sensor.alarm)
+
+
+class TestModbusMap(unittest.TestCase):
+    def test_maps_elements_with_modbus_model(self):
+        from types import SimpleNamespace
+        from ModbusClient import ModbusAddressMapGenerator
+        scheme = ProcessScheme()
+        source, pipe, pump = FlowSourceElement(), PipeElementElement(1.0, 0.1), PumpElement()
+        build_line(scheme, source, pipe, pump)
+        self.assertIsNone(pipe.modbus)
+        pump.modbus = SimpleNamespace(inputs={'status': {'type': 'coil'}},
+                                      outputs={'p_out': {'type': 'ir', 'scale': 0.01}})
+        mapping = ModbusAddressMapGenerator(start_ir=100).generate_for_scheme(scheme)
+        base = f"PumpElement[{pump.index}]"
+        self.assertEqual(list(mapping), [f"{base}.status", f"{base}.p_out"])
+        self.assertEqual((mapping[f"{base}.status"]['area'], mapping[f"{base}.status"]['address']), ('coil', 0))
+        self.assertEqual((mapping[f"{base}.p_out"]['area'], mapping[f"{base}.p_out"]['address']), ('ir', 100))
+
+
+class TestSensorPublishing(unittest.TestCase):
+    def test_deadband_and_max_age(self):
+        sensor = Sensor('pressure')
+        sensor.deadband = 0.5
+        sensor.max_age = 2.0
+        self.assertTrue(sensor.update(1.0, now=0.0))
+        self.assertFalse(sensor.update(1.4, now=0.5))   # в зоне нечувствительности
+        self.assertEqual(sensor.value, 1.0)
+        self.assertTrue(sensor.update(1.6, now=1.0))
+        self.assertFalse(sensor.update(1.6, now=2.5))
+        self.assertTrue(sensor.update(1.6, now=3.0))    # истёк max_age
+        self.assertEqual(sensor.published_at, 3.0)
+
+    def test_scheme_publishes_changed_sensors(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, FlowSourceElement(), pipe)
+        quiet, noisy = Sensor('flow'), Sensor('flow')
+        quiet.deadband = 1.0
+        quiet.max_age = 0.15
+        for sensor in (quiet, noisy):
+            pipe.add_sensor(sensor)
+            scheme.sensors.append(sensor)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        received = []
+        scheme.sensors_changed.connect(lambda sensors: received.append(list(sensors)))
+        for _ in range(3):
+            scheme.calculate(flow=1.0, dt=0.1)
+        self.assertEqual(received[0], [quiet, noisy])
+        self.assertEqual(received[1], [noisy])          # дребезг 0.05 не выходит за зону 1.0
+        self.assertEqual(received[2], [quiet, noisy])
+        self.assertEqual(scheme.changed_sensors, [quiet, noisy])
+
+
+
+class TestSensorNoise(unittest.TestCase):
+    def build(self, seed):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, FlowSourceElement(), pipe)
+        for sensor_type in ('pressure', 'flow', 'temperature'):
+            sensor = Sensor(sensor_type)
+            pipe.add_sensor(sensor)
+            scheme.sensors.append(sensor)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        scheme.enable_noise(seed=seed, models={'temperature': SensorNoise.NoiseModel('gauss', 0.2, quantum=0.5)})
+        return scheme, pipe
+
+    def run_scheme(self, seed, ticks=5):
+        scheme, pipe = self.build(seed)
+        values = []
+        for _ in range(ticks):
+            scheme.calculate(flow=1.0, dt=0.1)
+            values.append([s.value for s in scheme.sensors])
+        return scheme, pipe, values
+
+    def test_reproducible_per_seed(self):
+        _, pipe, first = self.run_scheme(seed=3)
+        _, _, second = self.run_scheme(seed=3)
+        _, _, other = self.run_scheme(seed=4)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        for pressure, flow, temperature in first:
+            self.assertLessEqual(abs(pressure - pipe.p_out), 0.1)
+            self.assertLessEqual(abs(flow - 1.0), 0.05)
+            self.assertAlmostEqual(temperature / 0.5, round(temperature / 0.5))  # квантование
+
+    def test_deadband_in_vector_publish(self):
+        scheme, _ = self.build(seed=0)
+        quiet = scheme.sensors[1]
+        quiet.set_deadband(1.0)
+        published = []
+        for _ in range(3):
+            scheme.calculate(flow=1.0, dt=0.1)
+            published.append(quiet in scheme.changed_sensors)
+        self.assertEqual(published, [True, False, False])
+
+    def test_colored_noise_statistics(self):
+        rng = np.random.default_rng(0)
+        block = SensorNoise.generate_block(SensorNoise.NoiseModel('colored', 2.0, correlation=0.9), 20000, rng)
+        self.assertAlmostEqual(block.std(), 2.0, delta=0.3)
+        self.assertAlmostEqual(np.corrcoef(block[:-1], block[1:])[0, 1], 0.9, delta=0.05)
+        with self.assertRaises(ValueError):
+            SensorNoise.generate_block(SensorNoise.NoiseModel('pink', 1.0), 10, rng)
+
+    def test_colored_noise_is_stationary_from_first_sample(self):
+        model = SensorNoise.NoiseModel('colored', 2.0, correlation=0.9)
+        first = [SensorNoise.generate_block(model, 2, np.random.default_rng(seed))[0] for seed in range(4000)]
+        self.assertAlmostEqual(np.std(first), 2.0, delta=0.1)
+        vectorized = SensorNoise.generate_block(model, 500, np.random.default_rng(1))
+        lfilter, SensorNoise.lfilter = SensorNoise.lfilter, None  # запасной путь без SciPy
+        try:
+            looped = SensorNoise.generate_block(model, 500, np.random.default_rng(1))
+        finally:
+            SensorNoise.lfilter = lfilter
+        np.testing.assert_allclose(vectorized, looped)
+
+
+
+class TestSensorHistory(unittest.TestCase):
+    def test_rollups_cascade(self):
+        history = SensorHistory.SensorHistory(capacity=50, rollup_capacity=(200, 10, 2), columns=1)
+        a, b = Sensor('pressure'), Sensor('flow')
+        for k in range(1, 241):  # 60 с с тактом 0.25 с; датчик b публикуется с 25 с
+            a.value = float(k)
+            changed = [a]
+            if k == 100:
+                b.value = 7.0
+                changed.append(b)
+            history.record(k * 0.25, changed)
+        self.assertEqual(history.sensors, [a, b])
+        self.assertEqual(len(history), 50)                  # кольцо исходных тактов заполнено
+        second = history.query(1.0, 1.9, resolution=1.0)   # интервал [1, 2): такты 4..7
+        np.testing.assert_allclose(second.time, [1.0])
+        np.testing.assert_allclose(second.min[0], [4.0, np.nan])
+        np.testing.assert_allclose(second.max[0], [7.0, np.nan])
+        np.testing.assert_allclose(second.mean[0], [5.5, np.nan])
+        self.assertEqual(len(history.query(0.0, 60.0, [a], resolution=60.0).time), 0)  # минута не завершена
+        history.record(61.0, [])  # завершается интервал 1 с [60, 61), а с ним минута
+        minute = history.query(0.0, 0.0, [a], resolution=60.0)
+        np.testing.assert_allclose([minute.min[0, 0], minute.max[0, 0], minute.mean[0, 0]], [1.0, 239.0, 120.0])
+        time, values = history.series(b, start=55.0)        # самое подробное хранилище, где есть start
+        self.assertTrue(np.all(values == 7.0))
+        self.assertEqual(time[0], 55.0)
+        with self.assertRaises(ValueError):
+            history.query(0.0, 1.0, [Sensor('flow')])
+
+    def test_scheme_records_each_tick(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, FlowSourceElement(), pipe)
+        sensor = Sensor('pressure')
+        pipe.add_sensor(sensor)
+        scheme.sensors.append(sensor)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        history = scheme.enable_history(capacity=100)
+        sensor.set_deadband(10.0)  # публикуется один раз, дальше значение держится
+        for _ in range(25):
+            scheme.calculate(flow=1.0, dt=0.1)
+        time, values = history.series(sensor)
+        self.assertEqual(len(time), 25)
+        self.assertTrue(np.all(values == np.float32(sensor.value)))
+        self.assertEqual(len(history.query(0.0, 10.0, resolution=1.0).time), 2)
+
+class TestProfiler(unittest.TestCase):
+    def test_counts_per_class_and_phase_and_detaches(self):
+        scheme = ProcessScheme()
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        build_line(scheme, FlowSourceElement(), PumpElement(), pipe)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        scheme.enable_compiled_tick()
+        dumps = []
+        profiler = scheme.enable_profiling(dump_interval=0.0, dump=dumps.append)
+        for _ in range(5):
+            scheme.calculate(flow=1.0)
+        self.assertIsNone(scheme.compiled_tick)  # такт идёт через инструментированный план
+        self.assertEqual(profiler.ticks, 5)
+        self.assertEqual(profiler.counters[('PipeElementElement', 'work')][0], 5)
+        self.assertEqual(profiler.counters[('PipeElementElement', 'update_sensors')][0], 5)
+        self.assertEqual(profiler.counters[('PumpElement', 'change_p')][0], 5)
+        self.assertEqual(len(dumps), 5)
+        self.assertIn('PipeElementElement', profiler.format_report())
+        pickle.loads(pickle.dumps(scheme)).calculate(flow=1.0)
+
+        scheme.enable_profiling(False)
+        scheme.calculate(flow=1.0)
+        self.assertNotIn('calculate', vars(scheme))
+        self.assertNotIn('update_inputs', vars(PumpElement))
+        self.assertIsNotNone(scheme.compiled_tick)
+        self.assertEqual(profiler.ticks, 5)
+
+
+class TestNetworkSolver(unittest.TestCase):
+    def build(self):
+        scheme = ProcessScheme()
+        scheme.set_hydraulic_mode('network')
+        source, pump = FlowSourceElement(), PumpElement(max_pressure=2.0)
+        pump.set_status(True)
+        pump.set_power(0.5)
+        split, merge = PipeIntersectionElement(mode='split'), PipeIntersectionElement(mode='merge')
+        pipe = PipeElementElement(length=1.0, diameter=0.1)
+        pipe.resistance = 1.0
+        valve = MovElement(resistance_open=2.0, resistance_closed=100.0)
+        consumer = ThermalFluidElement(heat_demand=0.0, resistance=0.5)
+        build_line(scheme, source, pump, split, pipe, merge, consumer)
+        scheme.add_element(valve)
+        scheme.connect(split.index, valve.index)
+        scheme.connect(valve.index, merge.index)
+        scheme.initialize_chains(p0=1.0, t0=70.0)
+        return scheme, pipe, valve, consumer
+
+    def test_parallel_branches_share_flow_by_conductance(self):
+        scheme, pipe, valve, consumer = self.build()
+        scheme.calculate(flow=3.0)
+        self.assertAlmostEqual(pipe.f_out, 2.0, places=6)
+        self.assertAlmostEqual(valve.f_out, 1.0, places=6)
+        self.assertAlmostEqual(consumer.f_in, 3.0, places=6)
+        self.assertAlmostEqual(consumer.p_in, 1.5, places=6)
+
+    def test_valve_change_reuses_factorization(self):
+        scheme, pipe, valve, consumer = self.build()
+        scheme.calculate(flow=3.0)
+        valve.set_position(0.5)
+        scheme.calculate(flow=3.0)
+        self.assertEqual(scheme.network_solver.factorizations, 1)
+
+        fresh, fresh_pipe, fresh_valve, _ = self.build()
+        fresh_valve.set_position(0.5)
+        fresh.calculate(flow=3.0)
+        self.assertAlmostEqual(pipe.f_out, fresh_pipe.f_out, places=6)
+        self.assertAlmostEqual(valve.f_out, fresh_valve.f_out, places=6)
+
+
+class TestSimulationClock(unittest.TestCase):
+    def test_dt_reaches_capacity_and_max_mode_counts_steps(self):
+        scheme = ProcessScheme()
+        tank = CapacityElement(num_out=0, volume=10.0)  # без выхода: уровень растёт на f * dt
+        build_line(scheme, FlowSourceElement(), tank)
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        clock = SimulationClock(scheme, dt=0.5, mode='max')
+        clock.run(steps=4)
+        self.assertEqual(clock.steps, 4)
+        self.assertAlmostEqual(clock.sim_time, 2.0)
+        self.assertAlmostEqual(tank.level, 2.0)
+        self.assertIsNone(clock.stats()['target_rate'])
+
+    def test_overrun_reschedules_one_period_ahead(self):
+        scheme = ProcessScheme()
+        build_line(scheme, FlowSourceElement(), PipeElementElement(1.0, 0.1))
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        clock = SimulationClock(scheme, dt=0.01, mode='realtime', max_catch_up=5)
+        clock.start()
+        clock._next_deadline = time.perf_counter() - 1.0  # отстали на 1 с (100 шагов)
+        before = time.perf_counter()
+        self.assertEqual(clock.poll(), 5)
+        self.assertEqual(clock.overruns, 100)
+        # Следующий шаг — через один период, а не через max_catch_up периодов
+        self.assertGreater(clock._next_deadline, before)
+        self.assertLessEqual(clock._next_deadline, time.perf_counter() + 0.01)
+
+    def test_waits_for_initialized_scheme(self):
+        scheme = ProcessScheme()
+        build_line(scheme, FlowSourceElement(), PipeElementElement(1.0, 0.1))
+        clock = SimulationClock(scheme, dt=0.1, mode='realtime')
+        clock.start()
+        self.assertEqual(clock.poll(), 0)
+        self.assertEqual((clock.steps, clock.sim_time, clock._next_deadline), (0, 0.0, None))
+        scheme.initialize_chains(p0=1.0, t0=20.0)
+        self.assertEqual(clock.poll(), 1)
+        self.assertAlmostEqual(clock.sim_time, scheme.sim_time)
+        self.assertAlmostEqual(scheme.sim_time, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
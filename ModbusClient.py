@@ -53,6 +53,26 @@ class ModbusAddressMapGenerator:
 
         return self.map
 
+    def generate_for_alarms(self, alarms):
+        """
+        Катушки сигнализации: по одной на уровень (HIHI, HI, LO, LOLO) каждого датчика
+        с уставками, подряд в порядке AlarmEngine.coils(). Возвращает адрес первой катушки.
+        """
+        from AlarmEngine import LEVELS
+        start = self.next_coil
+        for sensor in alarms.sensors:
+            base_name = f"Sensor[{sensor.index}]"
+            for level in LEVELS:
+                addr, area = self._allocate_address({"type": "coil"})
+                self.map[f"{base_name}.{level}"] = {
+                    "direction": "out",
+                    "area": area,
+                    "address": addr,
+                    "type": "coil",
+                    "scale": 1.0,
+                }
+        return start
+
     def _allocate_address(self, meta):
         t = meta["type"]
         w = meta.get("width", 1)
@@ -113,6 +133,8 @@ class PlcSignalType(Enum):
     INPUT_REGISTER = auto()
 
 class PlcSignal:
+    __slots__ = ('name', 'address', 'sig_type', 'direction', 'scale', 'offset', 'value')
+
     def __init__(self, name, address, sig_type:PlcSignalType,
                  direction:PlcSignalDirection,
                  scale=1.0, offset=0.0):
@@ -138,6 +160,44 @@ class ModbusClientManager:
         self.client = ModbusTcpClient(host, port=port)
         self.client.connect()
 
+    def write_alarm_coils(self, alarms, address):
+        """Записать состояния сигнализации одним запросом (адрес — из generate_for_alarms)."""
+        coils = alarms.coils()
+        if len(coils):
+            self.client.write_coils(address, coils.tolist())
+
+    @staticmethod
+    def index_bindings(bindings):
+        """Привязки выходных сигналов по id элемента — для write_changed."""
+        index = {}
+        for binding in bindings:
+            if binding.signal.direction is PlcSignalDirection.OUTPUT:
+                index.setdefault(id(binding.element), []).append(binding)
+        return index
+
+    def write_changed(self, index, changed):
+        """
+        Записать в ПЛК только сигналы изменившихся элементов (changed — список
+        ProcessScheme.changed_sensors или аргумент сигнала sensors_changed).
+        Возвращает число записанных сигналов.
+        """
+        written = 0
+        for element in changed:
+            for binding in index.get(id(element), ()):
+                signal = binding.signal
+                value = getattr(binding.element, binding.attr_name)
+                if value is None:
+                    continue
+                if signal.sig_type is PlcSignalType.COIL:
+                    self.client.write_coil(signal.address, bool(value))
+                elif signal.sig_type is PlcSignalType.HOLDING_REGISTER:
+                    self.client.write_register(signal.address, signal.to_raw(value))
+                else:
+                    continue
+                signal.value = value
+                written += 1
+        return written
+
 
 class PlcBinding:
     """
@@ -0,0 +1,315 @@
+import numpy as np
+from BaseElement import (FlowSourceElement, PipeIntersectionElement, PipeElementElement,
+                         CapacityElement, PumpElement)
+
+try:
+    from scipy.sparse import csc_matrix
+    from scipy.sparse.linalg import splu
+except ImportError:  # без SciPy — плотная факторизация средствами NumPy
+    csc_matrix = None
+    splu = None
+
+
+class _DenseFactor:
+    """Запасной вариант факторизации, если SciPy не установлен."""
+    def __init__(self, matrix):
+        self.inverse = np.linalg.inv(matrix)
+
+    def solve(self, rhs):
+        return self.inverse @ rhs
+
+
+class NetworkSolver:
+    """
+    Узловой гидравлический расчёт сети.
+
+    Каждый элемент — ветвь между узлом входа и узлом выхода с проводимостью g = 1/R
+    и напором H (у насосов H = max_pressure * power): Q = g * (p_in - p_out + H).
+    Напор насоса с характеристикой зависит от расхода; на каждой итерации Ньютона
+    она линеаризуется в текущей точке H(Q) ~ H(q0) + H'(q0) * (Q - q0), что даёт
+    ветвь с эффективной проводимостью g / (1 - g * H') и напором H(q0) - H'(q0) * q0.
+    Разветвители и слияния — сами узлы. Граничные условия:
+      - FlowSourceElement — заданный расход (source_mode='flow')
+        или заданное давление p_in (source_mode='pressure');
+      - выход концевого элемента — давление p_sink;
+      - ёмкость — давление p_capacity на входе и выходе.
+    Система K * p = b факторизуется один раз на топологию. Изменение напора насосов
+    меняет только правую часть, изменение сопротивлений (задвижки, фильтры) учитывается
+    малоранговой поправкой Вудбери к той же факторизации.
+    """
+    def __init__(self, elements, source_mode='flow', p_sink=0.0, r_min=1e-6, max_low_rank=16,
+                 curve_tolerance=1e-9, max_curve_iterations=20):
+        self.source_mode = source_mode
+        self.p_sink = p_sink
+        self.r_min = r_min
+        self.max_low_rank = max_low_rank
+        self.curve_tolerance = curve_tolerance
+        self.max_curve_iterations = max_curve_iterations
+        self.factorizations = 0  # счётчик полных факторизаций (для диагностики)
+        self.curve_iterations = 0  # итераций Ньютона по характеристикам на последнем расчёте
+        self._build(elements)
+
+    # --- Топология ---
+    def _build(self, elements):
+        # Порты: 2*k — вход элемента k, 2*k+1 — выход; соединения сливают порты в узлы
+        self.elements = list(elements)
+        position = {id(e): k for k, e in enumerate(self.elements)}
+        parent = list(range(2 * len(self.elements)))
+
+        def find(a):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+
+        def union(a, b):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[rb] = ra
+
+        for k, elem in enumerate(self.elements):
+            if isinstance(elem, PipeIntersectionElement):
+                union(2 * k, 2 * k + 1)  # узел без собственного сопротивления
+            for next_elem in elem.out_elements:
+                if next_elem is not None and id(next_elem) in position:
+                    union(2 * k + 1, 2 * position[id(next_elem)])
+
+        roots = {}
+        node_of_port = [roots.setdefault(find(p), len(roots)) for p in range(len(parent))]
+        self.n_nodes = len(roots)
+        self.in_node = np.array(node_of_port[0::2], dtype=np.intp)
+        self.out_node = np.array(node_of_port[1::2], dtype=np.intp)
+
+        # Ветви — все элементы, кроме узлов-пересечений и ёмкостей (у ёмкости своё давление)
+        self.branches = [k for k, e in enumerate(self.elements)
+                         if not isinstance(e, (PipeIntersectionElement, CapacityElement))]
+        self.branch_elements = [self.elements[k] for k in self.branches]
+        self.b_from = self.in_node[self.branches]
+        self.b_to = self.out_node[self.branches]
+        self.pumps = [(i, e) for i, e in enumerate(self.branch_elements) if isinstance(e, PumpElement)]
+        self.leaks = [(i, e) for i, e in enumerate(self.branch_elements) if isinstance(e, PipeElementElement)]
+        self.sources = [(i, e) for i, e in enumerate(self.branch_elements) if isinstance(e, FlowSourceElement)]
+        curve_pumps = [(i, e) for i, e in self.pumps if e.curve is not None]
+        self.curve_pumps = np.array([i for i, _ in curve_pumps], dtype=np.intp)
+        self.pump_bank = None
+        if curve_pumps:
+            from PumpCurves import PumpBank
+            self.pump_bank = PumpBank(e for _, e in curve_pumps)
+            self._pump_flow = np.array([e.f_in or 0.0 for _, e in curve_pumps])
+
+        # Узлы с заданным давлением: выходы концевых элементов и порты ёмкостей
+        fixed = {}
+        for k, elem in enumerate(self.elements):
+            if isinstance(elem, CapacityElement):
+                fixed[self.in_node[k]] = elem
+                fixed[self.out_node[k]] = elem
+            elif not any(n is not None for n in elem.out_elements) and not isinstance(elem, PipeIntersectionElement):
+                fixed.setdefault(self.out_node[k], None)
+        if self.source_mode == 'pressure':
+            for i, elem in self.sources:
+                fixed[self.b_from[i]] = elem
+        self.fixed_nodes = fixed
+
+        # Связные части без опорного давления закрепляем по первому узлу
+        self._pin_floating_parts()
+
+        fixed_mask = np.zeros(self.n_nodes, dtype=bool)
+        fixed_mask[list(self.fixed_nodes)] = True
+        self.free = np.flatnonzero(~fixed_mask)
+        self.free_index = np.full(self.n_nodes, -1, dtype=np.intp)
+        self.free_index[self.free] = np.arange(len(self.free))
+        self.fixed_mask = fixed_mask
+
+        self._factor = None
+        self._g0 = None
+        self._woodbury = {}
+
+    def _pin_floating_parts(self):
+        parent = list(range(self.n_nodes))
+
+        def find(a):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+
+        for a, b in zip(self.b_from.tolist(), self.b_to.tolist()):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[rb] = ra
+        anchored = {find(n) for n in self.fixed_nodes}
+        for node in range(self.n_nodes):
+            root = find(node)
+            if root not in anchored:
+                anchored.add(root)
+                self.fixed_nodes[node] = None
+
+    # --- Параметры ветвей ---
+    def conductances(self):
+        r = np.fromiter((e.get_resistance() for e in self.branch_elements), float, len(self.branch_elements))
+        return 1.0 / np.maximum(r, self.r_min)
+
+    def heads(self):
+        h = np.zeros(len(self.branch_elements))
+        for i, pump in self.pumps:
+            if pump.status and pump.curve is None:
+                h[i] = pump.max_pressure * pump.power
+        return h
+
+    def leak_conductances(self, g):
+        leak = np.zeros(self.n_nodes)
+        for i, pipe in self.leaks:
+            if pipe.breach and pipe.breach_percent > 0:
+                leak[self.b_to[i]] += min(pipe.breach_percent, 1.0) * g[i]
+        return leak
+
+    def fixed_pressures(self):
+        p = np.zeros(self.n_nodes)
+        for node, elem in self.fixed_nodes.items():
+            if isinstance(elem, CapacityElement):
+                p[node] = elem.p_capacity
+            elif isinstance(elem, FlowSourceElement):
+                p[node] = elem.p_in if elem.p_in is not None else 0.0
+            else:
+                p[node] = self.p_sink
+        return p
+
+    def injections(self):
+        q = np.zeros(self.n_nodes)
+        if self.source_mode == 'flow':
+            for i, source in self.sources:
+                q[self.b_from[i]] += source.f_out or 0.0
+        return q
+
+    # --- Матрица и факторизация ---
+    def _factorize(self, g, leak):
+        n = len(self.free)
+        fi = self.free_index[self.b_from]
+        ti = self.free_index[self.b_to]
+        rows, cols, vals = [], [], []
+        for a, b in ((fi, fi), (ti, ti), (fi, ti), (ti, fi)):
+            mask = (a >= 0) & (b >= 0)
+            rows.append(a[mask])
+            cols.append(b[mask])
+            vals.append(g[mask] if a is b else -g[mask])
+        leak_free = leak[self.free]
+        rows.append(np.arange(n))
+        cols.append(np.arange(n))
+        vals.append(leak_free)
+        rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        if splu is not None:
+            self._factor = splu(csc_matrix((vals, (rows, cols)), shape=(n, n)))
+        else:
+            dense = np.zeros((n, n))
+            np.add.at(dense, (rows, cols), vals)
+            self._factor = _DenseFactor(dense)
+        self._g0 = g.copy()
+        self._leak0 = leak_free.copy()
+        self._woodbury = {}
+        self.factorizations += 1
+
+    def _correction(self, changed):
+        """Множители поправки Вудбери для набора ветвей с изменённой проводимостью."""
+        key = tuple(changed.tolist())
+        cached = self._woodbury.get(key)
+        if cached is None:
+            n = len(self.free)
+            u = np.zeros((n, len(changed)))
+            fi = self.free_index[self.b_from[changed]]
+            ti = self.free_index[self.b_to[changed]]
+            cols = np.arange(len(changed))
+            u[fi[fi >= 0], cols[fi >= 0]] = 1.0
+            u[ti[ti >= 0], cols[ti >= 0]] = -1.0
+            z = self._factor.solve(u)
+            cached = (u, z, u.T @ z)
+            self._woodbury[key] = cached
+        return cached
+
+    def solve(self):
+        """Рассчитать давления в узлах и расходы в ветвях, вернуть (p, q)."""
+        g = self.conductances()
+        h = self.heads()
+        if self.pump_bank is None:
+            return self._solve_linear(g, h)
+
+        idx = self.curve_pumps
+        g_pump = g[idx]
+        speeds = self.pump_bank.speeds()
+        q0 = self._pump_flow
+        for self.curve_iterations in range(1, self.max_curve_iterations + 1):
+            head, slope = self.pump_bank.evaluate(q0, speeds)
+            slope = np.minimum(slope, 0.0)  # восходящий участок — без отрицательной проводимости
+            g[idx] = g_pump / (1.0 - g_pump * slope)
+            h[idx] = head - slope * q0
+            p, q = self._solve_linear(g, h)
+            q_new = q[idx]
+            converged = np.all(np.abs(q_new - q0) <= self.curve_tolerance * (1.0 + np.abs(q_new)))
+            q0 = q_new
+            if converged:
+                break
+        self._pump_flow = q0
+        return p, q
+
+    def _solve_linear(self, g, h):
+        leak = self.leak_conductances(g)
+        if (self._factor is None or not np.array_equal(leak[self.free], self._leak0)
+                or len(g) != len(self._g0)):
+            self._factorize(g, leak)
+        changed = np.flatnonzero(np.abs(g - self._g0) > 1e-12 * np.abs(self._g0))
+        if len(changed) > self.max_low_rank:
+            self._factorize(g, leak)
+            changed = changed[:0]
+
+        p_fixed = self.fixed_pressures()
+        # Правая часть: инъекции, напоры насосов и вклад узлов с заданным давлением
+        rhs = self.injections()
+        gh = g * h
+        np.add.at(rhs, self.b_from, -gh)
+        np.add.at(rhs, self.b_to, gh)
+        from_fixed = self.fixed_mask[self.b_from]
+        to_fixed = self.fixed_mask[self.b_to]
+        np.add.at(rhs, self.b_to[from_fixed], g[from_fixed] * p_fixed[self.b_from[from_fixed]])
+        np.add.at(rhs, self.b_from[to_fixed], g[to_fixed] * p_fixed[self.b_to[to_fixed]])
+        b = rhs[self.free]
+
+        x = self._factor.solve(b)
+        if len(changed):
+            u, z, utz = self._correction(changed)
+            dg = g[changed] - self._g0[changed]
+            s = np.diag(1.0 / dg) + utz
+            x = x - z @ np.linalg.solve(s, u.T @ x)
+
+        p = p_fixed.copy()
+        p[self.free] = x
+        q = g * (p[self.b_from] - p[self.b_to] + h)
+        return p, q
+
+    # --- Запись результата в элементы ---
+    def write_back(self, p, q):
+        flow = {}
+        for elem, qi, a, b in zip(self.branch_elements, q.tolist(),
+                                  self.b_from.tolist(), self.b_to.tolist()):
+            elem.p_in = float(p[a])
+            elem.p_out = float(p[b])
+            elem.f_in = qi
+            elem.f_out = qi
+            flow[id(elem)] = qi
+        for i, pipe in self.leaks:
+            if pipe.breach and pipe.breach_percent > 0:
+                # Утечка — расход через проводимость прорыва в окружающую среду (p = 0)
+                lost = min(pipe.breach_percent, 1.0) * (1.0 / max(pipe.get_resistance(), self.r_min)) * pipe.p_out
+                pipe.f_out = max(pipe.f_in - lost, 0.0)
+                flow[id(pipe)] = pipe.f_out
+        for k, elem in enumerate(self.elements):
+            if isinstance(elem, PipeIntersectionElement):
+                node_p = float(p[self.in_node[k]])
+                inflow = sum(flow.get(id(e), 0.0) for e in elem.in_elements if e is not None)
+                elem.p_in = elem.p_out = node_p
+                elem.f_in = elem.f_out = inflow
+                outs = [flow.get(id(e), 0.0) for e in elem.out_elements]
+                elem.f_out_list = outs
+                elem.p_out_list = [node_p] * len(outs)
+            elif isinstance(elem, CapacityElement):
+                outs = [flow.get(id(e), 0.0) if e is not None else 0.0 for e in elem.out_elements]
+                elem.f_out_list = outs
+                elem.p_out_list = [elem.p_capacity] * len(outs)
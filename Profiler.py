@@ -0,0 +1,247 @@
+"""
+Профилирование такта расчёта.
+
+TickProfiler подключается к схеме только по запросу (ProcessScheme.enable_profiling):
+  - план расчёта и планы участков заменяются обёртками, считающими время work()
+    по классам элементов;
+  - методы фаз (update_inputs, change_t/p/f, update_sensors) классов элементов плана
+    на время профилирования заменяются обёртками, считающими время по классу и фазе;
+  - этапы такта схемы (узловой расчёт, свойства воды, массивное хранилище,
+    интегратор ёмкостей, шум и история датчиков, сигнализация) и сам calculate()
+    оборачиваются атрибутами экземпляров.
+При отключении всё возвращается как было, поэтому без профилирования накладных
+расходов нет. Счётчики — списки [вызовы, секунды] по ключу (владелец, фаза).
+Счётчики не защищены блокировкой: при workers > 1 возможны потерянные вызовы.
+"""
+import copy
+import sys
+import time
+
+PHASES = ('update_inputs', 'change_t', 'change_p', 'change_f', 'update_sensors')
+
+_perf = time.perf_counter
+_MISSING = object()
+_patched = {}        # (класс, метод) -> [исходный атрибут класса или _MISSING, число профилировщиков]
+_current = None      # профилировщик, такт которого сейчас выполняется
+_inside_phase = False
+
+
+def _phase_wrapper(owner, name, function):
+    def wrapper(self, *args):
+        global _inside_phase
+        profiler = _current
+        if profiler is None or _inside_phase:
+            return function(self, *args)
+        _inside_phase = True
+        start = _perf()
+        try:
+            return function(self, *args)
+        finally:
+            counter = profiler.counter(owner, name)
+            counter[0] += 1
+            counter[1] += _perf() - start
+            _inside_phase = False
+    wrapper.__name__ = name
+    return wrapper
+
+
+def _patch(cls, name):
+    entry = _patched.get((cls, name))
+    if entry is None:
+        entry = _patched[(cls, name)] = [vars(cls).get(name, _MISSING), 0]
+        setattr(cls, name, _phase_wrapper(cls.__name__, name, getattr(cls, name)))
+    entry[1] += 1
+
+
+def _unpatch(cls, name):
+    entry = _patched[(cls, name)]
+    entry[1] -= 1
+    if entry[1] == 0:
+        del _patched[(cls, name)]
+        if entry[0] is _MISSING:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, entry[0])
+
+
+def _print_report(profiler):
+    sys.stderr.write(profiler.format_report() + "\n")
+
+
+class TickProfiler:
+    """
+    Счётчики времени такта по классам элементов и фазам.
+    dump_interval — период (с, по часам) вызова dump(profiler); dump — функция
+    или путь к файлу, в конец которого дописывается отчёт (по умолчанию — stderr).
+    """
+    STAGES = (('scheme', 'solve_network', 'network'),
+              ('scheme', 'update_water_properties', 'water_properties'),
+              ('state_store', 'run', 'state_store'),
+              ('tank_integrator', 'step', 'tank_integrator'),
+              ('noise', 'publish', 'noise'),
+              ('history', 'record', 'history'),
+              ('alarms', 'evaluate', 'alarms'))
+
+    def __init__(self, dump_interval=None, dump=None):
+        self.counters = {}
+        self.ticks = 0
+        self.tick_time = 0.0
+        self.dump_interval = dump_interval
+        if isinstance(dump, str):
+            path = dump
+            dump = lambda profiler: self._append(path)
+        self.dump = dump or _print_report
+        self.scheme = None
+        self._classes = set()
+        self._wrapped = []   # (объект, имя атрибута) — обёртки, установленные в экземпляры
+        self._last_dump = _perf()
+
+    # --- Счётчики ---
+    def counter(self, owner, phase):
+        counter = self.counters.get((owner, phase))
+        if counter is None:
+            counter = self.counters[(owner, phase)] = [0, 0.0]
+        return counter
+
+    def record(self, owner, phase, seconds, calls=1):
+        """Добавить внешний замер (например, перерисовку редактора)."""
+        counter = self.counter(owner, phase)
+        counter[0] += calls
+        counter[1] += seconds
+
+    def reset(self):
+        for counter in self.counters.values():
+            counter[0] = 0
+            counter[1] = 0.0
+        self.ticks = 0
+        self.tick_time = 0.0
+
+    # --- Подключение к схеме ---
+    def attach(self, scheme):
+        self.scheme = scheme
+        original = type(scheme).calculate.__get__(scheme)
+
+        def calculate(flow=1.0, dt=1.0):
+            global _current
+            if _current is self:  # вложенный вызов (recalculate) — часть текущего такта
+                return original(flow, dt)
+            previous, _current = _current, self
+            start = _perf()
+            try:
+                original(flow, dt)
+            finally:
+                _current = previous
+                self.ticks += 1
+                self.tick_time += _perf() - start
+            if self.dump_interval is not None and start - self._last_dump >= self.dump_interval:
+                self._last_dump = start
+                self.dump(self)
+
+        self._set(scheme, 'calculate', calculate)
+        scheme.invalidate_plan()  # план соберётся заново и будет инструментирован (instrument)
+
+    def instrument(self, scheme):
+        """Заменить план схемы обёртками (вызывается из build_plan)."""
+        scheme.plan = [self._timed_work(elem) for elem in scheme.plan_elements]
+        for sub in scheme.subnetworks:
+            sub.plan = [self._timed_work(elem) for elem in sub.elements]
+        for cls in {type(elem) for elem in scheme.plan_elements} - self._classes:
+            self._classes.add(cls)
+            for name in PHASES:
+                if hasattr(cls, name):
+                    _patch(cls, name)
+        self._wrap_stages()
+
+    def detach(self):
+        """Снять все обёртки; план схемы будет собран заново без них."""
+        for obj, name in self._wrapped:
+            if vars(obj).get(name) is not None:
+                delattr(obj, name)
+        self._wrapped = []
+        for cls in self._classes:
+            for name in PHASES:
+                if (cls, name) in _patched:
+                    _unpatch(cls, name)
+        self._classes = set()
+        if self.scheme is not None:
+            self.scheme.invalidate_plan()
+            self.scheme = None
+
+    def _timed_work(self, elem):
+        counter = self.counter(type(elem).__name__, 'work')
+        work = elem.work
+
+        def timed(dt):
+            start = _perf()
+            work(dt)
+            counter[1] += _perf() - start
+            counter[0] += 1
+        return timed
+
+    def _set(self, obj, name, function):
+        setattr(obj, name, function)
+        self._wrapped.append((obj, name))
+
+    def _wrap_stages(self):
+        for holder, name, phase in self.STAGES:
+            obj = self.scheme if holder == 'scheme' else getattr(self.scheme, holder)
+            if obj is None or name in vars(obj):
+                continue
+            function = getattr(obj, name)
+            counter = self.counter(type(obj).__name__, phase)
+
+            def timed(*args, function=function, counter=counter):
+                start = _perf()
+                try:
+                    return function(*args)
+                finally:
+                    counter[1] += _perf() - start
+                    counter[0] += 1
+            self._set(obj, name, timed)
+
+    def strip(self, state):
+        """Состояние схемы (словарь __getstate__) без обёрток — для сериализации."""
+        state.pop('calculate', None)
+        clones = {}
+        for obj, name in self._wrapped:
+            if obj is self.scheme:
+                state.pop(name, None)
+                continue
+            for key, value in state.items():
+                if value is obj or clones.get(id(obj)) is value:
+                    clone = clones.get(id(obj))
+                    if clone is None:
+                        clone = clones[id(obj)] = copy.copy(obj)
+                    vars(clone).pop(name, None)
+                    state[key] = clone
+        state['profiler'] = None
+        state['plan'] = []
+        state['subnetworks'] = []
+        state['plan_ready'] = False
+        return state
+
+    # --- Отчёт ---
+    def report(self):
+        """Строки отчёта по убыванию времени: owner, phase, calls, seconds, mean, share (доля такта)."""
+        rows = []
+        for (owner, phase), (calls, seconds) in self.counters.items():
+            if not calls:
+                continue
+            rows.append({'owner': owner, 'phase': phase, 'calls': calls, 'seconds': seconds,
+                         'mean': seconds / calls,
+                         'share': seconds / self.tick_time if self.tick_time else 0.0})
+        rows.sort(key=lambda row: row['seconds'], reverse=True)
+        return rows
+
+    def format_report(self, limit=20):
+        mean_tick = self.tick_time / self.ticks if self.ticks else 0.0
+        lines = [f"Тактов: {self.ticks}, среднее время такта: {mean_tick * 1e3:.3f} мс",
+                 f"{'Владелец':<28}{'Фаза':<18}{'Вызовы':>10}{'Всего, мс':>12}{'Среднее, мкс':>14}{'Доля':>8}"]
+        for row in self.report()[:limit]:
+            lines.append(f"{row['owner']:<28}{row['phase']:<18}{row['calls']:>10}{row['seconds'] * 1e3:>12.3f}"
+                         f"{row['mean'] * 1e6:>14.2f}{row['share']:>8.1%}")
+        return "\n".join(lines)
+
+    def _append(self, path):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(self.format_report() + "\n\n")
@@ -0,0 +1,150 @@
+"""
+Характеристики насосов: напор H(Q) и КПД(Q) модели насоса на номинальной частоте.
+
+Кривая задаётся таблицей точек и хранится в реестре по имени модели; насосы одной
+модели ссылаются на один объект PumpCurve (память не растёт с числом насосов).
+Частота вращения — power насоса (доля номинальной), пересчёт по законам подобия:
+    Q ~ n,  H ~ n^2,  КПД(Q, n) = КПД_0(Q / n).
+Между точками — линейная интерполяция, за крайними точками — продолжение крайних
+отрезков (запирание при Q = 0, выход за рабочую зону при больших расходах).
+Для узлового расчёта PumpBank вычисляет напоры и производные dH/dQ всех насосов
+одним векторным проходом по группам насосов одной модели.
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+
+class PumpCurve:
+    """
+    Характеристика модели насоса.
+
+    flow       — расходы точек, м3/с (строго возрастают);
+    head       — напор в точках, МПа;
+    efficiency — КПД в точках (0...1), необязательно.
+    """
+    __slots__ = ('name', 'flow', 'head_points', 'efficiency_points', 'slopes', '_flow', '_head', '_slope')
+
+    def __init__(self, name, flow, head, efficiency=None):
+        flow = np.asarray(flow, dtype=float)
+        head = np.asarray(head, dtype=float)
+        if flow.ndim != 1 or len(flow) < 2 or flow.shape != head.shape:
+            raise ValueError("Кривая насоса: нужно не менее двух точек (Q, H) одинаковой длины")
+        if np.any(np.diff(flow) <= 0):
+            raise ValueError("Кривая насоса: расходы точек должны возрастать")
+        if efficiency is not None:
+            efficiency = np.asarray(efficiency, dtype=float)
+            if efficiency.shape != flow.shape:
+                raise ValueError("Кривая насоса: КПД задаётся в тех же точках, что и напор")
+            efficiency.setflags(write=False)
+        self.name = name
+        self.flow = flow
+        self.head_points = head
+        self.efficiency_points = efficiency
+        self.slopes = np.diff(head) / np.diff(flow)
+        for array in (flow, head, self.slopes):
+            array.setflags(write=False)
+        # Копии в виде кортежей — для быстрых скалярных вызовов из work()
+        self._flow = tuple(flow.tolist())
+        self._head = tuple(head.tolist())
+        self._slope = tuple(self.slopes.tolist())
+
+    def __reduce__(self):
+        # Копия в другом процессе берёт кривую из реестра, если модель там уже есть
+        return _restore_curve, (self.name, self.flow, self.head_points, self.efficiency_points)
+
+    def _segment(self, x):
+        return min(max(bisect_right(self._flow, x) - 1, 0), len(self._flow) - 2)
+
+    def head(self, q, speed=1.0):
+        """Напор при расходе q и относительной частоте speed, МПа."""
+        if speed <= 0:
+            return 0.0
+        x = q / speed
+        k = self._segment(x)
+        return speed * speed * (self._head[k] + self._slope[k] * (x - self._flow[k]))
+
+    def slope(self, q, speed=1.0):
+        """Производная напора по расходу dH/dQ при частоте speed."""
+        if speed <= 0:
+            return 0.0
+        return speed * self._slope[self._segment(q / speed)]
+
+    def efficiency(self, q, speed=1.0):
+        """КПД при расходе q и частоте speed (None, если КПД не задан)."""
+        if self.efficiency_points is None:
+            return None
+        if speed <= 0:
+            return 0.0
+        return float(np.interp(q / speed, self.flow, self.efficiency_points))
+
+    def evaluate(self, q, speed):
+        """
+        Векторный расчёт для массивов q и speed: (напор, dH/dQ, КПД или None).
+        При speed <= 0 напор и производная нулевые.
+        """
+        running = speed > 0
+        x = np.divide(q, speed, out=np.zeros_like(q), where=running)
+        k = np.clip(np.searchsorted(self.flow, x, side='right') - 1, 0, len(self.flow) - 2)
+        slope = self.slopes[k]
+        head = np.where(running, speed * speed * (self.head_points[k] + slope * (x - self.flow[k])), 0.0)
+        derivative = np.where(running, speed * slope, 0.0)
+        efficiency = None
+        if self.efficiency_points is not None:
+            efficiency = np.where(running, np.interp(x, self.flow, self.efficiency_points), 0.0)
+        return head, derivative, efficiency
+
+
+# --- Реестр моделей насосов ---
+_CURVES = {}
+
+
+def register_curve(curve):
+    """Зарегистрировать кривую модели (заменяет прежнюю с тем же именем)."""
+    _CURVES[curve.name] = curve
+    return curve
+
+
+def get_curve(name):
+    """Кривая модели по имени или None."""
+    return _CURVES.get(name)
+
+
+def curve_names():
+    return list(_CURVES)
+
+
+def _restore_curve(name, flow, head, efficiency):
+    curve = _CURVES.get(name)
+    if curve is None:
+        curve = register_curve(PumpCurve(name, flow, head, efficiency))
+    return curve
+
+
+class PumpBank:
+    """
+    Насосы с характеристиками, сгруппированные по модели, для расчёта всех сразу.
+    Порядок результатов — порядок списка pumps.
+    """
+    def __init__(self, pumps):
+        self.pumps = list(pumps)
+        groups = {}
+        for k, pump in enumerate(self.pumps):
+            groups.setdefault(id(pump.curve), (pump.curve, []))[1].append(k)
+        self.groups = [(curve, np.array(members, dtype=np.intp)) for curve, members in groups.values()]
+
+    def __len__(self):
+        return len(self.pumps)
+
+    def speeds(self):
+        return np.fromiter((p.power if p.status else 0.0 for p in self.pumps), float, len(self.pumps))
+
+    def evaluate(self, flows, speeds=None):
+        """Напоры (МПа) и производные dH/dQ всех насосов при расходах flows."""
+        flows = np.asarray(flows, dtype=float)
+        speeds = self.speeds() if speeds is None else speeds
+        head = np.zeros(len(self.pumps))
+        derivative = np.zeros(len(self.pumps))
+        for curve, members in self.groups:
+            head[members], derivative[members], _ = curve.evaluate(flows[members], speeds[members])
+        return head, derivative
@@ -0,0 +1,348 @@
+"""
+Сохранение и загрузка схемы.
+
+Документ схемы — словарь:
+    {
+      'format': 'process-scheme', 'version': 2,
+      'elements': [{'index', 'type', 'init': {...}, 'params': {...}, 'in': [...], 'out': [...]}],
+      'sensors':  [{'element', 'sensor_type', 'tag', 'index', 'deadband', 'max_age', 'alarm_limits'}],
+      'layout':   {'nodes': [...], 'pipes': [...], 'sensors': [...]}   # данные редактора, может отсутствовать
+    }
+'init' — аргументы конструктора, 'params' — значения из get_parameter_values(); в 'in'/'out' —
+индексы соседних элементов (None — свободный порт ёмкости). 'alarm_limits' датчика —
+[HIHI, HI, LO, LOLO, зона возврата, задержка] (None — уровень не задан) или None; в файлах
+версии 1 полей публикации и уставок нет (берутся значения по умолчанию). Записи 'layout':
+    nodes:   {'element', 'kind' (класс объекта редактора), 'x', 'y'}
+    pipes:   {'element', 'from': [элемент, порт], 'to': [элемент, порт], 'points': [[x, y], ...]}
+    sensors: {'sensor' (позиция в scheme.sensors), 'pipe', 'x', 'y'}
+Документ записывается
+компактно в двоичном виде (.psim) или в JSON (.json).
+"""
+
+import inspect
+import json
+import struct
+from array import array
+
+from BaseElement import BaseElement, ProcessScheme, Sensor
+
+MAGIC = b'PSIM'
+VERSION = 2
+
+_HEADER = struct.Struct('<4sHIIIIII')  # magic, версия, строки, элементы, датчики, узлы, трубы, подписи датчиков
+_ELEMENT = struct.Struct('<IHHHHH')    # индекс, тип, init, params, входы, выходы
+_FIELD = struct.Struct('<HB')          # имя, вид значения
+_SENSOR = struct.Struct('<iHiidd?6d')  # элемент, тип, тег, индекс, deadband, max_age, есть уставки, уставки (NaN — нет)
+_SENSOR_V1 = struct.Struct('<iHii')    # версия 1: элемент, тип, тег, индекс
+_NODE = struct.Struct('<IHii')         # элемент, вид объекта редактора, x, y
+_PIPE = struct.Struct('<IiHiHI')       # элемент, откуда (элемент, порт), куда (элемент, порт), число точек
+_SENSOR_BOX = struct.Struct('<IIii')   # позиция датчика в scheme.sensors, труба, x, y
+_U32 = struct.Struct('<I')
+_VALUES = {1: struct.Struct('<d'), 2: struct.Struct('<q'), 3: struct.Struct('<?'), 4: struct.Struct('<I')}
+
+_NONE = -1
+
+
+def element_types():
+    """Все классы элементов модели по имени."""
+    types = {}
+    pending = [BaseElement]
+    while pending:
+        cls = pending.pop()
+        types[cls.__name__] = cls
+        pending.extend(cls.__subclasses__())
+    return types
+
+
+_init_names = {}
+
+
+def _constructor_args(cls):
+    """Имена скалярных аргументов конструктора класса (кэшируется)."""
+    names = _init_names.get(cls)
+    if names is None:
+        names = tuple(name for name in inspect.signature(cls.__init__).parameters
+                      if name not in ('self', 'in_elements', 'in_indices'))
+        _init_names[cls] = names
+    return names
+
+
+def _scalar(value):
+    return value is None or isinstance(value, (bool, int, float, str))
+
+
+def _attribute(elem, name):
+    if hasattr(elem, '_' + name):
+        return getattr(elem, '_' + name)
+    return getattr(elem, name, _attribute)
+
+
+def _set_parameter(elem, schema, name, value):
+    # Значения пишутся в поле напрямую: сеттеры с проверками зависят от порядка параметров
+    meta = schema.get(name)
+    if meta is not None:
+        setattr(elem, meta['attr'], value)
+
+
+# --- Схема <-> документ ---
+def element_record(elem):
+    cls = type(elem)
+    init = {}
+    for name in _constructor_args(cls):
+        value = _attribute(elem, name)
+        if value is not _attribute and _scalar(value):
+            init[name] = value
+    params = {name: value for name, value in elem.get_parameter_values().items() if _scalar(value)}
+    return {
+        'index': elem.index,
+        'type': cls.__name__,
+        'init': init,
+        'params': params,
+        'in': [e.index if e is not None else None for e in elem.in_elements],
+        'out': [e.index if e is not None else None for e in elem.out_elements],
+    }
+
+
+def scheme_to_document(scheme, layout=None):
+    elements = [element_record(e) for e in scheme.elements_dict.values()]
+    owner = {}
+    for elem in scheme.elements_dict.values():
+        for sensor in getattr(elem, 'sensors', ()):
+            owner[id(sensor)] = elem.index
+    sensors = [{'element': owner.get(id(s)), 'sensor_type': s.sensor_type, 'tag': s.tag, 'index': s.index,
+                'deadband': s.deadband, 'max_age': s.max_age, 'alarm_limits': _limits_record(s.alarm_limits)}
+               for s in scheme.sensors]
+    document = {'format': 'process-scheme', 'version': VERSION, 'elements': elements, 'sensors': sensors}
+    if layout is not None:
+        document['layout'] = layout
+    return document
+
+
+def _limits_record(limits):
+    if limits is None:
+        return None
+    return [None if x != x else x for x in limits[:4]] + list(limits[4:])
+
+
+def document_to_scheme(document, scheme=None):
+    """Построить элементы документа (одним пакетом) в новой или очищенной схеме."""
+    if scheme is None:
+        scheme = ProcessScheme()
+    else:
+        scheme.clear()
+    types = element_types()
+    built = {}
+    records = document['elements']
+    for record in records:
+        cls = types.get(record['type'])
+        if cls is None:
+            raise ValueError(f"Неизвестный тип элемента: {record['type']}")
+        elem = cls(**record['init'])
+        schema = cls.parameter_schema()
+        for name, value in record['params'].items():
+            _set_parameter(elem, schema, name, value)
+        elem.index = record['index']
+        built[elem.index] = elem
+    for record in records:
+        elem = built[record['index']]
+        elem.in_elements = [built[i] if i is not None else None for i in record['in']]
+        elem.out_elements = [built[i] if i is not None else None for i in record['out']]
+        elem.in_indices = [i for i in record['in'] if i is not None]
+        elem.out_indices = [i for i in record['out'] if i is not None]
+    scheme.add_elements(built.values())
+
+    for record in document.get('sensors', ()):
+        sensor = Sensor(record['sensor_type'])
+        sensor.tag = record['tag']
+        sensor.index = record['index']
+        sensor.set_deadband(record.get('deadband', 0.0))
+        sensor.set_max_age(record.get('max_age', 0.0))
+        limits = record.get('alarm_limits')
+        if limits is not None:
+            sensor.set_alarm_limits(*limits[:4], deadband=limits[4], delay=limits[5])
+        scheme.sensors.append(sensor)
+        owner = built.get(record['element'])
+        if owner is not None and hasattr(owner, 'sensors'):
+            owner.sensors.append(sensor)
+    return scheme
+
+
+# --- Двоичная запись ---
+class _Strings:
+    def __init__(self):
+        self.items = []
+        self.ids = {}
+
+    def __call__(self, text):
+        if text is None:
+            return _NONE
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.items)
+            self.items.append(text)
+        return sid
+
+
+def _write_fields(out, fields, strings):
+    for name, value in fields.items():
+        if value is None:
+            out.append(_FIELD.pack(strings(name), 0))
+        elif isinstance(value, bool):
+            out.append(_FIELD.pack(strings(name), 3) + _VALUES[3].pack(value))
+        elif isinstance(value, int):
+            out.append(_FIELD.pack(strings(name), 2) + _VALUES[2].pack(value))
+        elif isinstance(value, float):
+            out.append(_FIELD.pack(strings(name), 1) + _VALUES[1].pack(value))
+        else:
+            out.append(_FIELD.pack(strings(name), 4) + _VALUES[4].pack(strings(value)))
+
+
+def _ports(indices):
+    return array('i', (_NONE if i is None else i for i in indices)).tobytes()
+
+
+def encode(document):
+    """Документ схемы -> bytes."""
+    strings = _Strings()
+    body = []
+    for record in document['elements']:
+        body.append(_ELEMENT.pack(record['index'], strings(record['type']), len(record['init']),
+                                  len(record['params']), len(record['in']), len(record['out'])))
+        _write_fields(body, record['init'], strings)
+        _write_fields(body, record['params'], strings)
+        body.append(_ports(record['in']) + _ports(record['out']))
+    for record in document['sensors']:
+        element = record['element']
+        limits = record['alarm_limits']
+        levels = [0.0] * 6 if limits is None else [float('nan') if x is None else x for x in limits]
+        body.append(_SENSOR.pack(_NONE if element is None else element, strings(record['sensor_type']),
+                                 strings(record['tag']), _NONE if record['index'] is None else record['index'],
+                                 record['deadband'], record['max_age'], limits is not None, *levels))
+    layout = document.get('layout') or {'nodes': [], 'pipes': [], 'sensors': []}
+    for node in layout['nodes']:
+        body.append(_NODE.pack(node['element'], strings(node['kind']), node['x'], node['y']))
+    for pipe in layout['pipes']:
+        start, end, points = pipe['from'], pipe['to'], pipe['points']
+        body.append(_PIPE.pack(pipe['element'], start[0], start[1], end[0], end[1], len(points)))
+        body.append(array('i', (c for point in points for c in point)).tobytes())
+    for box in layout['sensors']:
+        body.append(_SENSOR_BOX.pack(box['sensor'], box['pipe'], box['x'], box['y']))
+
+    table = [_HEADER.pack(MAGIC, VERSION, len(strings.items), len(document['elements']), len(document['sensors']),
+                          len(layout['nodes']), len(layout['pipes']), len(layout['sensors']))]
+    for text in strings.items:
+        raw = text.encode('utf-8')
+        table.append(_U32.pack(len(raw)) + raw)
+    return b''.join(table + body)
+
+
+def decode(data):
+    """bytes -> документ схемы."""
+    view = memoryview(data)
+    magic, version, n_strings, n_elements, n_sensors, n_nodes, n_pipes, n_boxes = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Файл не является схемой (неверная сигнатура)")
+    if version > VERSION:
+        raise ValueError(f"Версия файла схемы {version} не поддерживается")
+    offset = _HEADER.size
+
+    strings = []
+    for _ in range(n_strings):
+        (length,) = _U32.unpack_from(view, offset)
+        offset += 4
+        strings.append(str(view[offset:offset + length], 'utf-8'))
+        offset += length
+
+    def read_fields(count):
+        nonlocal offset
+        fields = {}
+        for _ in range(count):
+            name, kind = _FIELD.unpack_from(view, offset)
+            offset += _FIELD.size
+            if kind == 0:
+                value = None
+            else:
+                fmt = _VALUES[kind]
+                (value,) = fmt.unpack_from(view, offset)
+                offset += fmt.size
+                if kind == 4:
+                    value = strings[value]
+            fields[strings[name]] = value
+        return fields
+
+    def read_ints(count):
+        nonlocal offset
+        values = array('i')
+        values.frombytes(view[offset:offset + 4 * count])
+        offset += 4 * count
+        return values.tolist()
+
+    elements = []
+    for _ in range(n_elements):
+        index, type_sid, n_init, n_params, n_in, n_out = _ELEMENT.unpack_from(view, offset)
+        offset += _ELEMENT.size
+        init = read_fields(n_init)
+        params = read_fields(n_params)
+        ports = [None if i == _NONE else i for i in read_ints(n_in + n_out)]
+        elements.append({'index': index, 'type': strings[type_sid], 'init': init, 'params': params,
+                         'in': ports[:n_in], 'out': ports[n_in:]})
+
+    sensors = []
+    sensor_struct = _SENSOR if version >= 2 else _SENSOR_V1
+    for element, type_sid, tag_sid, index, *extra in sensor_struct.iter_unpack(
+            view[offset:offset + sensor_struct.size * n_sensors]):
+        deadband, max_age, has_limits, *levels = extra or (0.0, 0.0, False)
+        sensors.append({'element': None if element == _NONE else element, 'sensor_type': strings[type_sid],
+                        'tag': None if tag_sid == _NONE else strings[tag_sid],
+                        'index': None if index == _NONE else index,
+                        'deadband': deadband, 'max_age': max_age,
+                        'alarm_limits': _limits_record(levels) if has_limits else None})
+    offset += sensor_struct.size * n_sensors
+
+    nodes = [{'element': element, 'kind': strings[kind], 'x': x, 'y': y}
+             for element, kind, x, y in _NODE.iter_unpack(view[offset:offset + _NODE.size * n_nodes])]
+    offset += _NODE.size * n_nodes
+
+    pipes = []
+    for _ in range(n_pipes):
+        element, from_elem, from_port, to_elem, to_port, n_points = _PIPE.unpack_from(view, offset)
+        offset += _PIPE.size
+        coords = read_ints(2 * n_points)
+        pipes.append({'element': element, 'from': [from_elem, from_port], 'to': [to_elem, to_port],
+                      'points': [coords[i:i + 2] for i in range(0, len(coords), 2)]})
+
+    boxes = [{'sensor': sensor, 'pipe': pipe, 'x': x, 'y': y}
+             for sensor, pipe, x, y in _SENSOR_BOX.iter_unpack(view[offset:offset + _SENSOR_BOX.size * n_boxes])]
+
+    document = {'format': 'process-scheme', 'version': version, 'elements': elements, 'sensors': sensors}
+    if n_nodes or n_pipes or n_boxes:
+        document['layout'] = {'nodes': nodes, 'pipes': pipes, 'sensors': boxes}
+    return document
+
+
+# --- Файлы ---
+def save(path, scheme, layout=None):
+    """Сохранить схему: .json — JSON, иначе двоичный формат."""
+    document = scheme_to_document(scheme, layout)
+    if str(path).lower().endswith('.json'):
+        export_json(path, document)
+    else:
+        with open(path, 'wb') as f:
+            f.write(encode(document))
+
+
+def export_json(path, document):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=1)
+
+
+def load(path, scheme=None):
+    """Загрузить схему из файла; вернуть (scheme, layout или None)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] == MAGIC:
+        document = decode(data)
+    else:
+        document = json.loads(data.decode('utf-8'))
+    scheme = document_to_scheme(document, scheme)
+    return scheme, document.get('layout')
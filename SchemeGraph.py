@@ -0,0 +1,208 @@
+class SchemeGraph:
+    """
+    Граф схемы на массивах смежности (CSR): out_ptr/out_idx и in_ptr/in_idx.
+
+    Узлы — позиции элементов в self.elements. Строит компоненты сильной связности
+    (итеративный Тарьян), конденсацию в DAG и топологический порядок; множества
+    вышестоящих/нижестоящих узлов считаются по запросу и кэшируются по компонентам.
+    Время и память построения — O(V + E).
+    """
+    def __init__(self, elements):
+        self.elements = []
+        self.position = {}
+        for elem in elements:
+            if id(elem) not in self.position:  # один элемент может быть зарегистрирован дважды
+                self.position[id(elem)] = len(self.elements)
+                self.elements.append(elem)
+
+        self.out_ptr, self.out_idx = self._adjacency(lambda e: e.out_elements)
+        self.in_ptr, self.in_idx = self._adjacency(lambda e: e.in_elements)
+        self._strongly_connected()
+        self._down_cache = {}
+        self._up_cache = {}
+
+    def _adjacency(self, neighbours):
+        ptr = [0]
+        idx = []
+        position = self.position
+        for elem in self.elements:
+            for other in neighbours(elem):
+                if other is not None and id(other) in position:
+                    idx.append(position[id(other)])
+            ptr.append(len(idx))
+        return ptr, idx
+
+    def __len__(self):
+        return len(self.elements)
+
+    def successors(self, node):
+        return self.out_idx[self.out_ptr[node]:self.out_ptr[node + 1]]
+
+    def predecessors(self, node):
+        return self.in_idx[self.in_ptr[node]:self.in_ptr[node + 1]]
+
+    # --- Компоненты сильной связности ---
+    def _strongly_connected(self):
+        n = len(self.elements)
+        out_ptr, out_idx = self.out_ptr, self.out_idx
+        index = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        comps = []
+        counter = 0
+        # Обход начинаем с узлов без входов, чтобы кольца открывались со стороны подвода
+        roots = [v for v in range(n) if self.in_ptr[v] == self.in_ptr[v + 1]]
+        roots += [v for v in range(n) if self.in_ptr[v] != self.in_ptr[v + 1]]
+        for root in roots:
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, out_ptr[root])]
+            while work:
+                v, i = work[-1]
+                if i < out_ptr[v + 1]:
+                    work[-1] = (v, i + 1)
+                    w = out_idx[i]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, out_ptr[w]))
+                    elif on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    members = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        members.append(w)
+                        if w == v:
+                            break
+                    members.sort(key=index.__getitem__)  # порядок обнаружения: от входа в кольцо
+                    comps.append(members)
+
+        comps.reverse()  # Тарьян выдаёт компоненты в обратном топологическом порядке
+        self.components = comps
+        self.component_of = [0] * n
+        for c, members in enumerate(comps):
+            for v in members:
+                self.component_of[v] = c
+        component_of = self.component_of
+        self.dag_out = [sorted({component_of[w] for v in members for w in self.successors(v)} - {c})
+                        for c, members in enumerate(comps)]
+        self.dag_in = [[] for _ in comps]
+        for c, targets in enumerate(self.dag_out):
+            for t in targets:
+                self.dag_in[t].append(c)
+
+    def is_cyclic(self, component):
+        members = self.components[component]
+        return len(members) > 1 or members[0] in self.successors(members[0])
+
+    def topological_order(self):
+        """Узлы в топологическом порядке конденсации (внутри колец — от входа)."""
+        return [v for members in self.components for v in members]
+
+    def weak_components(self):
+        """
+        Компоненты слабой связности — гидравлически независимые участки схемы.
+        Каждая — список узлов в топологическом порядке; участки упорядочены по первому узлу.
+        """
+        n = len(self.elements)
+        label = [-1] * n
+        count = 0
+        for root in range(n):
+            if label[root] != -1:
+                continue
+            label[root] = count
+            queue = [root]
+            for v in queue:
+                for w in self.successors(v) + self.predecessors(v):
+                    if label[w] == -1:
+                        label[w] = count
+                        queue.append(w)
+            count += 1
+        parts = [[] for _ in range(count)]
+        for v in self.topological_order():
+            parts[label[v]].append(v)
+        return parts
+
+    # --- Вышестоящие и нижестоящие множества ---
+    def _reachable(self, component, edges, cache):
+        result = cache.get(component)
+        if result is None:
+            seen = {component}
+            queue = [component]
+            for c in queue:
+                for nxt in edges[c]:
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        queue.append(nxt)
+            result = cache[component] = frozenset(v for c in seen for v in self.components[c])
+        return result
+
+    def downstream(self, node):
+        """Узлы, достижимые из node (включая его компоненту)."""
+        return self._reachable(self.component_of[node], self.dag_out, self._down_cache)
+
+    def upstream(self, node):
+        """Узлы, из которых достижим node (включая его компоненту)."""
+        return self._reachable(self.component_of[node], self.dag_in, self._up_cache)
+
+    # --- Цепи по запросу ---
+    def iter_chains(self, starts):
+        """
+        Лениво перечислить простые пути (как списки element.index) из узлов starts,
+        продолжая путь, пока есть непосещённые в этом пути выходы.
+        """
+        elements = self.elements
+        for start in starts:
+            path = [start]
+            on_path = {start}
+            candidates = [w for w in self.successors(start) if w not in on_path]
+            if not candidates:
+                yield [elements[start].index]
+                continue
+            frames = [iter(candidates)]
+            while frames:
+                w = next(frames[-1], None)
+                if w is None:
+                    frames.pop()
+                    on_path.discard(path.pop())
+                    continue
+                path.append(w)
+                on_path.add(w)
+                candidates = [x for x in self.successors(w) if x not in on_path]
+                if candidates:
+                    frames.append(iter(candidates))
+                else:
+                    yield [elements[v].index for v in path]
+                    on_path.discard(path.pop())
+
+    def branch_run(self, node, downstream=True):
+        """
+        Неразветвлённый участок от node: идём, пока у узла ровно один вход и один выход
+        (по направлению обхода), до разветвления, слияния или конца.
+        """
+        forward, backward = (self.successors, self.predecessors) if downstream else (self.predecessors, self.successors)
+        run = [node]
+        seen = {node}
+        while len(forward(node)) == 1:
+            nxt = forward(node)[0]
+            if nxt in seen or len(backward(nxt)) != 1:
+                break
+            run.append(nxt)
+            seen.add(nxt)
+            node = nxt
+        return run
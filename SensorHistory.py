@@ -0,0 +1,210 @@
+"""
+История показаний датчиков.
+
+Все датчики хранятся в одном двумерном кольцевом буфере (строки — такты, столбцы —
+датчики), выделенном заранее. Каждый такт добавляется строка с текущими
+опубликованными значениями: обновляются только столбцы датчиков из списка
+изменившихся (ProcessScheme.changed_sensors), остальные держат прежнее значение.
+Датчик получает столбец при первой публикации; NaN — значения ещё не было.
+
+Свёртки min/max/mean по интервалам 1 с, 1 мин и 1 ч (RESOLUTIONS) ведутся каскадом
+при добавлении: такты накапливаются в интервал 1 с, завершённые интервалы 1 с — в
+интервал 1 мин и т. д.; каждая свёртка — свой кольцевой буфер. Интервал попадает
+в историю, когда начинается следующий. Запросы диапазонов возвращают массивы
+NumPy (срезы по времени через searchsorted), без объектов Python на отсчёт.
+
+Память: строки x столбцы x 4 байта на исходные значения и x 12 байт на каждую свёртку.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+RESOLUTIONS = (1.0, 60.0, 3600.0)
+# Число хранимых интервалов каждой свёртки: 10 мин по 1 с, сутки по 1 мин, 30 суток по 1 ч
+ROLLUP_CAPACITY = (600, 1440, 720)
+
+HistoryRange = namedtuple('HistoryRange', 'time min max mean')
+
+
+class _Ring:
+    """Кольцевой буфер строк: время и массивы (строки x столбцы)."""
+    def __init__(self, capacity, columns, fields, dtype):
+        self.capacity = capacity
+        self.time = np.full(capacity, np.nan)
+        self.fields = {name: np.full((capacity, columns), np.nan, dtype=dtype) for name in fields}
+        self.head = 0   # позиция следующей записи
+        self.count = 0
+
+    def grow(self, columns):
+        for name, data in self.fields.items():
+            wider = np.full((self.capacity, columns), np.nan, dtype=data.dtype)
+            wider[:, :data.shape[1]] = data
+            self.fields[name] = wider
+
+    def append(self, t, **rows):
+        k = self.head
+        self.time[k] = t
+        for name, row in rows.items():
+            self.fields[name][k] = row
+        self.head = (k + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def span(self):
+        """(самое раннее, самое позднее) время в буфере или None."""
+        if not self.count:
+            return None
+        first = (self.head - self.count) % self.capacity
+        return self.time[first], self.time[self.head - 1]
+
+    def select(self, start, end, columns):
+        """Физические индексы строк в [start, end] и массивы полей по столбцам columns."""
+        first = (self.head - self.count) % self.capacity
+        if self.count < self.capacity:
+            ordered = self.time[:self.count]
+        else:
+            ordered = np.concatenate((self.time[first:], self.time[:first]))
+        lo = np.searchsorted(ordered, start, side='left')
+        hi = np.searchsorted(ordered, end, side='right')
+        rows = (first + np.arange(lo, hi)) % self.capacity
+        rows_ix = rows[:, None]
+        return self.time[rows], {name: data[rows_ix, columns] for name, data in self.fields.items()}
+
+
+class _Accumulator:
+    """Незавершённый интервал свёртки: сумма, число, min, max по столбцам."""
+    def __init__(self, columns):
+        self.bucket = None
+        self.reset(columns)
+
+    def reset(self, columns):
+        self.sum = np.zeros(columns)
+        self.count = np.zeros(columns)
+        self.min = np.full(columns, np.nan)
+        self.max = np.full(columns, np.nan)
+
+    def grow(self, columns):
+        n = len(self.sum)
+        for name, fill in (('sum', 0.0), ('count', 0.0), ('min', np.nan), ('max', np.nan)):
+            wider = np.full(columns, fill)
+            wider[:n] = getattr(self, name)
+            setattr(self, name, wider)
+
+    def add(self, mean, minimum, maximum, count):
+        valid = count > 0
+        self.sum += np.where(valid, mean * count, 0.0)
+        self.count += count
+        np.fmin(self.min, minimum, out=self.min)
+        np.fmax(self.max, maximum, out=self.max)
+
+    def result(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(self.count > 0, self.sum / self.count, np.nan)
+        return mean, self.min, self.max, self.count
+
+
+class SensorHistory:
+    """
+    История всех датчиков схемы.
+    capacity — число хранимых тактов исходных значений; rollup_capacity —
+    число интервалов каждой свёртки (по RESOLUTIONS).
+    """
+    def __init__(self, capacity=6000, rollup_capacity=ROLLUP_CAPACITY, resolutions=RESOLUTIONS,
+                 dtype=np.float32, columns=16):
+        if capacity < 1 or len(rollup_capacity) != len(resolutions):
+            raise ValueError("История датчиков: ёмкость должна быть положительной, свёртки — по каждому разрешению")
+        if any(b <= a for a, b in zip(resolutions, resolutions[1:])):
+            raise ValueError("История датчиков: разрешения свёрток должны возрастать")
+        self.resolutions = tuple(resolutions)
+        self.sensors = []          # датчик столбца
+        self._column = {}          # id(датчика) -> столбец
+        self._width = columns      # выделено столбцов
+        self.current = np.full(columns, np.nan)
+        self.raw = _Ring(capacity, columns, ('value',), dtype)
+        self.rollups = [_Ring(size, columns, ('min', 'max', 'mean'), dtype) for size in rollup_capacity]
+        self._pending = [_Accumulator(columns) for _ in resolutions]
+
+    def __len__(self):
+        return self.raw.count
+
+    def column(self, sensor):
+        """Столбец датчика (датчик добавляется, если его ещё нет)."""
+        k = self._column.get(id(sensor))
+        if k is None:
+            k = self._column[id(sensor)] = len(self.sensors)
+            self.sensors.append(sensor)
+            if k >= self._width:
+                self._grow(2 * self._width)
+        return k
+
+    def _grow(self, columns):
+        self._width = columns
+        wider = np.full(columns, np.nan)
+        wider[:len(self.current)] = self.current
+        self.current = wider
+        for ring in (self.raw, *self.rollups):
+            ring.grow(columns)
+        for acc in self._pending:
+            acc.grow(columns)
+
+    def record(self, now, changed):
+        """Добавить такт: время now и датчики changed, опубликовавшие новые значения."""
+        if changed:
+            columns = [self.column(sensor) for sensor in changed]
+            self.current[columns] = [np.nan if s.value is None else s.value for s in changed]
+        row = self.current
+        self.raw.append(now, value=row)
+        count = (~np.isnan(row)).astype(float)
+        self._roll(0, now, row, row, row, count)
+
+    def _roll(self, level, now, mean, minimum, maximum, count):
+        acc = self._pending[level]
+        resolution = self.resolutions[level]
+        bucket = np.floor(now / resolution)
+        if acc.bucket is not None and bucket != acc.bucket:
+            done = acc.result()
+            self.rollups[level].append(acc.bucket * resolution, mean=done[0], min=done[1], max=done[2])
+            if level + 1 < len(self._pending):
+                self._roll(level + 1, acc.bucket * resolution, *done)
+            acc.reset(self._width)
+        acc.bucket = bucket
+        acc.add(mean, minimum, maximum, count)
+
+    def columns_of(self, sensors):
+        """Индексы столбцов датчиков (датчики без истории — ValueError)."""
+        try:
+            return np.array([self._column[id(s)] for s in sensors], dtype=np.intp)
+        except KeyError:
+            raise ValueError("История датчиков: датчик ещё не публиковал значений") from None
+
+    def query(self, start, end, sensors=None, resolution=None):
+        """
+        Значения в интервале времени [start, end]: HistoryRange с массивами
+        (строки x датчики). resolution — 0 (исходные такты), одно из RESOLUTIONS
+        или None: самое подробное хранилище, в котором ещё есть start.
+        Для исходных тактов min, max и mean — один и тот же массив.
+        """
+        columns = np.arange(len(self.sensors)) if sensors is None else self.columns_of(sensors)
+        ring = self._ring(start, resolution)
+        time, fields = ring.select(start, end, columns)
+        if ring is self.raw:
+            value = fields['value']
+            return HistoryRange(time, value, value, value)
+        return HistoryRange(time, fields['min'], fields['max'], fields['mean'])
+
+    def _ring(self, start, resolution):
+        if resolution is not None:
+            if resolution == 0:
+                return self.raw
+            if resolution not in self.resolutions:
+                raise ValueError(f"История датчиков: нет свёртки с разрешением {resolution} с")
+            return self.rollups[self.resolutions.index(resolution)]
+        for ring in (self.raw, *self.rollups):
+            span = ring.span()
+            if span is not None and span[0] <= start:
+                return ring
+        return self.rollups[-1] if self.rollups[-1].count else self.raw
+
+    def series(self, sensor, start=-np.inf, end=np.inf, resolution=0):
+        """Время и значения (mean для свёрток) одного датчика."""
+        result = self.query(start, end, [sensor], resolution)
+        return result.time, result.mean[:, 0]
@@ -0,0 +1,179 @@
+"""
+Шум показаний датчиков.
+
+Для каждого типа датчика (pressure, flow, temperature) заранее генерируется блок
+шума (NumPy, генератор с заданным seed) — кольцевой буфер длиной block. Датчик
+читает свой буфер со своего смещения: на такте step его шум — buffer[(offset + step) % block],
+поэтому шум всех датчиков за такт — одна выборка по индексам из общего пула и
+одно векторное сложение с показаниями. Результат детерминирован по seed и порядку
+датчиков в схеме.
+
+Модели шума (NoiseModel):
+  uniform  — равномерный в пределах ±amplitude (как BaseElement.rattle);
+  gauss    — нормальный, СКО amplitude;
+  colored  — нормальный, отфильтрованный AR(1) с коэффициентом correlation
+             (медленно «плывущие» показания), СКО amplitude.
+quantum > 0 — квантование показания (шаг АЦП) после добавления шума.
+
+Схема с включённым шумом (ProcessScheme.enable_noise) публикует показания всех
+датчиков сама после такта (publish): зона нечувствительности и max_age датчиков
+проверяются тем же векторным проходом, Python-код выполняется только для
+опубликованных датчиков.
+"""
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from BaseElement import Sensor
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # без SciPy — рекурсия AR(1) циклом Python
+    lfilter = None
+
+NoiseModel = namedtuple('NoiseModel', 'kind amplitude correlation quantum', defaults=(0.0, 0.0))
+
+KINDS = ('uniform', 'gauss', 'colored')
+
+# По умолчанию — тот же дребезг, что и у PipeElementElement.update_sensors
+DEFAULT_MODELS = {
+    'pressure': NoiseModel('uniform', 0.1),
+    'flow': NoiseModel('uniform', 0.05),
+    'temperature': NoiseModel('uniform', 0.2),
+}
+
+# Атрибут трубы, который измеряет датчик каждого типа
+SENSOR_ATTRS = {'pressure': 'p_out', 'flow': 'f_out', 'temperature': 't_out'}
+
+
+def generate_block(model, size, rng):
+    """Блок шума длиной size по модели model."""
+    if model.kind not in KINDS:
+        raise ValueError(f"Неизвестная модель шума: {model.kind}")
+    if model.amplitude < 0:
+        raise ValueError("Амплитуда шума не может быть отрицательной")
+    if model.kind == 'uniform':
+        return rng.uniform(-model.amplitude, model.amplitude, size)
+    white = rng.standard_normal(size) * model.amplitude
+    if model.kind == 'gauss':
+        return white
+    a = model.correlation
+    if not 0 <= a < 1:
+        raise ValueError("Коэффициент корреляции окрашенного шума должен быть в [0, 1)")
+    # AR(1): x[0] = w[0], x[k] = a x[k-1] + sqrt(1 - a^2) w[k] — СКО каждого отсчёта равно amplitude
+    gain = np.sqrt(1 - a * a)
+    block = np.empty(size)
+    block[0] = white[0]
+    if lfilter is not None:
+        block[1:] = lfilter([gain], [1.0, -a], white[1:], zi=[a * white[0]])[0]
+    else:
+        x = white[0]
+        for k, w in enumerate(white[1:].tolist(), 1):
+            x = a * x + gain * w
+            block[k] = x
+    return block
+
+
+class NoiseBank:
+    """
+    Кольцевые буферы шума по типам датчиков.
+    models — NoiseModel по типу датчика (недостающие берутся из DEFAULT_MODELS).
+    """
+    def __init__(self, seed=0, models=None, block=65536):
+        if block < 1:
+            raise ValueError("Длина блока шума должна быть положительной")
+        self.seed = seed
+        self.block = block
+        self.models = dict(DEFAULT_MODELS)
+        self.models.update(models or {})
+        self.step = 0
+        self.sensors = []
+        self._source = None
+        self._signature = None
+        self._buffers = {}   # тип датчика -> (начало в пуле, квант)
+        self._pool = np.empty(0)
+        self._taps = []      # (труба, атрибут) или None для датчиков без трубы
+        self._base = np.empty(0, dtype=np.intp)
+        self._offset = np.empty(0, dtype=np.intp)
+        self._quantum = np.empty(0)
+        self.published = np.empty(0)
+        self._published_at = np.empty(0)
+        self._deadband = np.empty(0)
+        self._max_age = np.empty(0)
+
+    def _buffer(self, sensor_type):
+        entry = self._buffers.get(sensor_type)
+        if entry is None:
+            model = self.models.get(sensor_type, NoiseModel('uniform', 0.0))
+            rng = np.random.default_rng([self.seed, zlib.crc32(sensor_type.encode())])
+            entry = self._buffers[sensor_type] = (len(self._pool), model.quantum)
+            self._pool = np.concatenate((self._pool, generate_block(model, self.block, rng)))
+        return entry
+
+    def refresh(self, scheme):
+        """Перестроить раскладку по датчикам схемы; опубликованные значения сохраняются."""
+        owners = {}
+        for elem in scheme.elements_dict.values():
+            for sensor in getattr(elem, 'sensors', ()):
+                owners[id(sensor)] = elem
+        self.sensors = list(scheme.sensors)
+        n = len(self.sensors)
+        entries = [self._buffer(s.sensor_type) for s in self.sensors]
+        self._base = np.fromiter((entry[0] for entry in entries), np.intp, n)
+        self._quantum = np.fromiter((entry[1] for entry in entries), float, n)
+        # Смещения зависят только от seed и номера датчика (последовательность Вейля)
+        start = zlib.crc32(str(self.seed).encode())
+        self._offset = (start + np.arange(n, dtype=np.int64) * 0x9E3779B1) % self.block
+        self._taps = [(owners[id(s)], SENSOR_ATTRS[s.sensor_type])
+                      if id(s) in owners and s.sensor_type in SENSOR_ATTRS else None for s in self.sensors]
+        self.published = np.fromiter((np.nan if s.value is None else s.value for s in self.sensors), float, n)
+        self._published_at = np.fromiter((s.published_at for s in self.sensors), float, n)
+        self._deadband = np.fromiter((s.deadband for s in self.sensors), float, n)
+        self._max_age = np.fromiter((s.max_age for s in self.sensors), float, n)
+        self._source = scheme.sensors
+        self._signature = (n, Sensor.limits_version)
+
+    def sample(self):
+        """Шум всех датчиков на текущем такте (порядок — scheme.sensors); такт сдвигается."""
+        noise = self._pool[self._base + (self._offset + self.step) % self.block]
+        self.step += 1
+        return noise
+
+    def apply(self, values):
+        """Показания values (массив по датчикам) с шумом текущего такта и квантованием."""
+        noisy = values + self.sample()
+        quantized = self._quantum > 0
+        if quantized.any():
+            q = self._quantum[quantized]
+            noisy[quantized] = np.round(noisy[quantized] / q) * q
+        return noisy
+
+    def readings(self):
+        """Текущие значения измеряемых атрибутов труб (NaN — нет трубы или значения)."""
+        values = [None if tap is None else getattr(*tap) for tap in self._taps]
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+    def publish(self, scheme, now):
+        """Добавить шум к показаниям всех датчиков и опубликовать вышедшие за зону нечувствительности."""
+        if scheme.sensors is not self._source or self._signature != (len(scheme.sensors), Sensor.limits_version):
+            self.refresh(scheme)
+        if not self.sensors:
+            return 0
+        noisy = self.apply(self.readings())
+        last = self.published
+        with np.errstate(invalid='ignore'):
+            moved = ~(np.abs(noisy - last) <= self._deadband)  # NaN прежнего значения — публикуем
+            expired = (self._max_age > 0) & (now - self._published_at >= self._max_age)
+        changed = np.flatnonzero((moved | expired) & ~np.isnan(noisy))
+        if not len(changed):
+            return 0
+        last[changed] = noisy[changed]
+        self._published_at[changed] = now
+        out = scheme.changed_sensors
+        for k, value in zip(changed.tolist(), noisy[changed].tolist()):
+            sensor = self.sensors[k]
+            sensor.value = value
+            sensor.published_at = now
+            out.append(sensor)
+        return len(changed)
@@ -0,0 +1,33 @@
+class Signal:
+    """
+    Простой сигнал без Qt: список обработчиков, вызываемых при emit().
+
+    Используется моделью (ProcessScheme), чтобы ядро расчёта работало без PyQt5.
+    В GUI сигналы пробрасываются в Qt через адаптер (см. QtSchemeSignals в Ver_0_2).
+    Подключения не копируются и не сериализуются: копия схемы получает пустой сигнал.
+    """
+    __slots__ = ('_slots',)
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        if slot not in self._slots:
+            self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        """Отключить обработчик (или все, если slot не задан)."""
+        if slot is None:
+            self._slots.clear()
+        elif slot in self._slots:
+            self._slots.remove(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __reduce__(self):
+        return Signal, ()
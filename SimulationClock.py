@@ -0,0 +1,185 @@
+import time
+from collections import deque
+
+
+class SimulationClock:
+    """
+    Часы моделирования с фиксированным шагом dt (секунды модельного времени).
+
+    Режимы:
+      'realtime' — один шаг dt за dt секунд реального времени;
+      'scaled'   — быстрее/медленнее реального времени в speed раз;
+      'max'      — шаги без пауз, с максимальной скоростью.
+    Каждый шаг вызывает scheme.calculate(flow, dt); пока схема не инициализирована
+    (scheme.chain_ready), шаги не выполняются. Модельное время ведёт схема
+    (scheme.sim_time), часы его только читают. Часы считают достигнутую частоту
+    шагов, время расчёта шага и число опозданий (шаг не уложился в свой срок).
+    """
+    MODES = ('realtime', 'scaled', 'max')
+
+    def __init__(self, scheme, dt=0.1, mode='realtime', speed=1.0, flow=1.0,
+                 max_catch_up=5, poll_budget=0.02, window=100):
+        self.scheme = scheme
+        self.dt = dt
+        self.flow = flow
+        self.max_catch_up = max_catch_up  # сколько отставших шагов догонять за один poll()
+        self.poll_budget = poll_budget    # время на один poll() в режиме 'max', с
+        self.set_mode(mode, speed)
+        self.on_step = []                 # функции f(clock), вызываемые после каждого шага
+
+        self.running = False
+        self.steps = 0
+        self.overruns = 0
+        self.last_step_time = 0.0
+        self.max_step_time = 0.0
+        self._step_stamps = deque(maxlen=window)  # моменты завершения последних шагов
+        self._step_durations = deque(maxlen=window)
+        self._next_deadline = None
+
+    def set_mode(self, mode, speed=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим часов: {mode}")
+        self.mode = mode
+        if speed is not None:
+            self.speed = speed
+        if mode == 'realtime':
+            self.speed = 1.0
+        self._next_deadline = None
+
+    @property
+    def sim_time(self):
+        """Модельное время схемы, с."""
+        return self.scheme.sim_time
+
+    @property
+    def period(self):
+        """Реальное время между шагами, с (None — без ограничения)."""
+        if self.mode == 'max':
+            return None
+        return self.dt / self.speed
+
+    # --- Управление ---
+    def start(self):
+        self.running = True
+        self._next_deadline = None
+
+    def stop(self):
+        self.running = False
+
+    def reset(self):
+        self.steps = 0
+        self.overruns = 0
+        self.max_step_time = 0.0
+        self._step_stamps.clear()
+        self._step_durations.clear()
+        self._next_deadline = None
+
+    def step(self):
+        """Выполнить один шаг модели."""
+        started = time.perf_counter()
+        self.scheme.calculate(self.flow, self.dt)
+        finished = time.perf_counter()
+        self.steps += 1
+        self.last_step_time = finished - started
+        self.max_step_time = max(self.max_step_time, self.last_step_time)
+        self._step_durations.append(self.last_step_time)
+        self._step_stamps.append(finished)
+        for callback in self.on_step:
+            callback(self)
+
+    def poll(self):
+        """
+        Неблокирующий вызов из цикла событий (например, QTimer): выполнить шаги,
+        срок которых наступил. Возвращает число выполненных шагов.
+        """
+        if not self.running:
+            return 0
+        if not self.scheme.chain_ready:
+            # Схема ещё не инициализирована: шагов нет, расписание начнётся после инициализации
+            self._next_deadline = None
+            return 0
+        now = time.perf_counter()
+        period = self.period
+        if period is None:
+            done = 0
+            while time.perf_counter() - now < self.poll_budget:
+                self.step()
+                done += 1
+            return done
+
+        if self._next_deadline is None:
+            self._next_deadline = now
+        if now < self._next_deadline:
+            return 0
+        due = int((now - self._next_deadline) / period) + 1
+        if due > 1:
+            self.overruns += due - 1
+        if due > self.max_catch_up:
+            # Сильно отстали — не догоняем, а переносим расписание: следующий шаг через период
+            due = self.max_catch_up
+            for _ in range(due):
+                self.step()
+            self._next_deadline = now + period
+            return due
+        for _ in range(due):
+            self.step()
+            self._next_deadline += period
+        return due
+
+    def run(self, duration=None, steps=None):
+        """
+        Блокирующий прогон: duration секунд модельного времени или steps шагов.
+        В режимах 'realtime'/'scaled' шаги выдерживаются по расписанию.
+        """
+        if steps is None:
+            steps = int(round(duration / self.dt)) if duration is not None else 0
+        self.running = True
+        deadline = time.perf_counter()
+        for _ in range(steps):
+            if not self.running or not self.scheme.chain_ready:
+                break
+            self.step()
+            period = self.period
+            if period is None:
+                continue
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.overruns += 1
+                if -delay > period * self.max_catch_up:
+                    deadline = time.perf_counter()
+        self.running = False
+
+    # --- Статистика ---
+    def target_rate(self):
+        """Заданная частота шагов, шаг/с (None в режиме 'max')."""
+        period = self.period
+        return None if period is None else 1.0 / period
+
+    def achieved_rate(self):
+        """Фактическая частота шагов по последним шагам, шаг/с."""
+        if len(self._step_stamps) < 2:
+            return 0.0
+        span = self._step_stamps[-1] - self._step_stamps[0]
+        return (len(self._step_stamps) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        durations = self._step_durations
+        mean_step = sum(durations) / len(durations) if durations else 0.0
+        achieved = self.achieved_rate()
+        return {
+            'mode': self.mode,
+            'dt': self.dt,
+            'sim_time': self.sim_time,
+            'steps': self.steps,
+            'target_rate': self.target_rate(),
+            'achieved_rate': achieved,
+            'real_time_factor': achieved * self.dt,
+            'mean_step_time': mean_step,
+            'max_step_time': self.max_step_time,
+            # Какую частоту шагов позволяет расчёт схемы на этом оборудовании
+            'max_sustainable_rate': 1.0 / mean_step if mean_step > 0 else None,
+            'overruns': self.overruns,
+        }
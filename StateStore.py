@@ -0,0 +1,378 @@
+import numpy as np
+from BaseElement import BaseElement, PipeElementElement, BoilerElement, ThermalFluidElement
+import WaterProperties
+
+STATE_FIELDS = ('t_in', 'p_in', 'f_in', 't_out', 'p_out', 'f_out')
+OUTPUT_FIELDS = ('t_out', 'p_out', 'f_out')
+
+
+# Коэффициенты элементов с векторным расчётом. Все ядра — частные случаи одного:
+#   f_out = f_in * (1 - breach)  (не меньше нуля при утечке)
+#   p_out = p_in - (resistance * f_in + 5 * breach * p_in)
+#   t_out = t_in + heat / (f_in * rho * cp)  при f_in > 0
+# Сбор по типу: (resistance, breach, heat, rho, cp) — массивы по элементам.
+
+def _pipe_coefficients(members):
+    n = len(members)
+    rl = np.fromiter((e._resistance * e.length for e in members), float, n)
+    breach = np.fromiter((min(e.breach_percent, 1.0) if e.breach and e.breach_percent > 0 else 0.0
+                          for e in members), float, n)
+    return rl, breach, np.zeros(n), np.ones(n), np.ones(n)
+
+
+def _fluid_params(members):
+    n = len(members)
+    return np.fromiter((e.rho for e in members), float, n), np.fromiter((e.cp for e in members), float, n)
+
+
+def _boiler_coefficients(members):
+    n = len(members)
+    power = np.fromiter((e._max_power_mw * 1e6 * e._power_percent if e._status else 0.0
+                         for e in members), float, n)
+    resistance = np.fromiter((e._resistance for e in members), float, n)
+    return (resistance, np.zeros(n), power, *_fluid_params(members))
+
+
+def _thermal_coefficients(members):
+    n = len(members)
+    demand = np.fromiter((e._heat_demand * 1e6 for e in members), float, n)
+    resistance = np.fromiter((e._resistance for e in members), float, n)
+    return (resistance, np.zeros(n), -demand, *_fluid_params(members))
+
+
+def _base_coefficients(members):
+    n = len(members)
+    return np.zeros(n), np.zeros(n), np.zeros(n), np.ones(n), np.ones(n)
+
+
+# Типы элементов с векторным расчётом (по точному типу): сбор коэффициентов
+KERNELS = {
+    BaseElement: _base_coefficients,
+    PipeElementElement: _pipe_coefficients,
+    BoilerElement: _boiler_coefficients,
+    ThermalFluidElement: _thermal_coefficients,
+}
+
+# Ядра, берущие свойства воды из массивов rho/cp группы
+FLUID_KERNELS = (BoilerElement, ThermalFluidElement)
+# Элементы, которым свойства воды обновляются по таблицам (как ProcessScheme._fluid_elements)
+FLUID_ELEMENTS = (PipeElementElement, BoilerElement, ThermalFluidElement)
+
+
+def _is_branching(element):
+    """Элемент с индивидуальными выходами для каждой ветви (разветвитель, ёмкость)."""
+    return type(element).get_outputs_for is not BaseElement.get_outputs_for
+
+
+def _vectorizable(element):
+    return (type(element) in KERNELS and len(element.in_elements) <= 1
+            and getattr(element, 'friction_model', 'linear') == 'linear')
+
+
+class RunGroup:
+    """
+    Участки одного уровня, рассчитываемые одним векторным ядром. Участок — цепочка
+    элементов с векторным расчётом без ветвлений (труба за трубой, котёл и т.п.);
+    вдоль участка расход переносится, перепады давления и температуры складываются
+    накопленными суммами, поэтому число вызовов NumPy не зависит от длины участков.
+    """
+    def __init__(self, runs):
+        self.members = [e for run in runs for e in run]
+        self.slots = np.fromiter((e.index for e in self.members), np.intp, len(self.members))
+        lengths = np.fromiter((len(run) for run in runs), np.intp, len(runs))
+        self.starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.intp)
+        self.lengths = lengths
+        self.heads = self.slots[self.starts]
+        # Входы голов участков, которые берутся напрямую из выходных массивов вышестоящих элементов
+        plain = [(k, run[0].in_elements[0].index) for k, run in enumerate(runs)
+                 if run[0].in_elements and run[0].in_elements[0] is not None
+                 and not _is_branching(run[0].in_elements[0])]
+        self.plain_runs = np.array([p[0] for p in plain], dtype=np.intp)
+        self.plain_src = np.array([p[1] for p in plain], dtype=np.intp)
+        # Столбцы по позиции в участке — для пошагового расчёта при утечках
+        position = np.arange(len(self.members)) - np.repeat(self.starts, lengths)
+        self.columns = [np.flatnonzero(position == k) for k in range(int(lengths.max()))]
+        # Члены группы по типу: (позиции в группе, элементы) — для сбора коэффициентов
+        by_type = {}
+        for k, elem in enumerate(self.members):
+            by_type.setdefault(type(elem), []).append(k)
+        self.by_type = [(np.array(positions, dtype=np.intp), [self.members[k] for k in positions], t)
+                        for t, positions in by_type.items()]
+        self.fluid_positions = np.concatenate(
+            [positions for positions, _, t in self.by_type if t in FLUID_KERNELS] or [np.empty(0, dtype=np.intp)])
+        n = len(self.members)
+        self.resistance, self.breach, self.heat = np.zeros(n), np.zeros(n), np.zeros(n)
+        self.rho, self.cp = np.ones(n), np.ones(n)
+        self.leaks = False
+
+    def load_params(self):
+        for positions, members, element_type in self.by_type:
+            for array, values in zip((self.resistance, self.breach, self.heat, self.rho, self.cp),
+                                     KERNELS[element_type](members)):
+                array[positions] = values
+        self.leaks = bool(self.breach.any())
+
+    def run(self, store):
+        heads = self.heads
+        if len(self.plain_runs):
+            dst = heads[self.plain_runs]
+            src = self.plain_src
+            store.t_in[dst] = store.t_out[src]
+            store.p_in[dst] = store.p_out[src]
+            store.f_in[dst] = store.f_out[src]
+        if self.leaks:
+            self._run_columns(store)
+            return
+        slots, lengths, starts = self.slots, self.lengths, self.starts
+        f = np.repeat(store.f_in[heads], lengths)
+        flowing = f > 0
+        dT = np.divide(self.heat, f * self.rho * self.cp, out=np.zeros_like(f), where=flowing)
+        dP = self.resistance * f
+        t_out = np.repeat(store.t_in[heads], lengths) + _segment_cumsum(dT, starts, lengths)
+        p_out = np.repeat(store.p_in[heads], lengths) - _segment_cumsum(dP, starts, lengths)
+        store.t_out[slots] = t_out
+        store.t_in[slots] = t_out - dT
+        store.p_out[slots] = p_out
+        store.p_in[slots] = p_out + dP
+        store.f_in[slots] = f
+        store.f_out[slots] = f
+
+    def _run_columns(self, store):
+        """Пошаговый расчёт по позициям участков (есть утечки: расход и давление не аддитивны)."""
+        slots = self.slots
+        for k, column in enumerate(self.columns):
+            here = slots[column]
+            if k:
+                prev = slots[column - 1]
+                store.t_in[here] = store.t_out[prev]
+                store.p_in[here] = store.p_out[prev]
+                store.f_in[here] = store.f_out[prev]
+            t_in, p_in, f_in = store.t_in[here], store.p_in[here], store.f_in[here]
+            breach = self.breach[column]
+            dT = np.divide(self.heat[column], f_in * self.rho[column] * self.cp[column],
+                           out=np.zeros_like(f_in), where=f_in > 0)
+            store.t_out[here] = t_in + dT
+            store.p_out[here] = p_in - (self.resistance[column] * f_in + 5 * breach * p_in)
+            store.f_out[here] = np.where(breach > 0, np.maximum(f_in - f_in * breach, 0.0), f_in)
+
+
+def _segment_cumsum(values, starts, lengths):
+    """Накопленные суммы values отдельно по каждому участку [start, start + length)."""
+    total = np.cumsum(values)
+    before = np.concatenate(([0.0], total[starts[1:] - 1]))
+    return total - np.repeat(before, lengths)
+
+
+class ObjectBatch:
+    """
+    Элементы одного уровня с объектным расчётом (work()). Выходы вышестоящих элементов
+    с векторным расчётом выгружаются в атрибуты одним проходом до work(), выходы
+    элементов, питающих векторные участки, загружаются в массивы одним проходом после.
+    Остальное состояние этих элементов живёт в их атрибутах.
+    """
+    def __init__(self, elements, kernel_ids):
+        self.elements = elements
+        self.feeds = [e for e in elements if not _is_branching(e)
+                      and any(n is not None and id(n) in kernel_ids for n in e.out_elements)]
+        self.feed_slots = np.fromiter((e.index for e in self.feeds), np.intp, len(self.feeds))
+        sources = {}
+        for elem in elements:
+            for prev in elem.in_elements:
+                if prev is not None and id(prev) in kernel_ids:
+                    sources[id(prev)] = prev
+        self.sources = list(sources.values())
+        self.source_slots = np.fromiter((e.index for e in self.sources), np.intp, len(self.sources))
+        # Ветвящиеся элементы передают нижестоящим элементам с векторным расчётом свои значения
+        self.branch_outputs = [(elem, nxt) for elem in elements if _is_branching(elem)
+                               for nxt in elem.out_elements if nxt is not None and id(nxt) in kernel_ids]
+        self.branch_slots = np.fromiter((nxt.index for _, nxt in self.branch_outputs), np.intp,
+                                        len(self.branch_outputs))
+
+    def run(self, store, dt):
+        if self.sources:
+            store.write_back(self.sources, OUTPUT_FIELDS, self.source_slots)
+        for elem in self.elements:
+            elem.work(dt)
+        if self.feeds:
+            store.read_back(self.feeds, OUTPUT_FIELDS, self.feed_slots)
+        if self.branch_outputs:
+            values = np.array([elem.get_outputs_for(nxt) for elem, nxt in self.branch_outputs], dtype=float)
+            slots = self.branch_slots
+            store.t_in[slots] = values[:, 0]
+            store.p_in[slots] = values[:, 1]
+            store.f_in[slots] = values[:, 2]
+
+
+class ElementStateStore:
+    """
+    Массивное (struct-of-arrays) хранилище состояния элементов схемы.
+
+    Схема владеет непрерывными массивами float64 для t/p/f на входе и выходе,
+    индексированными element.index. Цепочки элементов с векторным расчётом без
+    ветвлений объединяются в участки; участки и остальные элементы (объектный
+    work()) раскладываются по уровням самого длинного пути, и на каждом уровне все
+    участки считаются одним ядром (RunGroup), а остальные элементы — пачкой
+    (ObjectBatch) с синхронизацией соседних значений одним проходом.
+
+    Векторный расчёт окупается, только если на вызов ядра приходится много элементов.
+    Если в среднем меньше min_group_size (длинная цепь без параллельных ветвей),
+    хранилище не включается (vectorized = False): схема считается обычным объектным
+    проходом, атрибуты элементов остаются актуальными.
+
+    Атрибуты элементов с векторным расчётом обновляются из массивов через write_back()
+    (и для труб с датчиками — на каждом такте). Параметры ядер перечитываются при
+    сборке и после изменения параметров элементов (params_dirty), а не на каждом
+    такте. Свойства воды (update_water_properties) записываются прямо в массивы rho/cp.
+    """
+    def __init__(self, scheme, min_group_size=64):
+        self.scheme = scheme
+        self.min_group_size = min_group_size
+        for name in STATE_FIELDS:
+            setattr(self, name, np.empty(0))
+        self.vectorized = False
+        self.steps = []          # [RunGroup | ObjectBatch] по уровням
+        self.groups = []
+        self.kernel_elements = []
+        self.sensor_elements = []
+        self._fluid_slots = np.empty(0, dtype=np.intp)
+        self.object_fluids = []   # элементы с объектным расчётом, которым нужны свойства воды
+        self.params_dirty = True  # параметры элементов изменились (ProcessScheme.mark_dirty)
+
+    def compile(self, order):
+        """Разбить план на участки и уровни; разместить состояние элементов в массивах."""
+        position = {id(e): i for i, e in enumerate(order)}
+
+        def forward(prev, elem):
+            return prev is not None and position.get(id(prev), len(order)) < position[id(elem)]
+
+        # Участки: элемент продолжает участок предшественника, если тот — единственный вход,
+        # а сам элемент — единственный выход предшественника
+        node = {}    # id(элемента) -> узел (участок — список элементов, или сам элемент)
+        nodes = []
+        for elem in order:
+            if _vectorizable(elem):
+                prev = elem.in_elements[0] if elem.in_elements else None
+                run = node.get(id(prev)) if forward(prev, elem) else None
+                if isinstance(run, list) and run[-1] is prev and prev.out_elements == [elem]:
+                    run.append(elem)
+                else:
+                    run = [elem]
+                    nodes.append(run)
+                node[id(elem)] = run
+            else:
+                node[id(elem)] = elem
+                nodes.append(elem)
+
+        # Уровень узла — длина самого длинного пути до него (обратные рёбра колец не учитываются)
+        level = {}
+        for item in nodes:
+            head = item[0] if isinstance(item, list) else item
+            lvl = 0
+            for prev in head.in_elements:
+                if forward(prev, head):
+                    lvl = max(lvl, level[id(node[id(prev)])] + 1)
+            level[id(item)] = lvl
+        levels = {}
+        for item in nodes:
+            runs, objects = levels.setdefault(level[id(item)], ([], []))
+            (runs if isinstance(item, list) else objects).append(item)
+
+        kernel_count = sum(len(item) for item in nodes if isinstance(item, list))
+        calls = sum(1 for runs, _ in levels.values() if runs)
+        self.vectorized = bool(calls) and kernel_count >= self.min_group_size * calls
+        self.steps = []
+        self.groups = []
+        if not self.vectorized:
+            self.kernel_elements = []
+            self.sensor_elements = []
+            self._fluid_slots = np.empty(0, dtype=np.intp)
+            self.object_fluids = []
+            return
+
+        size = self.scheme.next_index
+        for name in STATE_FIELDS:
+            setattr(self, name, np.full(size, np.nan))
+        self.read_back(order)
+        kernel_ids = {id(e) for item in nodes if isinstance(item, list) for e in item}
+        for lvl in sorted(levels):
+            runs, objects = levels[lvl]
+            if runs:
+                group = RunGroup(runs)
+                self.groups.append(group)
+                self.steps.append(group)
+            if objects:
+                self.steps.append(ObjectBatch(objects, kernel_ids))
+
+        self.kernel_elements = [e for e in order if id(e) in kernel_ids]
+        self.sensor_elements = [e for e in self.kernel_elements if getattr(e, 'sensors', None)]
+        self._fluid_slots = np.concatenate([g.slots[g.fluid_positions] for g in self.groups])
+        self.object_fluids = [e for e in order if id(e) not in kernel_ids and isinstance(e, FLUID_ELEMENTS)]
+        self.refresh_params()
+
+    def refresh_params(self):
+        """Перечитать параметры элементов (сопротивления, мощности и т.п.) в массивы групп."""
+        for group in self.groups:
+            group.load_params()
+        self.params_dirty = False
+
+    def update_water_properties(self):
+        """
+        Свойства воды по таблицам WaterProperties: для групп — одним векторным расчётом
+        по входным t/p из массивов, прямо в массивы rho/cp групп (атрибуты элементов
+        не меняются); элементам с объектным расчётом — в атрибуты, как без массивов.
+        Трубы с линейным трением свойств не используют и не обновляются.
+        """
+        if self.params_dirty:
+            self.refresh_params()  # иначе run() перезапишет свойства значениями из атрибутов
+        slots = self._fluid_slots
+        if len(slots):
+            t = self.t_in[slots]
+            p = self.p_in[slots]
+            known = ~np.isnan(t)
+            rho, cp, _ = WaterProperties.properties(np.where(known, t, WaterProperties.T_MIN),
+                                                    np.where(np.isnan(p), WaterProperties.P_REF, p))
+            start = 0
+            for group in self.groups:
+                positions = group.fluid_positions
+                stop = start + len(positions)
+                ok = known[start:stop]
+                group.rho[positions[ok]] = rho[start:stop][ok]
+                group.cp[positions[ok]] = cp[start:stop][ok]
+                start = stop
+        if self.object_fluids:
+            WaterProperties.update_elements(self.object_fluids)
+
+    def read_back(self, elements, fields=STATE_FIELDS, slots=None):
+        """Загрузить состояние элементов из атрибутов в массивы (None — NaN)."""
+        if slots is None:
+            slots = np.fromiter((e.index for e in elements), np.intp, len(elements))
+        for name in fields:
+            getattr(self, name)[slots] = np.array([getattr(e, name) for e in elements], dtype=float)
+
+    def write_back(self, elements=None, fields=STATE_FIELDS, slots=None):
+        """Записать значения из массивов в атрибуты элементов с векторным расчётом."""
+        if not self.vectorized:
+            return
+        elements = self.kernel_elements if elements is None else elements
+        if not elements:
+            return
+        if slots is None:
+            slots = np.fromiter((e.index for e in elements), np.intp, len(elements))
+        columns = [getattr(self, name)[slots].tolist() for name in fields]
+        for elem, *values in zip(elements, *columns):
+            for name, value in zip(fields, values):
+                setattr(elem, name, None if value != value else value)
+
+    def run(self, dt=None):
+        """Один такт расчёта: ядра участков и пачки объектного work() по уровням."""
+        if self.params_dirty:
+            self.refresh_params()
+        for step in self.steps:
+            if type(step) is RunGroup:
+                step.run(self)
+            else:
+                step.run(self, dt)
+        if self.sensor_elements:
+            self.write_back(self.sensor_elements)
+            for elem in self.sensor_elements:
+                elem.update_sensors()
@@ -0,0 +1,243 @@
+"""
+Компиляция такта расчёта для неизменной топологии.
+
+По плану расчёта (элементы в топологическом порядке) генерируется исходный текст
+функции tick(dt) без вызовов work(): для каждого элемента известного типа формулы
+его change_t/change_p/change_f подставлены прямо в код, режимы разветвителей
+(split/merge) выбраны при компиляции, выходы предыдущих элементов берутся из
+локальных переменных. Параметры элементов читаются каждый такт, поэтому их можно
+менять без перекомпиляции; при изменении топологии схема собирает план заново.
+
+Элементы прочих типов (и подклассов) вызываются обычным work(dt). Значения
+t/p/f записываются в атрибуты элементов так же, как при интерпретируемом расчёте.
+Скомпилированный код кэшируется по тексту: одинаковые по структуре участки
+компилируются один раз.
+"""
+from BaseElement import (BaseElement, FlowSourceElement, PipeElementElement, FilterElement, PumpElement,
+                         MovElement, ValveElement, BoilerElement, ThermalFluidElement, PipeIntersectionElement)
+
+CHUNK_SIZE = 256   # элементов на одну сгенерированную функцию
+CACHE_SIZE = 256   # исходных текстов в кэше
+
+_CODE_CACHE = {}
+
+
+# --- Формулы элементов: строки кода по входам ti/pi/fi, результат — t/p/f ---
+def _source(e):
+    return ["t = ti",
+            "p = pi",
+            f"f = {e}.f_out"]
+
+
+def _pipe(e):
+    return ["t = ti",
+            f"if {e}.friction_model == 'linear':",
+            f"    d = {e}._resistance * {e}.length * fi",
+            "else:",
+            f"    d = {e}.friction_drop(fi)",
+            f"if {e}.breach and {e}.breach_percent > 0:",
+            f"    d += 5 * min({e}.breach_percent, 1.0) * pi",
+            f"    f = max(fi - fi * min({e}.breach_percent, 1), 0.0)",
+            "else:",
+            "    f = fi",
+            "p = pi - d"]
+
+
+def _filter(e):
+    return ["t = ti",
+            f"p = pi - {e}._resistance * fi * {e}.clog_factor",
+            "f = fi"]
+
+
+def _pump(e):
+    return ["t = ti",
+            "p = pi",
+            f"if {e}.status:",
+            f"    c = {e}.curve",
+            f"    p = p + ({e}.max_pressure * {e}.power if c is None else c.head(fi, {e}.power))",
+            "f = fi"]
+
+
+def _valve(opening):
+    def formula(e):
+        return ["t = ti",
+                f"r = {e}.resistance_open + ({e}.resistance_closed - {e}.resistance_open) * (1 - {e}.{opening})",
+                f"p = pi - {e}.f_out * r",
+                "f = max((pi - p) / r, 0.0) if r > 0 else 0.0"]
+    return formula
+
+
+def _boiler(e):
+    return [f"if {e}._status and fi > 0:",
+            f"    q = {e}._max_power_mw * 1e6 * {e}._power_percent",
+            f"    m = fi * {e}.rho",
+            f"    t = ti + (q / (m * {e}.cp) if m > 0 else 0)",
+            "else:",
+            "    t = ti",
+            f"p = pi - {e}._resistance * fi",
+            "f = fi"]
+
+
+def _consumer(e):
+    return ["if fi > 0:",
+            f"    q = {e}._heat_demand * 1e6",
+            f"    m = fi * {e}.rho",
+            f"    t = ti - (q / (m * {e}.cp) if m > 0 else 0)",
+            "else:",
+            "    t = ti",
+            f"p = pi - {e}._resistance * fi",
+            "f = fi"]
+
+
+FORMULAS = {
+    FlowSourceElement: _source,
+    PipeElementElement: _pipe,
+    FilterElement: _filter,
+    PumpElement: _pump,
+    MovElement: _valve('position'),
+    ValveElement: _valve('opening'),
+    BoilerElement: _boiler,
+    ThermalFluidElement: _consumer,
+}
+
+
+class _ChunkWriter:
+    """Генерация кода одного участка плана."""
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.names = {id(e): f"e{k}" for k, e in enumerate(chunk)}
+        self.external = []
+        self.lines = []
+        self.scalars = {}   # id(элемента) -> имена локальных t/p/f его выходов
+        self.branches = {}  # id(разветвителя) -> имена локальных списков выходов ветвей
+
+    def ref(self, elem):
+        name = self.names.get(id(elem))
+        if name is None:
+            name = self.names[id(elem)] = f"x{len(self.external)}"
+            self.external.append(elem)
+        return name
+
+    def emit(self, *lines):
+        self.lines.extend(lines)
+
+    def scalar_outputs(self, elem):
+        """Выражения t_out, p_out, f_out элемента (локальные переменные или атрибуты)."""
+        local = self.scalars.get(id(elem))
+        if local is not None:
+            return local
+        u = self.ref(elem)
+        return f"{u}.t_out", f"{u}.p_out", f"{u}.f_out"
+
+    def outputs_for(self, up, elem):
+        """Выражение для up.get_outputs_for(elem)."""
+        if id(up) in self.scalars:
+            return ", ".join(self.scalars[id(up)])
+        u = self.ref(up)
+        if id(up) in self.branches:
+            idx = next((i for i, x in enumerate(up.out_elements) if x is elem), None)
+            if idx is not None:
+                tl, pl, fl = self.branches[id(up)]
+                return f"({tl}[{idx}], {pl}[{idx}], {fl}[{idx}]) if {fl} else ({u}.t_out, {u}.p_out, {u}.f_out)"
+        if type(up).get_outputs_for is BaseElement.get_outputs_for:
+            return f"{u}.t_out, {u}.p_out, {u}.f_out"
+        return f"{u}.get_outputs_for({self.ref(elem)})"
+
+    def push(self, elem, t, p, f):
+        """Передать выходы нижестоящим элементам (как в work() разветвителей)."""
+        for idx, child in enumerate(elem.out_elements):
+            c = self.ref(child)
+            self.emit(f"{c}.t_in = {t.format(idx)}", f"{c}.p_in = {p.format(idx)}", f"{c}.f_in = {f.format(idx)}")
+
+    def element(self, k, elem):
+        e = self.ref(elem)
+        kind = type(elem)
+        formula = FORMULAS.get(kind)
+        if kind is PipeIntersectionElement and elem.mode == 'split' and len(elem.in_elements) == 1:
+            self.split(k, elem, e)
+        elif kind is PipeIntersectionElement and elem.mode == 'merge' and len(elem.in_elements) >= 2:
+            self.merge(k, elem, e)
+        elif formula is not None and (not elem.in_elements or elem.in_elements[0] is not None):
+            if elem.in_elements:
+                self.emit(f"ti, pi, fi = {self.outputs_for(elem.in_elements[0], elem)}",
+                          f"{e}.t_in = ti", f"{e}.p_in = pi", f"{e}.f_in = fi")
+            else:
+                self.emit(f"ti, pi, fi = {e}.t_in, {e}.p_in, {e}.f_in")
+            self.emit(*formula(e))
+            t, p, f = f"t{k}", f"p{k}", f"f{k}"
+            self.emit(f"{t} = {e}.t_out = t", f"{p} = {e}.p_out = p", f"{f} = {e}.f_out = f")
+            if kind is PipeElementElement:
+                self.emit(f"if {e}.sensors:", f"    {e}.update_sensors()")
+            self.scalars[id(elem)] = (t, p, f)
+        else:
+            self.emit(f"{e}.work(dt)")
+
+    def split(self, k, elem, e):
+        ti, pi, fi = self.scalar_outputs(elem.in_elements[0])
+        tl, pl, fl = f"tl{k}", f"pl{k}", f"fl{k}"
+        self.emit(f"ti, pi, fi = {ti}, {pi}, {fi}",
+                  f"{e}.t_in = ti", f"{e}.p_in = pi", f"{e}.f_in = fi",
+                  f"r = {e}.resistances",
+                  "inv = [1 / max(x, 1e-9) for x in r]",
+                  "total = sum(inv)",
+                  f"{tl} = {e}.t_out_list = [ti] * max(len(r), {len(elem.out_elements)})",
+                  f"{fl} = {e}.f_out_list = [g / total * fi for g in inv]",
+                  f"{pl} = {e}.p_out_list = [pi - x * f for x, f in zip(r, {fl})]")
+        self.push(elem, tl + "[{}]", pl + "[{}]", fl + "[{}]")
+        self.branches[id(elem)] = (tl, pl, fl)
+
+    def merge(self, k, elem, e):
+        ts, ps, fs = zip(*(self.scalar_outputs(up) for up in elem.in_elements))
+        flows = f"({', '.join(fs)},)"
+        t, p, f = f"t{k}", f"p{k}", f"f{k}"
+        self.emit(f"{t} = {e}.t_out = sum(({', '.join(f'{a} * {b}' for a, b in zip(ts, fs))},))"
+                  f" / (sum({flows}) + 1e-9)",
+                  f"{f} = {e}.f_out = sum({flows})",
+                  f"{p} = {e}.p_out = sum(a - x * b for a, x, b in zip(({', '.join(ps)},), {e}.resistances, {flows}))"
+                  f" / {len(elem.in_elements)}")
+        self.push(elem, t, p, f)
+        self.scalars[id(elem)] = (t, p, f)
+
+    def source(self):
+        for k, elem in enumerate(self.chunk):
+            self.element(k, elem)
+        body = ["def make(E, X):"]
+        body += [f"    e{k} = E[{k}]" for k in range(len(self.chunk))]
+        body += [f"    x{k} = X[{k}]" for k in range(len(self.external))]
+        body += ["    def tick(dt):"]
+        body += [f"        {line}" for line in self.lines] or ["        pass"]
+        body += ["    return tick"]
+        return "\n".join(body) + "\n"
+
+
+def tick_source(elements):
+    """Исходный текст сгенерированных функций (по участкам) — для отладки."""
+    return [_ChunkWriter(elements[start:start + CHUNK_SIZE]).source()
+            for start in range(0, len(elements), CHUNK_SIZE)]
+
+
+def compile_tick(elements):
+    """
+    Скомпилировать такт для плана elements (топологический порядок).
+    Возвращает функцию tick(dt), эквивалентную вызову work(dt) всех элементов по порядку.
+    """
+    parts = []
+    for start in range(0, len(elements), CHUNK_SIZE):
+        chunk = elements[start:start + CHUNK_SIZE]
+        writer = _ChunkWriter(chunk)
+        source = writer.source()
+        make = _CODE_CACHE.get(source)
+        if make is None:
+            if len(_CODE_CACHE) >= CACHE_SIZE:
+                _CODE_CACHE.clear()
+            namespace = {}
+            exec(compile(source, '<tick>', 'exec'), namespace)
+            make = _CODE_CACHE[source] = namespace['make']
+        parts.append(make(chunk, writer.external))
+    if len(parts) == 1:
+        return parts[0]
+
+    def tick(dt):
+        for part in parts:
+            part(dt)
+    return tick
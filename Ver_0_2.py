@@ -2,18 +2,22 @@ import os
 from OpenGL.GL import *
 from OpenGL.arrays import vbo
 from PyQt5 import QtCore, QtGui, QtWidgets
-import sys, heapq
-import numpy as np
+import sys, heapq, time
 from PyQt5.QtCore import Qt, QPoint, QRect, QPointF, QTimer, pyqtSlot
 from PyQt5.QtGui import QCursor, QColor, QTransform, QIcon
 from PyQt5.QtWidgets import QOpenGLWidget, QAction
 
 from BaseElement import *
+from SimulationClock import SimulationClock
+import SchemeFile
 
 CONNECTION_MARGIN = 40
 MIN_DISTANCE = 60
+LAZY_CELL = 400  # размер ячейки сетки отложенных (ещё не созданных) объектов сцены
 
 class ConnectionPoint:
+    __slots__ = ('parent', 'kind', 'x', 'y', 'i', 'pipe')
+
     def __init__(self, parent, kind):
         self.parent:DraggableObject = parent
         self.kind = kind  # 'in' или 'out'
@@ -84,6 +88,17 @@ class ConnectionPoint:
             return (point - pos).manhattanLength() <= radius
 
 
+class QtSchemeSignals(QtCore.QObject):
+    """Адаптер: пробрасывает сигналы модели (Signals.Signal) в сигналы Qt для GUI."""
+    chain_initialized = QtCore.pyqtSignal()
+    chain_not_initialized = QtCore.pyqtSignal()
+
+    def __init__(self, scheme, parent=None):
+        super().__init__(parent)
+        scheme.chain_initialized.connect(self.chain_initialized.emit)
+        scheme.chain_not_initialized.connect(self.chain_not_initialized.emit)
+
+
 class ElementController(QtCore.QObject):
     element_changed = QtCore.pyqtSignal(str)
     settings_object_changed = QtCore.pyqtSignal(object)
@@ -185,15 +200,31 @@ class DraggableObject:
         parameters = self.model.get_parameters()
         return parameters
 
-    def delete(self):
+    def connection_points(self):
+        points = []
+        for point in (self.in_point, self.out_point):
+            if type(point) == list:
+                points.extend(point)
+            elif point is not None:
+                points.append(point)
+        return points
+
+    def delete(self, remove_logic=True):
+        """
+        Отсоединить подключённые трубы и вернуть их. При remove_logic=False элементы
+        из схемы не удаляются (это сделает вызывающий одним remove_elements),
+        а в результат добавляются и датчики труб.
+        """
         result = []
-        if self.in_point.pipe != None:
-            result.append(self.in_point.pipe)
-            self.in_point.pipe.delete()
-        if self.out_point.pipe != None:
-            result.append(self.out_point.pipe)
-            self.out_point.pipe.delete()
-        self.process_scheme.remove_element(self.logic_element.index)
+        for point in self.connection_points():
+            pipe = point.pipe
+            if pipe is not None:
+                result.append(pipe)
+                sensors = pipe.delete(remove_logic)
+                if not remove_logic:
+                    result.extend(sensors)
+        if remove_logic:
+            self.process_scheme.remove_element(self.logic_element.index)
         return result
 
 
@@ -400,8 +431,6 @@ class QPipe(DraggableObject):
         self.out_point.pipe = self
         # self.path_points:list[QPoint] = []
         self.path_points = []
-        if self.logic_element and process_scheme:
-            process_scheme.add_element(self.logic_element)
         if start_logic and end_logic:
             self.logic_element.add_in_element(start_logic)
             self.logic_element.add_out_element(end_logic)
@@ -617,19 +646,22 @@ class QPipe(DraggableObject):
     def get_rect(self):
         return self.path_points
 
-    def delete(self):
-        if self.in_point.parent != None:
+    def delete(self, remove_logic=True):
+        """Отсоединить трубу от точек подключения; вернуть её датчики."""
+        if self.in_point is not None:
             self.in_point.pipe = None
             self.in_point = None
-        if self.out_point != None:
+        if self.out_point is not None:
             self.out_point.pipe = None
             self.out_point = None
-        if len(self.sensors) != 0:
-            for sensor in self.sensors:
+        sensors = self.sensors
+        self.sensors = []
+        if remove_logic:
+            for sensor in sensors:
                 sensor.delete()
-            self.sensors = []
-        self.parent_widget.pipes.remove(self)
-        self.process_scheme.remove_element(self.logic_element.index)
+            self.parent_widget.pipes.remove(self)
+            self.process_scheme.remove_element(self.logic_element.index)
+        return sensors
 
 
 class QPipeIntersection(DraggableObject):
@@ -713,8 +745,14 @@ class QSensor:
         "flow": "м³/ч",
         # Добавьте другие типы по необходимости
     }
+    ALARM_COLORS = {
+        "HIHI": QtGui.QColor(255, 110, 110),
+        "LOLO": QtGui.QColor(255, 110, 110),
+        "HI": QtGui.QColor(255, 220, 100),
+        "LO": QtGui.QColor(255, 220, 100),
+    }
 
-    def __init__(self, x, y, parent_widget, logic_element, process_scheme, pipe, unit=None):
+    def __init__(self, x, y, parent_widget, logic_element, process_scheme, pipe, unit=None, register=True):
         self.position = QtCore.QPoint(x, y)
         self.width = 110
         self.height = 45
@@ -723,10 +761,12 @@ class QSensor:
         self.pipe:QPipe = pipe
         self.pipe.sensors.append(self)
         self.logic_element:Sensor = logic_element
-        self.process_scheme.sensors.append(self.logic_element)
-        self.pipe.logic_element.sensors.append(self.logic_element)
+        if register:  # при загрузке схемы датчик уже привязан к схеме и трубе
+            self.process_scheme.sensors.append(self.logic_element)
+            self.pipe.logic_element.sensors.append(self.logic_element)
         self.value = 0
         self.parent_widget = parent_widget
+        parent_widget.sensor_boxes[id(logic_element)] = self
         # Автоматически определить единицу измерения, если не задана явно
         if unit is not None:
             self.unit = unit
@@ -756,16 +796,28 @@ class QSensor:
         """Перемещает сенсор в новую позицию."""
         self.position = QtCore.QPoint(x, y)
 
-    def delete(self):
-        """Удаляет сенсор из редактора (если нужно)."""
-        if self in self.parent_widget.objects:
+    def delete(self, remove_logic=True):
+        """Удаляет сенсор из редактора и отвязывает его от трубы и схемы."""
+        if self.parent_widget.sensor_boxes.get(id(self.logic_element)) is self:
+            del self.parent_widget.sensor_boxes[id(self.logic_element)]
+        if self in self.pipe.sensors:
+            self.pipe.sensors.remove(self)
+        logic_sensors = self.pipe.logic_element.sensors
+        if self.logic_element in logic_sensors:
+            logic_sensors.remove(self.logic_element)
+        if self.logic_element in self.process_scheme.sensors:
+            self.process_scheme.sensors.remove(self.logic_element)
+        if remove_logic and self in self.parent_widget.objects:
             self.parent_widget.objects.remove(self)
+        return []
 
     def paint(self, painter):
         # Основной прямоугольник
         rect = QtCore.QRect(self.position.x(), self.position.y(), self.width, self.height)
         painter.setPen(QtCore.Qt.black)
-        painter.setBrush(QtGui.QColor(240, 240, 240))
+        # Фон — по старшей активной сигнализации датчика
+        alarm = getattr(self.logic_element, "alarm", None)
+        painter.setBrush(self.ALARM_COLORS.get(alarm, QtGui.QColor(240, 240, 240)))
         painter.drawRect(rect)
         # Пунктирная линия
         if self.pipe:
@@ -825,6 +877,7 @@ class WidgetWithObjects(QtWidgets.QOpenGLWidget):
         self.controller = controller
         self.setGeometry(0, 0, 1300, 800)
         self.objects:list[DraggableObject] = []
+        self.sensor_boxes = {}  # id(логического датчика) -> QSensor на сцене
         self.selected_object = None
         self.settings_selected_object = None
         self.offset = QtCore.QPoint()
@@ -844,6 +897,12 @@ class WidgetWithObjects(QtWidgets.QOpenGLWidget):
         self.controller.element_changed.connect(self.set_selected_element)
         self.map:MapWidget = map
         self.pipes = []
+        # Загруженные из файла объекты создаются, только когда попадают в видимую область
+        self.pending_nodes = {}     # индекс элемента -> запись layout
+        self.pending_pipes = {}
+        self.pending_sensors = {}   # позиция датчика в scheme.sensors -> запись layout
+        self.pending_cells = {}     # (cx, cy) -> [(вид, ключ)]
+        self.pipes_of_node = {}     # индекс элемента -> индексы труб, подключённых к нему
 
     def pos_scene(self, event):
         scene_pos = event.pos() - self.scene_offset
@@ -875,7 +934,136 @@ class WidgetWithObjects(QtWidgets.QOpenGLWidget):
         else:
             self.unsetCursor()
 
+    # --- Сохранение / загрузка расположения объектов ---
+    def export_layout(self):
+        """Расположение объектов редактора для SchemeFile (включая ещё не созданные)."""
+        nodes = list(self.pending_nodes.values())
+        pipes = list(self.pending_pipes.values())
+        sensors = list(self.pending_sensors.values())
+        sensor_position = {id(s): k for k, s in enumerate(self.process_scheme.sensors)}
+        for obj in self.objects:
+            if type(obj) == QSensor:
+                sensors.append({'sensor': sensor_position[id(obj.logic_element)],
+                                'pipe': obj.pipe.logic_element.index,
+                                'x': obj.position.x(), 'y': obj.position.y()})
+            elif type(obj) == QPipe:
+                pipes.append({'element': obj.logic_element.index,
+                              'from': self._port_ref(obj.in_point), 'to': self._port_ref(obj.out_point),
+                              'points': [[p.x(), p.y()] for p in obj.path_points]})
+            elif obj.logic_element is not None:
+                nodes.append({'element': obj.logic_element.index, 'kind': type(obj).__name__,
+                              'x': obj.position.x(), 'y': obj.position.y()})
+        return {'nodes': nodes, 'pipes': pipes, 'sensors': sensors}
+
+    @staticmethod
+    def _port_ref(point):
+        owner = point.parent
+        ports = owner.in_point if point.kind == 'in' else owner.out_point
+        port = ports.index(point) if type(ports) == list else 0
+        return [owner.logic_element.index, port]
+
+    def load_layout(self, layout):
+        """Заменить объекты сцены отложенными записями из layout (схема уже загружена)."""
+        self.objects = []
+        self.sensor_boxes = {}
+        self.pipes = []
+        self.selected_object = None
+        self.settings_selected_object = None
+        self.pending_nodes = {}
+        self.pending_pipes = {}
+        self.pending_sensors = {}
+        self.pending_cells = {}
+        self.pipes_of_node = {}
+        if not layout:
+            return
+        for node in layout['nodes']:
+            self.pending_nodes[node['element']] = node
+            self._add_pending_cell(('node', node['element']), node['x'], node['y'], node['x'], node['y'])
+        for pipe in layout['pipes']:
+            self.pending_pipes[pipe['element']] = pipe
+            for end in (pipe['from'][0], pipe['to'][0]):
+                self.pipes_of_node.setdefault(end, []).append(pipe['element'])
+            xs = [p[0] for p in pipe['points']] or [0]
+            ys = [p[1] for p in pipe['points']] or [0]
+            self._add_pending_cell(('pipe', pipe['element']), min(xs), min(ys), max(xs), max(ys))
+        for box in layout['sensors']:
+            self.pending_sensors[box['sensor']] = box
+            self._add_pending_cell(('sensor', box['sensor']), box['x'], box['y'], box['x'], box['y'])
+
+    def _add_pending_cell(self, key, x0, y0, x1, y1):
+        for cx in range(x0 // LAZY_CELL, x1 // LAZY_CELL + 1):
+            for cy in range(y0 // LAZY_CELL, y1 // LAZY_CELL + 1):
+                self.pending_cells.setdefault((cx, cy), []).append(key)
+
+    def materialize_visible(self):
+        """Создать объекты редактора для отложенных записей в видимой области сцены."""
+        if not self.pending_cells:
+            return
+        left, top = -self.scene_offset.x(), -self.scene_offset.y()
+        for cx in range(left // LAZY_CELL, (left + self.width()) // LAZY_CELL + 1):
+            for cy in range(top // LAZY_CELL, (top + self.height()) // LAZY_CELL + 1):
+                for kind, key in self.pending_cells.pop((cx, cy), ()):
+                    if kind == 'node':
+                        self._materialize_node(key)
+                    elif kind == 'pipe':
+                        self._materialize_pipe(key)
+                    else:
+                        self._materialize_sensor(key)
+
+    def _materialize_node(self, index):
+        record = self.pending_nodes.pop(index, None)
+        if record is None:
+            return next((o for o in self.objects if type(o) not in (QPipe, QSensor)
+                         and o.logic_element is not None and o.logic_element.index == index), None)
+        logic = self.process_scheme.elements_dict[index]
+        kind = record['kind']
+        if kind == 'QPipeIntersection':
+            obj = QPipeIntersection(record['x'], record['y'], logic, None, self, mode=logic.mode)
+        elif kind in ('QFlowSource', 'QPump', 'QMov', 'QBoiler'):
+            obj = globals()[kind](record['x'], record['y'], logic, None, self)
+        else:
+            obj = DraggableObject(record['x'], record['y'], self, tag=type(logic).__name__, logic_element=logic)
+        obj.process_scheme = self.process_scheme
+        self.objects.append(obj)
+        return obj
+
+    def _materialize_pipe(self, index):
+        record = self.pending_pipes.pop(index, None)
+        if record is None:
+            return next((p for p in self.pipes if p.logic_element.index == index), None)
+        ends = []
+        for (element, port), kind in ((record['from'], 'out'), (record['to'], 'in')):
+            owner = self._materialize_node(element)
+            points = owner.out_point if kind == 'out' else owner.in_point
+            ends.append(points[port] if type(points) == list else points)
+        pipe = QPipe(ends[0], ends[1], None, None, logic_element=self.process_scheme.elements_dict[index],
+                     parent_widget=self)
+        pipe.process_scheme = self.process_scheme
+        pipe.path_points = [QPoint(x, y) for x, y in record['points']]
+        self.objects.append(pipe)
+        return pipe
+
+    def _materialize_sensor(self, position):
+        record = self.pending_sensors.pop(position, None)
+        if record is None:
+            return
+        pipe = self._materialize_pipe(record['pipe'])
+        sensor = QSensor(record['x'], record['y'], self, self.process_scheme.sensors[position],
+                         self.process_scheme, pipe, register=False)
+        self.objects.append(sensor)
+
+    def _materialize_attached(self, obj):
+        """Перед удалением объекта создать ещё не созданные трубы и датчики, подключённые к нему."""
+        if type(obj) in (QPipe, QSensor) or obj.logic_element is None:
+            return
+        for pipe_index in self.pipes_of_node.pop(obj.logic_element.index, ()):
+            pipe = self._materialize_pipe(pipe_index)
+            for position, box in list(self.pending_sensors.items()):
+                if pipe is not None and box['pipe'] == pipe_index:
+                    self._materialize_sensor(position)
+
     def paintGL(self):
+        self.materialize_visible()
         glClearColor(1.0, 1.0, 1.0, 1.0)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glColor3f(0.0, 0.6, 0.0)
@@ -1226,25 +1414,36 @@ class WidgetWithObjects(QtWidgets.QOpenGLWidget):
 
     def remove_selected_object(self):
         pos = self.mapFromGlobal(QCursor.pos()) - self.scene_offset
+        target = None
         for obj in self.objects:
             if type(obj) == QPipe:
-                points = obj.get_rect()
-                for point in points:
-                    if obj.is_near(point, pos, 10):
-                        obj.delete()
-                        self.objects.remove(obj)
-                        break
-            else:
-                rect = obj.get_rect()
-                if rect.contains(pos):
-                    rems_obj = obj.delete()
-                    self.objects.remove(obj)
-                    if rems_obj:
-                        for rem_obj in rems_obj:
-                            self.objects.remove(rem_obj)
+                if any(obj.is_near(point, pos, 10) for point in obj.get_rect()):
+                    target = obj
                     break
+            elif obj.get_rect().contains(pos):
+                target = obj
+                break
+        if target is not None:
+            self._materialize_attached(target)
+            self.remove_objects([target] + target.delete(remove_logic=False))
         self.update()
 
+    def remove_objects(self, removed):
+        """Убрать объекты со сцены одним проходом, а их элементы — из схемы одним remove_elements."""
+        removed_ids = {id(obj) for obj in removed}
+        self.objects = [obj for obj in self.objects if id(obj) not in removed_ids]
+        self.pipes = [pipe for pipe in self.pipes if id(pipe) not in removed_ids]
+        self.process_scheme.remove_elements([obj.logic_element.index for obj in removed
+                                             if type(obj) != QSensor and obj.logic_element is not None])
+        for obj in removed:  # датчики труб приходят сюда без QSensor.delete
+            if type(obj) == QSensor and self.sensor_boxes.get(id(obj.logic_element)) is obj:
+                del self.sensor_boxes[id(obj.logic_element)]
+        if id(self.settings_selected_object) in removed_ids:
+            self.settings_selected_object = None
+            self.controller.set_settings_object(None)
+        if id(self.selected_object) in removed_ids:
+            self.selected_object = None
+
     @staticmethod
     def paint_pipe(path_points):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -1369,6 +1568,11 @@ class MapWidget(QtWidgets.QWidget):
         # painter.setBrush(QtCore.Qt.NoBrush)
         # painter.drawRect(view_x, view_y, view_w, view_h)
         # Пример: рисуем все объекты как точки на миникарте
+        # Ещё не созданные объекты (загружены из файла) — точки по записям layout
+        painter.setPen(QtCore.Qt.blue)
+        painter.setBrush(QtCore.Qt.blue)
+        for node in self.redactor.pending_nodes.values():
+            painter.drawEllipse(QtCore.QPointF(node['x'] * scale_x, node['y'] * scale_y), 2, 2)
         if len(self.redactor.objects) != 0:
             for obj in self.redactor.objects:
                 if type(obj) == QPipe:
@@ -1413,18 +1617,52 @@ class ControlMenu(QtWidgets.QToolBar):
         self.action1 = QAction(QIcon("icon/init_on.png" if self.parent_widget.process_scheme.chain_ready else "icon/init_off.png"), "Инструмент 1", self)
         self.action2 = QAction(QIcon("icon/def.png"), "Инструмент 2", self)
         self.action3 = QAction(QIcon("icon/def.png"), "Инструмент 3", self)
+        self.action_run = QAction(QIcon("icon/def.png"), "Пуск/Стоп моделирования", self)
+        self.action_run.setCheckable(True)
+        self.action_save = QAction(QIcon("icon/def.png"), "Сохранить схему", self)
+        self.action_open = QAction(QIcon("icon/def.png"), "Открыть схему", self)
 
         self.addAction(self.action1)
         self.addAction(self.action2)
         self.addAction(self.action3)
+        self.addAction(self.action_run)
+        self.addAction(self.action_save)
+        self.addAction(self.action_open)
 
         self.action1.triggered.connect(self.action1_clicked)
+        self.action_run.toggled.connect(self.action_run_toggled)
+        self.action_save.triggered.connect(self.action_save_clicked)
+        self.action_open.triggered.connect(self.action_open_clicked)
 
     @pyqtSlot()
     def action1_clicked(self):
         if not self.parent_widget.process_scheme.chain_ready:
-            self.parent_widget.process_scheme.initialize_chains()
+            try:
+                self.parent_widget.process_scheme.initialize_chains()
+            except SchemeValidationError as error:
+                QtWidgets.QMessageBox.warning(self, "Проверка схемы", str(error))
+
+    @pyqtSlot(bool)
+    def action_run_toggled(self, checked):
+        clock = self.parent_widget.clock
+        if checked:
+            clock.start()
+        else:
+            clock.stop()
 
+    @pyqtSlot()
+    def action_save_clicked(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Сохранить схему", "",
+                                                        "Схема (*.psim);;JSON (*.json)")
+        if path:
+            self.parent_widget.save_scheme(path)
+
+    @pyqtSlot()
+    def action_open_clicked(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Открыть схему", "",
+                                                        "Схема (*.psim *.json)")
+        if path:
+            self.parent_widget.load_scheme(path)
 
 
     def addAction(self, action):
@@ -1677,13 +1915,18 @@ class SettingsMenu(QtWidgets.QDockWidget):
         setter_name = f"set_{name}"
         if hasattr(elem, setter_name) and callable(getattr(elem, setter_name)):
             getattr(elem, setter_name)(value)
-            return
-
         # 2. Иначе пробуем напрямую свойство
-        if hasattr(elem, name):
+        elif hasattr(elem, name):
             setattr(elem, name, value)
+        # 3. Иначе — поле, указанное в схеме параметров класса
+        elif name in type(elem).parameter_schema():
+            setattr(elem, type(elem).parameter_schema()[name]['attr'], value)
+        else:
+            # при желании можно логировать, если параметр не смог примениться
             return
-        # при желании можно логировать, если параметр не смог примениться
+        # Схема пересчитает только нижестоящий конус изменённого элемента
+        if hasattr(elem, "mark_dirty"):
+            elem.mark_dirty()
 
 
 # --- Основная часть ---
@@ -1691,6 +1934,15 @@ class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
         self.process_scheme = ProcessScheme()
+        self.process_scheme.enable_alarms()  # проверяются только датчики с уставками
+        # Датчики, опубликовавшие значение с прошлого обновления экрана (id логического датчика -> датчик)
+        self._changed_sensors = {}
+        self.process_scheme.sensors_changed.connect(self.on_sensors_changed)
+        self.scheme_signals = QtSchemeSignals(self.process_scheme, self)
+        self.scheme_signals.chain_initialized.connect(
+            lambda: self.statusBar().showMessage("Цепи схемы построены", 3000))
+        self.scheme_signals.chain_not_initialized.connect(
+            lambda: self.statusBar().showMessage("Схема изменена: требуется инициализация цепей"))
         self.setWindowTitle("Редактор с сеткой")
         self.resize(1600, 900)
         self.controller = ElementController()
@@ -1744,19 +1996,60 @@ class MainWindow(QtWidgets.QMainWindow):
         self.update_timer.timeout.connect(self.update_sensors)
         self.update_timer.start(500)  # обновлять каждые 500 мс (0.5 сек)
 
+        # Часы моделирования: шаг 0.1 с модельного времени, опрос из цикла событий;
+        # до инициализации схемы poll() шагов не делает, время — scheme.sim_time
+        self.clock = SimulationClock(self.process_scheme, dt=0.1, mode='realtime')
+        self.sim_timer = QTimer(self)
+        self.sim_timer.timeout.connect(self.clock.poll)
+        self.sim_timer.start(10)
+
         self.settings_menu = SettingsMenu(self)
         self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.settings_menu)
 
 
+    def save_scheme(self, path):
+        SchemeFile.save(path, self.process_scheme, self.redactor.export_layout())
+
+    def load_scheme(self, path):
+        self.control_menu.action_run.setChecked(False)
+        self.controller.set_settings_object(None)
+        _, layout = SchemeFile.load(path, self.process_scheme)
+        self.redactor.load_layout(layout)
+        self.redactor.update()
+
+    def on_sensors_changed(self, sensors):
+        for sensor in sensors:
+            self._changed_sensors[id(sensor)] = sensor
+
     def update_sensors(self):
-        for obj in self.redactor.objects:
-            if isinstance(obj, QSensor):
-                obj.work()
-        self.redactor.update()  # перерисовать сцену, если нужно
+        profiler = self.process_scheme.profiler
+        start = time.perf_counter()
+        changed, self._changed_sensors = self._changed_sensors, {}
+        boxes = self.redactor.sensor_boxes  # датчики без подписи на сцене пропускаются
+        for key in changed:
+            box = boxes.get(key)
+            if box is not None:
+                box.work()
+        if self.show_alarm_events() or changed:
+            self.redactor.update()  # перерисовка только при новых показаниях или событиях сигнализации
+        if profiler is not None:
+            profiler.record('MainWindow', 'update_sensors', time.perf_counter() - start)
 
         self.control_menu.action1.setIcon(QIcon("icon/init_on.png" if self.process_scheme.chain_ready else "icon/init_off.png"))
 
 
+    def show_alarm_events(self):
+        """Последнее событие сигнализации — в строке состояния; True, если события были."""
+        alarms = self.process_scheme.alarms
+        if alarms is None or not alarms.events:
+            return False
+        event = alarms.drain()[-1]
+        sensor = event.sensor
+        name = sensor.tag or f"Датчик {sensor.index}"
+        state = "сработала" if event.active else "снята"
+        self.statusBar().showMessage(f"{name}: сигнализация {event.level} {state} ({event.value:.3f})", 5000)
+        return True
+
     def item_changed(self, current, previous):
         if current:
             self.controller.set_element(current.text())
@@ -0,0 +1,127 @@
+"""
+Свойства воды по таблицам: плотность, теплоёмкость и динамическая вязкость
+в зависимости от температуры (°C) и давления (МПа, абс.).
+
+Таблицы строятся один раз при импорте на равномерной сетке (1 °C x 0.1 МПа),
+поэтому поиск ячейки — арифметика без бинарного поиска, а билинейная интерполяция
+считается одним векторным вызовом сразу для всех элементов.
+
+Основа — справочные данные насыщенной жидкой воды через 10 °C (0...200 °C).
+Давление учитывается через изотермическую сжимаемость (плотность); теплоёмкость
+и вязкость жидкой воды от давления в диапазоне сетки практически не зависят
+(< 0.5 %) и берутся на линии насыщения. Область пара не моделируется —
+saturation_temperature() позволяет проверить, что вода не вскипает.
+"""
+import numpy as np
+
+# Насыщенная жидкая вода: t, °C -> плотность, кг/м3; теплоёмкость, кДж/(кг*К)
+_T_BASE = np.arange(0.0, 201.0, 10.0)
+_RHO_BASE = np.array([999.8, 999.7, 998.2, 995.7, 992.2, 988.0, 983.2, 977.8, 971.8, 965.3, 958.4,
+                      951.0, 943.1, 934.8, 926.1, 917.0, 907.4, 897.3, 886.9, 876.0, 864.7])
+_CP_BASE = np.array([4.217, 4.192, 4.182, 4.178, 4.179, 4.181, 4.185, 4.190, 4.197, 4.205, 4.216,
+                     4.229, 4.245, 4.263, 4.285, 4.310, 4.339, 4.371, 4.408, 4.449, 4.497]) * 1e3
+
+# Линия насыщения: давление, МПа -> температура кипения, °C
+_P_SAT = np.array([0.01, 0.05, 0.101325, 0.2, 0.3, 0.5, 0.7, 1.0, 1.5, 2.0, 2.5])
+_T_SAT = np.array([45.8, 81.3, 100.0, 120.2, 133.5, 151.8, 165.0, 179.9, 198.3, 212.4, 223.9])
+
+P_REF = 0.101325  # МПа, атмосферное давление
+
+T_MIN, T_MAX, T_STEP = 0.0, 200.0, 1.0
+P_MIN, P_MAX, P_STEP = 0.0, 2.5, 0.1
+
+TEMPERATURES = np.linspace(T_MIN, T_MAX, int(round((T_MAX - T_MIN) / T_STEP)) + 1)
+PRESSURES = np.linspace(P_MIN, P_MAX, int(round((P_MAX - P_MIN) / P_STEP)) + 1)
+
+
+def _viscosity(t):
+    """Динамическая вязкость жидкой воды, Па*с (уравнение Фогеля)."""
+    return 2.414e-5 * 10 ** (247.8 / (t + 273.15 - 140.0))
+
+
+def _compressibility(t):
+    """Изотермическая сжимаемость, 1/МПа (минимум около 45 °C)."""
+    return 4.4e-4 + 1.5e-8 * (t - 45.0) ** 2
+
+
+def _build_tables():
+    t = TEMPERATURES[:, None]
+    p = PRESSURES[None, :]
+    rho = np.interp(TEMPERATURES, _T_BASE, _RHO_BASE)[:, None] * (1.0 + _compressibility(t) * (p - P_REF))
+    cp = np.broadcast_to(np.interp(TEMPERATURES, _T_BASE, _CP_BASE)[:, None], rho.shape).copy()
+    mu = np.broadcast_to(_viscosity(t), rho.shape).copy()
+    return rho, cp, mu
+
+
+DENSITY, HEAT_CAPACITY, VISCOSITY = _build_tables()
+
+
+def _locate(t, p):
+    x = (np.clip(np.asarray(t, dtype=float), T_MIN, T_MAX) - T_MIN) / T_STEP
+    y = (np.clip(np.asarray(p, dtype=float), P_MIN, P_MAX) - P_MIN) / P_STEP
+    i = np.minimum(x.astype(np.intp), len(TEMPERATURES) - 2)
+    j = np.minimum(y.astype(np.intp), len(PRESSURES) - 2)
+    return i, j, x - i, y - j
+
+
+def _interpolate(table, cell):
+    i, j, wx, wy = cell
+    return ((table[i, j] * (1 - wx) + table[i + 1, j] * wx) * (1 - wy)
+            + (table[i, j + 1] * (1 - wx) + table[i + 1, j + 1] * wx) * wy)
+
+
+def _result(value, t, p):
+    return float(value) if np.ndim(t) == 0 and np.ndim(p) == 0 else value
+
+
+def properties(t, p=P_REF):
+    """
+    Плотность (кг/м3), теплоёмкость (Дж/(кг*К)) и вязкость (Па*с) при температуре t (°C)
+    и давлении p (МПа); t и p — числа или массивы. Значения вне сетки — по её границе.
+    """
+    cell = _locate(t, p)
+    return tuple(_result(_interpolate(table, cell), t, p) for table in (DENSITY, HEAT_CAPACITY, VISCOSITY))
+
+
+def density(t, p=P_REF):
+    return _result(_interpolate(DENSITY, _locate(t, p)), t, p)
+
+
+def heat_capacity(t, p=P_REF):
+    return _result(_interpolate(HEAT_CAPACITY, _locate(t, p)), t, p)
+
+
+def viscosity(t, p=P_REF):
+    return _result(_interpolate(VISCOSITY, _locate(t, p)), t, p)
+
+
+def saturation_temperature(p):
+    """Температура кипения при давлении p (МПа), °C."""
+    return _result(np.interp(p, _P_SAT, _T_SAT), p, 0.0)
+
+
+def update_elements(elements, tolerance=None):
+    """
+    Записать свойства воды элементам (атрибуты rho, cp, mu) по их входным температуре
+    и давлению — одним векторным вызовом. Элементы без входной температуры не меняются.
+    tolerance — вернуть список элементов, у которых какое-либо свойство изменилось
+    больше чем на tolerance в относительных единицах (для инкрементального пересчёта).
+    """
+    n = len(elements)
+    if not n:
+        return []
+    t = np.fromiter((np.nan if e.t_in is None else e.t_in for e in elements), float, n)
+    p = np.fromiter((P_REF if e.p_in is None else e.p_in for e in elements), float, n)
+    known = ~np.isnan(t)
+    rho, cp, mu = properties(np.where(known, t, T_MIN), p)
+    changed = []
+    if tolerance is not None:
+        old = np.array([(e.rho, e.cp, e.mu) for e in elements], dtype=float)
+        moved = known & (np.abs(np.column_stack((rho, cp, mu)) - old) > tolerance * np.abs(old)).any(axis=1)
+        changed = [elements[k] for k in np.flatnonzero(moved).tolist()]
+    for elem, ok, r, c, m in zip(elements, known.tolist(), rho.tolist(), cp.tolist(), mu.tolist()):
+        if ok:
+            elem.rho = r
+            elem.cp = c
+            elem.mu = m
+    return changed